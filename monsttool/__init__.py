@@ -0,0 +1,4 @@
+"""モンスト スタジアムツールの共通コア
+
+起動を軽く保つため、ここでは何も読み込まない。必要なサブモジュールを直接importする。
+"""
@@ -0,0 +1,254 @@
+"""多数のショットをNumPyでまとめてシミュレーションする
+
+simulation.simulate_shot と同じ判定 (接触までのステップ数を解析的に求めて一気に進める)
+を、ショットを行とする配列で同時に行う。軌道は記録せず、当たった回数、壊した障害物、
+反射回数、最終位置だけを返す。
+"""
+from monsttool.geometry import POLYGON_TYPES
+from monsttool.profiles import FIELD_SIZE
+from monsttool.simulation import CHARACTER_RADIUS, STEP_VELOCITY, simulate_shot
+
+def _steps_in_range(np, position, velocity, low, high):
+    """low <= position + n * velocity <= high を満たす n の範囲 (配列版)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = (low - position) / velocity
+        b = (high - position) / velocity
+    lower = np.where(velocity > 0, a, b)
+    upper = np.where(velocity > 0, b, a)
+    # 速度0の軸は、範囲内なら常に、範囲外なら決して満たさない
+    inside = (low <= position) & (position <= high)
+    still = velocity == 0
+    lower = np.where(still, np.where(inside, -np.inf, np.inf), lower)
+    upper = np.where(still, np.where(inside, np.inf, -np.inf), upper)
+    return lower, upper
+
+def _first_step(np, low, high):
+    """low <= n <= high を満たす最小のステップ数 (1以上)。なければ inf"""
+    with np.errstate(invalid="ignore"):
+        n = np.where(low <= 1, 1.0, np.ceil(low - 1e-9))
+    valid = (low <= high) & (low != np.inf) & (n <= high)
+    return np.where(valid, n, np.inf)
+
+def _simulate_each(np, x, y, angles, max_reflections, obstacles, field_width, field_height, durability, decay,
+                   pierce):
+    """1本ずつ simulate_shot で計算し、simulate_batch と同じ形の結果にする (多角形・線分や動く障害物用)"""
+    count, obstacle_count = len(x), len(obstacles)
+    hits = np.zeros((count, obstacle_count), dtype=np.int32)
+    destroyed = np.zeros((count, obstacle_count), dtype=bool)
+    reflections = np.zeros(count, dtype=np.int64)
+    end_x = np.empty(count)
+    end_y = np.empty(count)
+    for row in range(count):
+        result = simulate_shot(float(x[row]), float(y[row]), float(angles[row]), max_reflections, obstacles,
+                               field_width, field_height, durability, decay, pierce)
+        np.add.at(hits[row], result["hits"], 1)
+        destroyed[row, result["destroyed"]] = True
+        reflections[row] = result["reflections"]
+        end_x[row], end_y[row] = result["trajectory"][-1]
+    return {"hits": hits, "destroyed": destroyed, "reflections": reflections, "end_x": end_x, "end_y": end_y}
+
+def simulate_batch(start_x, start_y, angles, max_reflections, obstacles,
+                   field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], durability=None, decay=None,
+                   pierce=False):
+    """開始位置と角度の配列 (同じ長さ) をまとめてシミュレーションする
+
+    durability、decay、pierce は simulate_shot と同じく、障害物ごとの残り耐久回数 (None は耐久なし)、
+    減速モードの設定、貫通するかどうか。
+    多角形・線分や動く障害物を含む配置は配列での判定がないので、1本ずつ simulate_shot で計算する。
+
+    戻り値は辞書:
+      hits         ショットごと・障害物ごとの当たった回数 (N x M)
+      destroyed    壊したかどうか (N x M, bool)
+      reflections  反射回数 (N)
+      end_x, end_y 止まった位置 (N)
+    """
+    import numpy as np
+
+    radius = CHARACTER_RADIUS
+    x = np.array(start_x, dtype=np.float64)
+    y = np.array(start_y, dtype=np.float64)
+    x, y, angles = np.broadcast_arrays(x, y, np.asarray(angles, dtype=np.float64))
+    x, y = x.copy(), y.copy()
+    count = len(x)
+    if any(o["type"] in POLYGON_TYPES or "motion" in o for o in obstacles):
+        return _simulate_each(np, x, y, angles, max_reflections, obstacles, field_width, field_height,
+                              durability, decay, pierce)
+
+    angle_rad = (angles / 1024.0) * 2 * np.pi
+    vx = STEP_VELOCITY * np.cos(angle_rad)
+    vy = STEP_VELOCITY * np.sin(angle_rad)
+
+    obstacle_count = len(obstacles)
+    ox = np.array([o["x"] for o in obstacles], dtype=np.float64)
+    oy = np.array([o["y"] for o in obstacles], dtype=np.float64)
+    size = np.array([o["size"] for o in obstacles], dtype=np.float64)
+    is_circle = np.array([o["type"] == "circle" for o in obstacles], dtype=bool)
+    reach = radius + size
+    # 反射の判定に使う障害物 (貫通では円を通り抜ける)
+    blocking = ~is_circle if pierce else np.ones(obstacle_count, dtype=bool)
+    if durability is None:
+        initial = np.array([o.get("durability", np.inf) for o in obstacles], dtype=np.float64)
+        initial_active = np.ones(obstacle_count, dtype=bool)
+    else:
+        initial = np.array([np.inf if d is None else d for d in durability], dtype=np.float64)
+        initial_active = initial > 0
+
+    durability = np.tile(initial, (count, 1))
+    active = np.tile(initial_active, (count, 1))
+    hits = np.zeros((count, obstacle_count), dtype=np.int32)
+    reflections = np.zeros(count, dtype=np.int64)
+    running = reflections < max_reflections
+    if decay is not None:
+        speed = np.full(count, decay["speed"])
+        deceleration = decay["deceleration"]
+
+    while running.any():
+        rows = np.flatnonzero(running)
+        px, py, pvx, pvy = x[rows], y[rows], vx[rows], vy[rows]
+
+        # 壁に触れるまでのステップ数
+        best = np.full(len(rows), np.inf)
+        for position, velocity, limit in ((px, pvx, field_width), (py, pvy, field_height)):
+            for low, high in ((-np.inf, radius), (limit - radius, np.inf)):
+                best = np.minimum(best, _first_step(np, *_steps_in_range(np, position, velocity, low, high)))
+
+        if obstacle_count:
+            # 障害物に触れるまでのステップ数 (行: ショット, 列: 障害物)
+            dx = px[:, None] - ox
+            dy = py[:, None] - oy
+            a = (pvx * pvx + pvy * pvy)[:, None]
+            b = 2 * (pvx[:, None] * dx + pvy[:, None] * dy)
+            c = dx * dx + dy * dy - reach * reach
+            discriminant = b * b - 4 * a * c
+            root = np.sqrt(np.maximum(discriminant, 0))
+            circle_n = _first_step(np, (-b - root) / (2 * a), (-b + root) / (2 * a))
+            circle_n = np.where(discriminant < 0, np.inf, circle_n)
+
+            x_low, x_high = _steps_in_range(np, px[:, None], pvx[:, None], ox - reach, ox + reach)
+            y_low, y_high = _steps_in_range(np, py[:, None], pvy[:, None], oy - reach, oy + reach)
+            square_n = _first_step(np, np.maximum(x_low, y_low), np.minimum(x_high, y_high))
+
+            obstacle_n = np.where(is_circle, circle_n, square_n)
+            obstacle_n = np.where(active[rows] & blocking, obstacle_n, np.inf)
+            best = np.minimum(best, obstacle_n.min(axis=1))
+            if pierce:
+                # 貫通: 区間の始めに外にいる円に入るステップ数
+                entry_n = np.where(active[rows] & is_circle & (c > 0), circle_n, np.inf)
+
+        # どこにも触れないショットはそこで止まる
+        stuck = np.isinf(best)
+        running[rows[stuck]] = False
+        keep = ~stuck
+        rows, best = rows[keep], best[keep]
+
+        # この区間で進むステップ数 (接触までに止まるなら止まる位置まで)
+        limit = best
+        if decay is not None:
+            travel = best * STEP_VELOCITY
+            if deceleration == 0:
+                remaining = np.full(len(rows), np.inf)
+            else:
+                remaining = speed[rows] * speed[rows] / (2 * deceleration)
+            stopping = remaining < travel
+            limit = np.where(stopping, remaining / STEP_VELOCITY, best)
+            going = ~stopping
+            speed[rows[going]] = np.sqrt(np.maximum(
+                speed[rows[going]] * speed[rows[going]] - 2 * deceleration * travel[going], 0.0))
+
+        if pierce and obstacle_count:
+            # 区間の中で通り抜ける円に当たりを付ける (円ごとに独立なので順番は関係ない)
+            shot_rows, index = np.nonzero(entry_n[keep] <= limit[:, None])
+            shot_rows = rows[shot_rows]
+            hits[shot_rows, index] += 1
+            durability[shot_rows, index] -= 1
+            broken = durability[shot_rows, index] <= 0
+            active[shot_rows[broken], index[broken]] = False
+
+        if decay is not None:
+            # 接触までに止まるショットは、止まる位置まで進めて終わる
+            stop_rows = rows[stopping]
+            x[stop_rows] += limit[stopping] * vx[stop_rows]
+            y[stop_rows] += limit[stopping] * vy[stop_rows]
+            running[stop_rows] = False
+            rows, best = rows[going], best[going]
+        if not len(rows):
+            break
+
+        px = x[rows] + (best - 1) * vx[rows]
+        py = y[rows] + (best - 1) * vy[rows]
+        pvx, pvy = vx[rows].copy(), vy[rows].copy()
+        next_x = px + pvx
+        next_y = py + pvy
+        added = np.zeros(len(rows), dtype=np.int64)
+
+        # フィールド境界での反射
+        wall_x = (next_x - radius <= 0) | (next_x + radius >= field_width)
+        pvx = np.where(wall_x, -pvx, pvx)
+        added += wall_x
+        wall_y = (next_y - radius <= 0) | (next_y + radius >= field_height)
+        pvy = np.where(wall_y, -pvy, pvy)
+        added += wall_y
+
+        if obstacle_count:
+            # 番号の小さい順に最初に重なった障害物だけと衝突する
+            dx = next_x[:, None] - ox
+            dy = next_y[:, None] - oy
+            circle_hit = dx * dx + dy * dy <= reach * reach
+            square_hit = ((ox - size - radius <= next_x[:, None]) & (next_x[:, None] <= ox + size + radius) &
+                          (oy - size - radius <= next_y[:, None]) & (next_y[:, None] <= oy + size + radius))
+            colliding = np.where(is_circle, circle_hit, square_hit) & active[rows] & blocking
+            has_hit = colliding.any(axis=1)
+            target = colliding.argmax(axis=1)
+
+            hit_rows = np.flatnonzero(has_hit)
+            index = target[hit_rows]
+            tdx, tdy = dx[hit_rows, index], dy[hit_rows, index]
+            hx, hy = next_x[hit_rows], next_y[hit_rows]
+            hvx, hvy = pvx[hit_rows], pvy[hit_rows]
+
+            # 円: 内接する正方形の領域に基づいて反射方向を決定
+            circle_rows = is_circle[index]
+            flip_x = circle_rows & (np.abs(tdx) > np.abs(tdy))
+            flip_y = circle_rows & ~(np.abs(tdx) > np.abs(tdy))
+
+            # 正方形: 中心が辺の外側にあればその辺で、角なら両方向に反射
+            left, right = ox[index] - size[index], ox[index] + size[index]
+            top, bottom = oy[index] - size[index], oy[index] + size[index]
+            outside_x = (hx > right) | (hx < left)
+            outside_y = (hy > bottom) | (hy < top)
+            corner_sq = np.minimum(
+                np.minimum((hx - left) ** 2 + (hy - top) ** 2, (hx - left) ** 2 + (hy - bottom) ** 2),
+                np.minimum((hx - right) ** 2 + (hy - top) ** 2, (hx - right) ** 2 + (hy - bottom) ** 2),
+            )
+            corner = ~outside_x & ~outside_y & (corner_sq <= radius * radius)
+            square_rows = ~circle_rows
+            flip_x |= square_rows & (outside_x | corner)
+            flip_y |= square_rows & ~outside_x & (outside_y | corner)
+
+            pvx[hit_rows] = np.where(flip_x, -hvx, hvx)
+            pvy[hit_rows] = np.where(flip_y, -hvy, hvy)
+            added[hit_rows] += 1
+
+            shot_rows = rows[hit_rows]
+            hits[shot_rows, index] += 1
+            # 耐久回数は円だけが持つ
+            shot_rows, index = shot_rows[circle_rows], index[circle_rows]
+            durability[shot_rows, index] -= 1
+            broken = durability[shot_rows, index] <= 0
+            active[shot_rows[broken], index[broken]] = False
+
+        if decay is not None:
+            speed[rows] *= (1 - decay["bounce_loss"]) ** added
+        x[rows] = px + pvx
+        y[rows] = py + pvy
+        vx[rows], vy[rows] = pvx, pvy
+        reflections[rows] += added
+        running[rows] = reflections[rows] < max_reflections
+
+    return {
+        "hits": hits,
+        "destroyed": ~active & initial_active,
+        "reflections": reflections,
+        "end_x": x,
+        "end_y": y,
+    }
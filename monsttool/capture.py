@@ -0,0 +1,394 @@
+import gzip
+import os
+import subprocess
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from monsttool import tracing
+from monsttool.detector import FrameChangeDetector, PlayerIconDetector
+from monsttool.profiles import get_device_profile, read_screencap_size
+from monsttool.storage import ScreenshotWriter
+
+def get_adb_path():
+    # 環境変数で指定されたADBを優先 (テスト用のスタブなど)
+    env_path = os.environ.get("ADB_PATH")
+    if env_path:
+        return env_path if os.path.exists(env_path) else None
+
+    # Macのデフォルトパスを明示的に指定
+    adb_path = os.path.expanduser("/opt/homebrew/bin/adb")
+    if os.path.exists(adb_path):
+        return adb_path
+    else:
+        # システムからADBを探すフォールバック
+        try:
+            result = subprocess.run(["which", "adb"], capture_output=True, text=True)
+            if result.returncode == 0:
+                return result.stdout.strip()
+            else:
+                return None
+        except Exception:
+            return None
+
+class CaptureError(Exception):
+    """スクリーンショットの撮影・読み込みの失敗"""
+
+def list_adb_devices(adb_path, timeout=5):
+    """撮影可能な (状態がdeviceの) 端末のシリアル番号を返す"""
+    try:
+        with tracing.span("capture.adb_devices"):
+            result = subprocess.run([adb_path, "devices"], capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise CaptureError("ADBコマンドがタイムアウトしました。デバイスが応答していません。")
+    except Exception as e:
+        raise CaptureError(f"ADBコマンドの実行中にエラーが発生しました: {str(e)}")
+
+    serials = []
+    # 1行目は「List of devices attached」
+    for line in result.stdout.strip().split('\n')[1:]:
+        fields = line.split()
+        if len(fields) >= 2 and fields[1] == "device":
+            serials.append(fields[0])
+    return serials
+
+def capture_screencap(adb_path, serial=None, timeout=5):
+    """端末のスクリーンショットをPNGのバイト列で取得する"""
+    command = [adb_path]
+    if serial:
+        command += ["-s", serial]
+    command += ["exec-out", "screencap", "-p"]
+    try:
+        with tracing.span("capture.screencap", transport="png"):
+            adb_result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise CaptureError("スクリーンショット撮影がタイムアウトしました")
+    if adb_result.returncode != 0:
+        raise CaptureError("スクリーンショット撮影に失敗しました: ADBコマンドが失敗しました")
+    return adb_result.stdout
+
+def decode_screencap(data):
+    """PNGのバイト列をBGR画像にデコードする"""
+    import cv2
+    import numpy as np
+
+    with tracing.span("capture.decode", format="png"):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise CaptureError("スクリーンショットのデコードに失敗しました")
+    return image
+
+class Frame:
+    """一度だけデコードした画面画像。派生画像は初回使用時に作成して共有する"""
+    def __init__(self, image, path=None, serial=None, origin_y=0, screen_size=None):
+        self.image = image
+        self.path = path
+        self.serial = serial
+        self.timestamp = time.time()
+        # フィールドの行だけ転送した場合は、画面全体のサイズと先頭行の位置を別に持つ
+        self.origin_y = origin_y
+        if screen_size is None:
+            height, width = image.shape[:2]
+            screen_size = (width, height)
+        self.profile = get_device_profile(*screen_size)
+        self.changed = True
+        # 座標検出の結果 (最初に検出した側が設定し、他は再利用する)
+        self.detections = None
+        self._cropped = None
+        self._field_image = None
+
+    @property
+    def cropped(self):
+        """検出用の基準サイズのクロップ画像 (BGR)"""
+        if self._cropped is None:
+            with tracing.span("detect.crop"):
+                self._cropped = self.profile.crop_for_detection(self.image, self.origin_y)
+        return self._cropped
+
+    def field_image(self):
+        """シミュレーター背景用のフィールドサイズのPIL画像 (RGB)"""
+        import cv2
+        from PIL import Image
+
+        if self._field_image is None:
+            with tracing.span("render.field_image"):
+                field = self.profile.to_field(self.image, self.origin_y)
+                self._field_image = Image.fromarray(cv2.cvtColor(field, cv2.COLOR_BGR2RGB))
+        return self._field_image
+
+# 画面の転送方式
+#   png      : 端末でPNGにエンコード (転送量は小さいがエンコードが遅い)
+#   raw      : 無圧縮のRGBA (約10MB/枚、USB接続向け)
+#   raw-gzip : 無圧縮のRGBAを端末側でgzip -1して転送し、PCで展開 (無線ADB向け)
+TRANSPORTS = ("png", "raw", "raw-gzip")
+
+# screencapのrawフォーマット番号 -> 1ピクセルのバイト数
+RAW_PIXEL_BYTES = {1: 4, 2: 4, 3: 3, 5: 4}
+
+def run_exec_out(adb_path, serial, command, timeout=5):
+    """adb exec-out で端末のコマンドを実行し、標準出力のバイト列を返す"""
+    args = [adb_path]
+    if serial:
+        args += ["-s", serial]
+    args += ["exec-out", command]
+    try:
+        with tracing.span("capture.screencap", command=command):
+            result = subprocess.run(args, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise CaptureError("スクリーンショット撮影がタイムアウトしました")
+    if result.returncode != 0 or not result.stdout:
+        raise CaptureError("スクリーンショット撮影に失敗しました: ADBコマンドが失敗しました")
+    return result.stdout
+
+class ScreenCapturer:
+    """選択した転送方式で画面を取得する。rawは初回に端末の画面レイアウトを調べ、以降はフィールドの行だけ転送する"""
+    def __init__(self, transport="png", field_rows_only=True, timeout=5):
+        self.transport = transport
+        self.field_rows_only = field_rows_only
+        self.timeout = timeout
+        # シリアル番号 -> (幅, 高さ, ヘッダー長, 1ピクセルのバイト数, フォーマット)
+        self.layouts = {}
+
+    def capture(self, adb_path, serial=None, transport=None):
+        """画面を取得して (BGR画像, PNGのバイト列またはNone, 先頭行, 画面サイズ) を返す"""
+        transport = transport or self.transport
+        if transport == "png":
+            data = capture_screencap(adb_path, serial, self.timeout)
+            image = decode_screencap(data)
+            height, width = image.shape[:2]
+            return image, data, 0, (width, height)
+        if transport not in TRANSPORTS:
+            raise CaptureError(f"不明な転送方式です: {transport}")
+
+        compress = transport == "raw-gzip"
+        layout = self.layouts.get(serial)
+        if layout is None or not self.field_rows_only:
+            # レイアウトが分からないうちは画面全体を転送する
+            data = self.fetch(adb_path, serial, "screencap", compress)
+            layout = self.parse_layout(data)
+            self.layouts[serial] = layout
+            width, height, header_size, pixel_bytes, raw_format = layout
+            pixels = data[header_size:header_size + width * height * pixel_bytes]
+            image = self.raw_to_bgr(pixels, width, raw_format)
+            profile = get_device_profile(width, height)
+            if self.field_rows_only:
+                # 初回もフィールドの行だけ残す
+                x, top, right, bottom = profile.crop_box
+                return image[top:bottom].copy(), None, top, (width, height)
+            return image, None, 0, (width, height)
+
+        # フィールドの行 (基準端末では440-1655行目) だけを端末側で切り出して転送する
+        width, height, header_size, pixel_bytes, raw_format = layout
+        profile = get_device_profile(width, height)
+        x, top, right, bottom = profile.crop_box
+        row_bytes = width * pixel_bytes
+        offset = header_size + top * row_bytes
+        length = (bottom - top) * row_bytes
+        command = f"screencap | tail -c +{offset + 1} | head -c {length}"
+        data = self.fetch(adb_path, serial, command, compress)
+        if len(data) != length:
+            # 画面の回転などでレイアウトが変わった場合は次回に調べ直す
+            self.layouts.pop(serial, None)
+            raise CaptureError("スクリーンショットのサイズが想定と異なります")
+        return self.raw_to_bgr(data, width, raw_format), None, top, (width, height)
+
+    def fetch(self, adb_path, serial, command, compress):
+        if compress:
+            data = run_exec_out(adb_path, serial, f"{command} | gzip -1", self.timeout)
+            try:
+                with tracing.span("capture.decompress"):
+                    return gzip.decompress(data)
+            except (OSError, EOFError, zlib.error) as e:
+                raise CaptureError(f"圧縮データの展開に失敗しました: {str(e)}")
+        return run_exec_out(adb_path, serial, command, self.timeout)
+
+    def parse_layout(self, data):
+        width, height = read_screencap_size(data)
+        raw_format = int.from_bytes(data[8:12], "little")
+        pixel_bytes = RAW_PIXEL_BYTES.get(raw_format)
+        if pixel_bytes is None or width <= 0 or height <= 0:
+            raise CaptureError(f"未対応の画面フォーマットです: {raw_format}")
+        # Android 9以降はヘッダーに色空間の4バイトが追加されている
+        header_size = len(data) - width * height * pixel_bytes
+        if header_size not in (12, 16):
+            raise CaptureError("スクリーンショットのヘッダーを読み取れませんでした")
+        return width, height, header_size, pixel_bytes, raw_format
+
+    def raw_to_bgr(self, pixels, width, raw_format):
+        import cv2
+        import numpy as np
+
+        pixel_bytes = RAW_PIXEL_BYTES[raw_format]
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(-1, width, pixel_bytes)
+        conversion = {3: cv2.COLOR_RGB2BGR, 5: cv2.COLOR_BGRA2BGR}.get(raw_format, cv2.COLOR_RGBA2BGR)
+        with tracing.span("capture.decode", format="raw"):
+            return cv2.cvtColor(image, conversion)
+
+    def benchmark(self, adb_path, serial=None, repeats=3):
+        """各転送方式の取得時間 (デコード込みの中央値、秒) を計測し、最速の方式に切り替える"""
+        results = {}
+        for transport in TRANSPORTS:
+            durations = []
+            try:
+                # 1回目はレイアウトの調査を含むので計測から外す
+                self.capture(adb_path, serial, transport)
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    self.capture(adb_path, serial, transport)
+                    durations.append(time.perf_counter() - started)
+            except CaptureError:
+                # 端末にgzipがないなど、使えない方式は候補から外す
+                continue
+            durations.sort()
+            results[transport] = durations[len(durations) // 2]
+        if results:
+            self.transport = min(results, key=results.get)
+        return results
+
+class MultiDeviceCapture:
+    """複数の端末から並列に撮影し、端末ごとの検出器で座標を検出する"""
+    def __init__(self, adb_path=None, max_workers=8, history=50, capturer=None):
+        self.adb_path = adb_path
+        self.capturer = capturer or ScreenCapturer()
+        self.max_workers = max_workers
+        self.history = history
+        self.detectors = {}
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def get_detector(self, serial):
+        with self.lock:
+            detector = self.detectors.get(serial)
+            if detector is None:
+                detector = self.detectors[serial] = PlayerIconDetector()
+            return detector
+
+    def record_latency(self, serial, timings):
+        with self.lock:
+            stages = self.latencies.setdefault(serial, {})
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, deque(maxlen=self.history)).append(seconds)
+
+    def capture_all(self, serials=None):
+        """全端末 (またはserialsで指定した端末) を並列に撮影・検出し、シリアル番号ごとの結果を返す"""
+        adb_path = self.adb_path or get_adb_path()
+        if not adb_path:
+            raise CaptureError("ADBが見つかりません。Android SDKがインストールされているか、PATHが正しく設定されているか確認してください。")
+        if serials is None:
+            serials = list_adb_devices(adb_path)
+        if not serials:
+            raise CaptureError("接続されているAndroidデバイスが見つかりません。デバイスが正しく接続されているか確認してください。")
+
+        outcomes = {}
+        # adbの待ち時間とOpenCVの処理はGILを解放するのでスレッドで並列化できる
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(serials))) as pool:
+            futures = {pool.submit(self.capture_one, adb_path, serial): serial for serial in serials}
+            for future, serial in futures.items():
+                try:
+                    outcomes[serial] = future.result()
+                except Exception as e:
+                    outcomes[serial] = {"frame": None, "detections": [], "timings": {}, "error": str(e)}
+        return outcomes
+
+    @tracing.traced("capture.device")
+    def capture_one(self, adb_path, serial):
+        started = time.perf_counter()
+        image, _, origin_y, screen_size = self.capturer.capture(adb_path, serial)
+        captured = time.perf_counter()
+        frame = Frame(image, serial=serial, origin_y=origin_y, screen_size=screen_size)
+        decoded = time.perf_counter()
+        frame.detections, _ = self.get_detector(serial).detect_icon_in_cropped(frame.cropped)
+        detected = time.perf_counter()
+
+        # 転送方式によってはデコードが取得に含まれる
+        timings = {
+            "capture": captured - started,
+            "decode": decoded - captured,
+            "detect": detected - decoded,
+            "total": detected - started,
+        }
+        self.record_latency(serial, timings)
+        return {"frame": frame, "detections": frame.detections, "timings": timings, "error": None}
+
+    def latency_summary(self, serial):
+        """端末ごとの段階別レイテンシ (直近の平均と最大、秒)"""
+        with self.lock:
+            stages = self.latencies.get(serial, {})
+            return {stage: (sum(values) / len(values), max(values))
+                    for stage, values in stages.items() if values}
+
+class FrameSource:
+    """ADBでの撮影と画像のデコードを一か所にまとめ、同じフレームを各タブに配信する"""
+    def __init__(self, screenshot_dir):
+        self.screenshot_dir = screenshot_dir
+        # ディスクへの書き込みは撮影の待ち時間に含めない
+        self.writer = ScreenshotWriter(screenshot_dir)
+        self.subscribers = []
+        self.frame_gate = FrameChangeDetector()
+        self.latest_frame = None
+        # 撮影する端末 (Noneなら接続されている端末をADBに任せる)
+        self.serial = None
+        self.capturer = ScreenCapturer()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def check_adb_devices(self):
+        """ADBデバイスが接続されているか確認し、ADBのパスを返す"""
+        adb_path = get_adb_path()
+        if not adb_path:
+            raise CaptureError("ADBが見つかりません。Android SDKがインストールされているか、PATHが正しく設定されているか確認してください。")
+
+        serials = list_adb_devices(adb_path)
+        if not serials:
+            raise CaptureError("接続されているAndroidデバイスが見つかりません。デバイスが正しく接続されているか確認してください。")
+        if self.serial is not None and self.serial not in serials:
+            raise CaptureError(f"端末 {self.serial} が見つかりません。")
+        return adb_path
+
+    def capture(self, publish=True):
+        """スクリーンショットを撮影し、デコードしたフレームを配信する"""
+        with tracing.span("capture.frame", transport=self.capturer.transport):
+            adb_path = self.check_adb_devices()
+
+            # ファイルから読み直さず、受け取ったデータを一度だけデコードする
+            image, png_data, origin_y, screen_size = self.capturer.capture(adb_path, self.serial)
+            with tracing.span("capture.submit"):
+                screenshot_path = self.writer.submit(data=png_data, image=image, origin_y=origin_y,
+                                                     screen_size=screen_size)
+            frame = Frame(image, screenshot_path, self.serial, origin_y, screen_size)
+        if publish:
+            self.publish(frame)
+        return frame
+
+    def benchmark_transports(self):
+        """転送方式ごとの取得時間を計測し、最速の方式を以降の撮影に使う"""
+        adb_path = self.check_adb_devices()
+        return self.capturer.benchmark(adb_path, self.serial)
+
+    def close(self):
+        """未保存のスクリーンショットを書き終えてから保存スレッドを止める"""
+        self.writer.close()
+
+    def load_file(self, image_path):
+        """画像ファイルを読み込み、フレームとして配信する"""
+        import cv2
+
+        if not os.path.exists(image_path):
+            raise CaptureError(f"画像ファイルが見つかりません: {image_path}")
+        with tracing.span("capture.imread"):
+            image = cv2.imread(image_path)
+        if image is None:
+            raise CaptureError("画像の読み込みに失敗しました")
+        return self.publish(Frame(image, image_path))
+
+    def publish(self, frame):
+        with tracing.span("capture.publish"):
+            signature = self.frame_gate.signature_from_bgr(frame.cropped)
+            frame.changed = self.frame_gate.is_changed(signature)
+            self.latest_frame = frame
+            for callback in self.subscribers:
+                callback(frame)
+        return frame
@@ -0,0 +1,259 @@
+"""ステージ配置ごとのショットのカバレッジを事前計算する
+
+    python -m monsttool.coverage stage.json coverage_dir --step 40
+    python -m monsttool.coverage coverage_dir --library --tag 降臨
+
+フィールド上の開始位置の格子それぞれから全1024角度をシミュレーションし、
+障害物ごとの当たり回数とマスごとの通過回数を .npy に書き出す。出力はメモリマップで
+開けるので、シミュレーターは再計算せずにすぐ重ねて表示できる。
+開始位置ごとに完了フラグを書き込むため、中断しても続きから再開できる。
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from monsttool.profiles import FIELD_SIZE
+from monsttool.simulation import CHARACTER_RADIUS, sweep_angles
+
+FORMAT_VERSION = 1
+ANGLE_COUNT = 1024
+
+def layout_hash(obstacles, max_reflections, field_width, field_height):
+    """配置とシミュレーション条件が同じかどうかを判定するためのハッシュ"""
+    payload = json.dumps([obstacles, max_reflections, field_width, field_height],
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def grid_starts(step, field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1],
+                radius=CHARACTER_RADIUS):
+    """キャラクターが壁に埋まらない範囲で、step ピクセル間隔の開始位置を並べる"""
+    xs = range(radius + 1, field_width - radius, step)
+    ys = range(radius + 1, field_height - radius, step)
+    return [(x, y) for y in ys for x in xs]
+
+def coverage_chunk(starts, obstacles, max_reflections, field_width, field_height, cell_size):
+    """開始位置ごとに全角度をシミュレーションし、当たり回数と通過回数を返す (ワーカーで実行)"""
+    import numpy as np
+
+    from monsttool.overlay import rasterize_trajectories
+
+    cells_w = -(-field_width // cell_size)
+    cells_h = -(-field_height // cell_size)
+    hits = np.zeros((len(starts), ANGLE_COUNT, max(len(obstacles), 1)), dtype=np.uint8)
+    visits = np.zeros((len(starts), cells_h, cells_w), dtype=np.uint16)
+    for i, (x, y) in enumerate(starts):
+        results = sweep_angles(x, y, max_reflections, obstacles,
+                               field_width=field_width, field_height=field_height)
+        trajectories = []
+        for angle, result in results:
+            for index in result["hits"]:
+                hits[i, angle, index] = min(255, int(hits[i, angle, index]) + 1)
+            trajectory = result["trajectory"]
+            # 動かなかったショットも開始位置のマスは通過したものとして数える
+            trajectories.append(trajectory if len(trajectory) >= 2 else trajectory * 2)
+        cells, owners = rasterize_trajectories(trajectories, cells_w, cells_h, cell_size)
+        # 1本のショットが同じマスを何度通っても1回と数える
+        unique = np.unique(owners.astype(np.int64) * (cells_w * cells_h) + cells) % (cells_w * cells_h)
+        visits[i] = np.bincount(unique, minlength=cells_w * cells_h).reshape(cells_h, cells_w)
+    return hits, visits
+
+class CoverageJob:
+    """カバレッジの計算と出力ディレクトリへの書き込みを管理する
+
+    出力ファイル:
+      meta.json    計算条件と配置のハッシュ
+      starts.npy   開始位置 (N x 2, int32)
+      hits.npy     ショットごとの障害物の当たり回数 (N x 1024 x 障害物数, uint8)
+      visits.npy   開始位置ごとの、各マスを通ったショットの本数 (N x 行 x 列, uint16)
+      done.npy     開始位置ごとの完了フラグ (N, bool)
+    """
+    def __init__(self, obstacles, output_dir, step=40, max_reflections=10, cell_size=8,
+                 field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1]):
+        self.obstacles = obstacles
+        self.output_dir = output_dir
+        self.step = step
+        self.max_reflections = max_reflections
+        self.cell_size = cell_size
+        self.field_width = field_width
+        self.field_height = field_height
+        self.starts = grid_starts(step, field_width, field_height)
+        self.cells_w = -(-field_width // cell_size)
+        self.cells_h = -(-field_height // cell_size)
+        self.meta = {
+            "version": FORMAT_VERSION,
+            "layout_hash": layout_hash(obstacles, max_reflections, field_width, field_height),
+            "obstacles": obstacles,
+            "max_reflections": max_reflections,
+            "step": step,
+            "cell_size": cell_size,
+            "field_width": field_width,
+            "field_height": field_height,
+        }
+
+    def path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def open_arrays(self):
+        """出力ファイルを開く。条件が同じ途中結果があればそれを引き継ぐ"""
+        import numpy as np
+        from numpy.lib.format import open_memmap
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        resume = False
+        if os.path.exists(self.path("meta.json")) and os.path.exists(self.path("done.npy")):
+            with open(self.path("meta.json"), "r", encoding="utf-8") as f:
+                resume = json.load(f) == self.meta
+
+        count = len(self.starts)
+        shapes = {
+            "hits.npy": ((count, ANGLE_COUNT, max(len(self.obstacles), 1)), np.uint8),
+            "visits.npy": ((count, self.cells_h, self.cells_w), np.uint16),
+            "done.npy": ((count,), np.bool_),
+        }
+        arrays = {}
+        for name, (shape, dtype) in shapes.items():
+            mode = "r+" if resume else "w+"
+            arrays[name] = open_memmap(self.path(name), mode=mode, dtype=dtype, shape=shape)
+        if not resume:
+            np.save(self.path("starts.npy"), np.asarray(self.starts, dtype=np.int32))
+            # メタデータは配列を作り直してから書き、途中で落ちても古い完了フラグを信用しない
+            with open(self.path("meta.json"), "w", encoding="utf-8") as f:
+                json.dump(self.meta, f, ensure_ascii=False, indent=1)
+        return arrays["hits.npy"], arrays["visits.npy"], arrays["done.npy"]
+
+    def run(self, workers=None, chunk_size=2, progress=None):
+        """未完了の開始位置を計算する。progress(完了数, 全体数, 経過秒) を随時呼ぶ"""
+        hits, visits, done = self.open_arrays()
+        pending = [i for i in range(len(self.starts)) if not done[i]]
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        total = len(self.starts)
+        completed = total - len(pending)
+        started = time.perf_counter()
+        if progress is not None:
+            progress(completed, total, 0.0)
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {
+                pool.submit(coverage_chunk, [self.starts[i] for i in chunk], self.obstacles,
+                            self.max_reflections, self.field_width, self.field_height,
+                            self.cell_size): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                chunk_hits, chunk_visits = future.result()
+                hits[chunk] = chunk_hits
+                visits[chunk] = chunk_visits
+                hits.flush()
+                visits.flush()
+                # 結果を書き終えてから完了フラグを立てる
+                done[chunk] = True
+                done.flush()
+                completed += len(chunk)
+                if progress is not None:
+                    progress(completed, total, time.perf_counter() - started)
+        return CoverageMap(self.output_dir)
+
+class CoverageMap:
+    """書き出したカバレッジをメモリマップで読み込む"""
+    def __init__(self, directory):
+        import numpy as np
+
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.starts = np.load(os.path.join(directory, "starts.npy"))
+        self.hits = np.load(os.path.join(directory, "hits.npy"), mmap_mode="r")
+        self.visits = np.load(os.path.join(directory, "visits.npy"), mmap_mode="r")
+        self.done = np.load(os.path.join(directory, "done.npy"), mmap_mode="r")
+
+    def matches(self, obstacles, max_reflections):
+        return self.meta["layout_hash"] == layout_hash(
+            obstacles, max_reflections, self.meta["field_width"], self.meta["field_height"]
+        )
+
+    def nearest_start(self, x, y):
+        """指定した位置に最も近い計算済みの開始位置の番号を返す (なければNone)"""
+        import numpy as np
+
+        distances = ((self.starts[:, 0] - x) ** 2 + (self.starts[:, 1] - y) ** 2).astype(np.float64)
+        distances[~np.asarray(self.done)] = np.inf
+        index = int(np.argmin(distances))
+        return None if np.isinf(distances[index]) else index
+
+    def hit_rates(self, index):
+        """開始位置から各障害物に当たる角度の割合"""
+        hit_angles = (self.hits[index] > 0).sum(axis=0)
+        return [int(count) / ANGLE_COUNT for count in hit_angles[:len(self.meta["obstacles"])]]
+
+    def heatmap(self, index, alpha=160):
+        """開始位置からの通過本数をフィールドサイズのRGBA画像にする"""
+        import cv2
+        import numpy as np
+
+        counts = np.asarray(self.visits[index], dtype=np.float32)
+        levels = np.clip(counts / ANGLE_COUNT * 255.0 * 4, 0, 255).astype(np.uint8)
+        colored = cv2.applyColorMap(levels, cv2.COLORMAP_JET)
+        size = (self.meta["field_width"], self.meta["field_height"])
+        colored = cv2.resize(colored, size, interpolation=cv2.INTER_NEAREST)
+        levels = cv2.resize(levels, size, interpolation=cv2.INTER_NEAREST)
+        rgba = np.dstack([cv2.cvtColor(colored, cv2.COLOR_BGR2RGB),
+                          np.where(levels > 0, alpha, 0).astype(np.uint8)])
+        return rgba
+
+def print_progress(completed, total, elapsed):
+    rate = completed / total * 100 if total else 100.0
+    line = f"\rカバレッジ計算: {completed}/{total} ({rate:.0f}%) 経過 {elapsed:.0f}秒"
+    sys.stdout.write(line)
+    sys.stdout.flush()
+
+def run_stage(stage, output, args):
+    max_reflections = args.max_reflections
+    if max_reflections is None:
+        max_reflections = stage.get("max_reflections", 10)
+
+    job = CoverageJob(stage.get("obstacles", []), output, step=args.step,
+                      max_reflections=max_reflections, cell_size=args.cell_size)
+    job.run(workers=args.workers, chunk_size=args.chunk_size, progress=print_progress)
+    print()
+    print(f"書き出しました: {output}")
+
+def main(argv=None):
+    from monsttool.stagelibrary import StageLibrary, add_query_arguments, query_from_args, safe_file_name
+
+    parser = argparse.ArgumentParser(description="開始位置 x 全角度のカバレッジを事前計算する")
+    parser.add_argument("stage", nargs="?", help="シミュレーターで保存した設定ファイル (JSON)")
+    parser.add_argument("output", help="出力ディレクトリ (途中結果があれば続きから計算する)。"
+                                       "--library ならステージ名ごとのディレクトリをこの中に作る")
+    parser.add_argument("--library", nargs="?", const="", default=None,
+                        help="設定ファイルの代わりにステージライブラリから条件に合うものを順に計算する"
+                             " (パスの省略時はホームディレクトリ)")
+    add_query_arguments(parser)
+    parser.add_argument("--step", type=int, default=40, help="開始位置の間隔 (ピクセル)")
+    parser.add_argument("--cell-size", type=int, default=8, help="通過回数を数えるマスの大きさ")
+    parser.add_argument("--max-reflections", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.library is None:
+        if args.stage is None:
+            parser.error("設定ファイルか --library を指定してください")
+        with open(args.stage, "r", encoding="utf-8") as f:
+            run_stage(json.load(f), args.output, args)
+        return
+    # ディレクトリを探さず、ライブラリから条件に合うステージを読み出しながら計算する
+    library = StageLibrary(args.library)
+    for name, stage in library.iter_stages(**query_from_args(args)):
+        print(f"ステージ: {name}")
+        run_stage(stage, os.path.join(args.output, safe_file_name(name)), args)
+    library.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import os
+
+from monsttool import tracing
+from monsttool.profiles import FIELD_SIZE, get_device_profile
+
+class PlayerIconDetector:
+    def __init__(self):
+        import numpy as np
+
+        self.lower_red1 = np.array([0, 120, 100])
+        self.upper_red1 = np.array([5, 255, 255])
+        self.lower_red2 = np.array([175, 120, 100])
+        self.upper_red2 = np.array([180, 255, 255])
+        self.min_width = 30
+        self.max_width = 31
+        self.min_height = 34
+        self.max_height = 40
+
+        self.resize_width, self.resize_height = FIELD_SIZE
+
+    def get_profile(self, image):
+        height, width = image.shape[:2]
+        return get_device_profile(width, height)
+
+    def crop_image(self, image):
+        return self.get_profile(image).crop_for_detection(image)
+
+    def resize_for_display(self, image):
+        import cv2
+
+        return cv2.resize(image, (self.resize_width, self.resize_height))
+
+    def load_image(self, image_path):
+        import cv2
+
+        if not os.path.exists(image_path):
+            raise ValueError(f"画像ファイルが見つかりません: {image_path}")
+
+        original_image = cv2.imread(image_path)
+        if original_image is None:
+            raise ValueError("画像の読み込みに失敗しました")
+        return original_image
+
+    def detect_icon(self, image_path):
+        original_image = self.load_image(image_path)
+        return self.detect_icon_in_cropped(self.crop_image(original_image))
+
+    @tracing.traced("detect.icons")
+    def detect_icon_in_cropped(self, cropped_image):
+        """クロップ済みの画像からプレイヤーアイコンを検出する"""
+        import cv2
+        import numpy as np
+
+        hsv = cv2.cvtColor(cropped_image, cv2.COLOR_BGR2HSV)
+        mask1 = cv2.inRange(hsv, self.lower_red1, self.upper_red1)
+        mask2 = cv2.inRange(hsv, self.lower_red2, self.upper_red2)
+        mask = cv2.bitwise_or(mask1, mask2)
+
+        kernel = np.ones((3, 3), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask = cv2.medianBlur(mask, 3)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        results = []
+        
+        scale_x = self.resize_width / cropped_image.shape[1]
+        scale_y = self.resize_height / cropped_image.shape[0]
+        
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            top_edge_y = y
+            
+            # 面積によるフィルタリング
+            area = cv2.contourArea(contour)
+            if area < 410 or area > 750:
+                continue
+            
+            # 縦横比によるフィルタリング
+            aspect_ratio = float(w) / h
+            if not (0.6 <= aspect_ratio <= 1.0):
+                continue
+            
+            # 円形度チェック
+            perimeter = cv2.arcLength(contour, True)
+            circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0
+            if circularity < 0.1:
+                continue
+            
+            # 凸性チェック
+            hull = cv2.convexHull(contour)
+            hull_area = cv2.contourArea(hull)
+            solidity = float(area) / hull_area if hull_area > 0 else 0
+            if solidity < 0.1:
+                continue
+            
+            # サイズによるフィルタリング
+            if not (self.min_width <= w <= self.max_width and 
+                    self.min_height <= h <= self.max_height):
+                continue
+            
+            # 検出された領域の色一貫性をチェック
+            roi = cropped_image[y:y+h, x:x+w]
+            hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+            mask_roi1 = cv2.inRange(hsv_roi, self.lower_red1, self.upper_red1)
+            mask_roi2 = cv2.inRange(hsv_roi, self.lower_red2, self.upper_red2)
+            mask_roi = cv2.bitwise_or(mask_roi1, mask_roi2)
+            red_ratio = cv2.countNonZero(mask_roi) / (w * h)
+            if red_ratio < 0.4:
+                continue
+
+            # 検出結果を保存
+            original_coords = {
+                'x': x + w//2,
+                'y': top_edge_y,
+                'width': w,
+                'height': h,
+                'confidence': cv2.contourArea(contour)
+            }
+            
+            resized_coords = {
+                'x': int(round((x + w//2) * scale_x)),
+                'y': int(round(top_edge_y * scale_y)),
+                'width': int(round(w * scale_x)),
+                'height': int(round(h * scale_y)),
+                'confidence': cv2.contourArea(contour)
+            }
+            
+            resized_center_coords = {
+                'x': resized_coords['x'] - 9,
+                'y': resized_coords['y'] + 45
+            }
+            
+            results.append({
+                'original': original_coords,
+                'resized': resized_coords,
+                'resized_center': resized_center_coords
+            })
+
+        results.sort(key=lambda x: (x['original']['x'], x['original']['y']))
+        return results, cropped_image
+
+    def visualize_results(self, image, results):
+        import cv2
+
+        visualized_image = image.copy()
+        
+        for result in results:
+            original = result['original']
+            resized_center = result['resized_center']
+            x, y = original['x'], original['y']
+            w, h = original['width'], original['height']
+
+            cv2.rectangle(visualized_image, (x - w//2, y), (x + w//2, y + h), (0, 255, 0), 2)
+            cv2.circle(visualized_image, (x, y), 3, (0, 0, 255), -1)
+            text = f'P: ({x}, {y}) {w}x{h}'
+            cv2.putText(visualized_image, text, (x + 10, y + 10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            
+            cx, cy = x - 15, y + 76
+            cv2.circle(visualized_image, (cx, cy), 3, (255, 0, 0), -1)
+            center_text = f'C: ({resized_center["x"]}, {resized_center["y"]})'
+            cv2.putText(visualized_image, center_text, (cx + 10, cy), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        
+        return visualized_image
+
+class FrameChangeDetector:
+    """縮小したフィールド画像のブロック差分でフレームの変化を判定する"""
+    def __init__(self, sample_size=(32, 36), threshold=6):
+        # 1ブロック = 元画像の約34x34ピクセルの平均輝度
+        self.sample_size = sample_size
+        self.threshold = threshold
+        self.previous_signature = None
+
+    def signature_from_bgr(self, image):
+        import cv2
+        import numpy as np
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, self.sample_size, interpolation=cv2.INTER_AREA)
+        return small.astype(np.int16)
+
+    def is_changed(self, signature):
+        """前回処理したフレームから変化していればTrueを返す"""
+        import numpy as np
+
+        previous = self.previous_signature
+        if previous is not None and previous.shape == signature.shape:
+            if np.abs(signature - previous).max() <= self.threshold:
+                return False
+        # 少しずつの変化が蓄積しても検出できるよう、処理したフレームのみ基準にする
+        self.previous_signature = signature
+        return True
+
+    def reset(self):
+        self.previous_signature = None
+
+class FrameStats:
+    """配信先ごとに、実際に処理したフレームと処理を省いたフレームを数える"""
+    def __init__(self):
+        self.frames_total = 0
+        self.frames_skipped = 0
+
+    def record(self, skipped):
+        self.frames_total += 1
+        if skipped:
+            self.frames_skipped += 1
+
+    def stats_text(self):
+        processed = self.frames_total - self.frames_skipped
+        return f"フレーム: 処理 {processed} / スキップ {self.frames_skipped}"
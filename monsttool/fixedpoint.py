@@ -0,0 +1,295 @@
+"""固定小数点 (整数) で計算する決定的なシミュレーション
+
+simulation.simulate_shot と同じ判定を、位置と速度を 1/SCALE ピクセル単位の整数で行う。
+1024段階の角度ごとの速度は組み込みの整数の表 (DIRECTION_TABLE) から引き、反射は成分の符号反転だけなので
+丸め誤差がたまらない。結果はマシンやプロセスによらずビット単位で一致するため、
+shot_key をキーにキャッシュしたり、分散して計算したスイープをそのまま突き合わせたりできる。
+
+    python -m monsttool.fixedpoint    # 方向表の確認
+"""
+import hashlib
+import json
+import math
+import sys
+
+from monsttool.geometry import POLYGON_TYPES
+from monsttool.profiles import FIELD_SIZE
+from monsttool.simulation import CHARACTER_RADIUS, STEP_VELOCITY
+
+# 1ピクセルあたりの単位数 (2の累乗なので整数ピクセルとの変換は誤差なし)
+SCALE = 1 << 20
+ENGINE_VERSION = "fixed-1"
+# 方向表の内容のハッシュ。表を作り直したら ENGINE_VERSION も上げる
+DIRECTION_TABLE_SHA1 = "26f7c541cc7d9c96e2fc9bb8b5627f2cbe81a817"
+
+# 0-128 (0-45度) の1ステップの移動量 round(STEP_VELOCITY * SCALE * (cos, sin)(k * π / 512))。
+# 三角関数の実装がマシンごとに違っても同じ表になるよう、計算済みの整数を直接持つ
+DIRECTION_OCTANT = (
+    (209715, 0), (209711, 1287), (209699, 2574), (209680, 3860), (209652, 5147), (209617, 6433),
+    (209573, 7719), (209522, 9005), (209463, 10290), (209396, 11575), (209321, 12860), (209238, 14144),
+    (209147, 15428), (209048, 16711), (208942, 17993), (208828, 19275), (208705, 20556), (208575, 21836),
+    (208437, 23115), (208292, 24394), (208138, 25671), (207977, 26948), (207807, 28224), (207630, 29498),
+    (207445, 30772), (207253, 32044), (207052, 33315), (206844, 34585), (206628, 35853), (206404, 37120),
+    (206172, 38386), (205933, 39651), (205686, 40913), (205431, 42175), (205168, 43434), (204898, 44692),
+    (204620, 45949), (204334, 47204), (204040, 48456), (203739, 49707), (203430, 50957), (203114, 52204),
+    (202790, 53449), (202458, 54692), (202118, 55934), (201771, 57173), (201417, 58410), (201055, 59645),
+    (200685, 60877), (200308, 62107), (199923, 63335), (199530, 64561), (199130, 65784), (198723, 67004),
+    (198308, 68223), (197886, 69438), (197456, 70651), (197019, 71861), (196574, 73069), (196122, 74273),
+    (195663, 75475), (195196, 76675), (194722, 77871), (194240, 79064), (193752, 80255), (193256, 81442),
+    (192752, 82626), (192242, 83807), (191724, 84985), (191199, 86160), (190666, 87332), (190127, 88500),
+    (189580, 89665), (189027, 90826), (188466, 91984), (187898, 93139), (187323, 94290), (186741, 95438),
+    (186152, 96582), (185555, 97722), (184952, 98859), (184342, 99992), (183725, 101121), (183101, 102247),
+    (182470, 103368), (181833, 104486), (181188, 105600), (180537, 106709), (179879, 107815), (179214, 108917),
+    (178542, 110014), (177864, 111108), (177179, 112197), (176487, 113282), (175788, 114363), (175083, 115439),
+    (174372, 116512), (173654, 117579), (172929, 118643), (172198, 119701), (171460, 120756), (170716, 121806),
+    (169965, 122851), (169208, 123891), (168445, 124927), (167675, 125958), (166899, 126985), (166117, 128007),
+    (165328, 129023), (164533, 130035), (163732, 131043), (162925, 132045), (162112, 133042), (161293, 134034),
+    (160467, 135021), (159636, 136003), (158798, 136980), (157955, 137952), (157105, 138919), (156250, 139880),
+    (155389, 140836), (154522, 141787), (153649, 142732), (152770, 143672), (151886, 144607), (150995, 145536),
+    (150100, 146460), (149198, 147378), (148291, 148291),
+)
+
+def compute_direction_octant():
+    """DIRECTION_OCTANT をこの環境の三角関数で計算し直す (表を作り直すときと確認用)"""
+    step = STEP_VELOCITY * SCALE
+    return tuple((round(step * math.cos(k * math.pi / 512)), round(step * math.sin(k * math.pi / 512)))
+                 for k in range(129))
+
+def build_direction_table(octant=DIRECTION_OCTANT):
+    """角度 (0-1023) ごとの1ステップの移動量 (vx, vy) を0-45度の表から対称性で並べる
+
+    四分円・八分円ごとにまったく同じ大きさの値になり、整数の並べ替えだけなので環境によらない。
+    """
+    quadrant = list(octant) + [(sin, cos) for cos, sin in reversed(octant[:128])]
+    table = []
+    for turn in range(4):
+        for cos, sin in quadrant[:256]:
+            for _ in range(turn):
+                cos, sin = -sin, cos
+            table.append((cos, sin))
+    return tuple(table)
+
+def table_digest(table):
+    return hashlib.sha1(json.dumps(table).encode("ascii")).hexdigest()
+
+DIRECTION_TABLE = build_direction_table()
+
+def check_direction_table():
+    """方向表を確かめ、見つかった問題のリストを返す (空なら問題なし)
+
+    表がハッシュと一致しないのは表を書き換えたときだけで、ENGINE_VERSION も上げる必要がある。
+    三角関数で計算し直した値との違いは、この環境の三角関数の実装差を示すだけで結果には影響しない。
+    """
+    problems = []
+    if table_digest(DIRECTION_TABLE) != DIRECTION_TABLE_SHA1:
+        problems.append("方向表が基準のハッシュと一致しません (表を変えたら DIRECTION_TABLE_SHA1 と ENGINE_VERSION を更新)")
+    if compute_direction_octant() != DIRECTION_OCTANT:
+        problems.append("この環境の三角関数で計算した方向表が組み込みの表と異なります (計算には組み込みの表を使います)")
+    return problems
+
+def to_fixed(value):
+    """ピクセル座標を固定小数点の整数にする"""
+    if isinstance(value, int):
+        return value * SCALE
+    return round(value * SCALE)
+
+def _ceil_div(a, b):
+    return -((-a) // b)
+
+def _steps_in_range(position, velocity, low, high):
+    """low <= position + n * velocity <= high を満たす整数 n の範囲 (端は ±inf もありうる)"""
+    if velocity > 0:
+        lower = -math.inf if low == -math.inf else _ceil_div(low - position, velocity)
+        upper = math.inf if high == math.inf else (high - position) // velocity
+        return lower, upper
+    if velocity < 0:
+        lower = -math.inf if high == math.inf else _ceil_div(high - position, velocity)
+        upper = math.inf if low == -math.inf else (low - position) // velocity
+        return lower, upper
+    if low <= position <= high:
+        return -math.inf, math.inf
+    return math.inf, -math.inf
+
+def _first_step(low, high):
+    n = max(low, 1)
+    return n if n <= high else None
+
+def _circle_first_step(dx, dy, vx, vy, reach):
+    """|d + n v| <= reach を満たす最小の n (1以上)。なければNone"""
+    a = vx * vx + vy * vy
+    b = 2 * (vx * dx + vy * dy)
+    c = dx * dx + dy * dy - reach * reach
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+    root = math.isqrt(discriminant)
+    # 整数の平方根で2つの解を外側から挟み、手前から順に確かめる (1ステップ以内で見つかる)
+    n = max(1, (-b - root - 1) // (2 * a))
+    last = (-b + root + 1) // (2 * a) + 1
+    while n <= last:
+        if (a * n + b) * n + c <= 0:
+            return n
+        n += 1
+    return None
+
+def _steps_until_contact(x, y, vx, vy, active, radius, field_width, field_height):
+    best = None
+    for position, velocity, size in ((x, vx, field_width), (y, vy, field_height)):
+        for low, high in ((-math.inf, radius), (size - radius, math.inf)):
+            n = _first_step(*_steps_in_range(position, velocity, low, high))
+            if n is not None and (best is None or n < best):
+                best = n
+                if best == 1:
+                    return best
+
+    for _, (kind, obstacle_x, obstacle_y, size) in active:
+        reach = radius + size
+        if kind == "circle":
+            n = _circle_first_step(x - obstacle_x, y - obstacle_y, vx, vy, reach)
+        else:
+            x_low, x_high = _steps_in_range(x, vx, obstacle_x - reach, obstacle_x + reach)
+            y_low, y_high = _steps_in_range(y, vy, obstacle_y - reach, obstacle_y + reach)
+            n = _first_step(max(x_low, y_low), min(x_high, y_high))
+        if n is not None and (best is None or n < best):
+            best = n
+            if best == 1:
+                return best
+    return best
+
+def unsupported_reason(obstacles):
+    """固定小数点で計算できない配置ならその理由 (計算できればNone)"""
+    if any(obstacle["type"] in POLYGON_TYPES for obstacle in obstacles):
+        # 斜めの辺での反射は速度の回転になり、整数の符号反転だけでは表せない
+        return "固定小数点のシミュレーションは多角形・線分の障害物に対応していません"
+    if any("motion" in obstacle for obstacle in obstacles):
+        return "固定小数点のシミュレーションは動く障害物に対応していません"
+    return None
+
+def simulate_shot_fixed(start_x, start_y, angle_val, max_reflections, obstacles,
+                        field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], durability=None):
+    """simulate_shot の固定小数点版 (引数と戻り値の形は同じ、軌道の座標はピクセル単位)"""
+    reason = unsupported_reason(obstacles)
+    if reason is not None:
+        raise ValueError(reason)
+    radius = CHARACTER_RADIUS * SCALE
+    width = to_fixed(field_width)
+    height = to_fixed(field_height)
+    vx, vy = DIRECTION_TABLE[int(angle_val) % 1024]
+    x, y = to_fixed(start_x), to_fixed(start_y)
+    trajectory = [(x / SCALE, y / SCALE)]
+
+    shapes = [(obstacle["type"], to_fixed(obstacle["x"]), to_fixed(obstacle["y"]), to_fixed(obstacle["size"]))
+              for obstacle in obstacles]
+    active = list(enumerate(shapes))
+    if durability is None:
+        durability = {i: obstacle["durability"] for i, obstacle in enumerate(obstacles)
+                      if "durability" in obstacle}
+    else:
+        durability = {i: remaining for i, remaining in enumerate(durability) if remaining is not None}
+        active = [(i, shape) for i, shape in active if durability.get(i, 1) > 0]
+    hits = []
+    hit_bounces = []
+    destroyed = []
+
+    reflection_count = 0
+    while reflection_count < max_reflections:
+        steps = _steps_until_contact(x, y, vx, vy, active, radius, width, height)
+        if steps is None:
+            break
+
+        x += (steps - 1) * vx
+        y += (steps - 1) * vy
+        reflection_occurred = False
+        next_x = x + vx
+        next_y = y + vy
+
+        if next_x - radius <= 0 or next_x + radius >= width:
+            vx = -vx
+            reflection_occurred = True
+            reflection_count += 1
+
+        if next_y - radius <= 0 or next_y + radius >= height:
+            vy = -vy
+            reflection_occurred = True
+            reflection_count += 1
+
+        broken_position = None
+        for position, (index, (kind, obstacle_x, obstacle_y, size)) in enumerate(active):
+            reach = radius + size
+            if kind == "circle":
+                dx = next_x - obstacle_x
+                dy = next_y - obstacle_y
+                if dx * dx + dy * dy > reach * reach:
+                    continue
+                if abs(dx) > abs(dy):
+                    vx = -vx
+                else:
+                    vy = -vy
+                if index in durability:
+                    durability[index] -= 1
+                    if durability[index] <= 0:
+                        broken_position = position
+            else:
+                left_edge = obstacle_x - size
+                right_edge = obstacle_x + size
+                top_edge = obstacle_y - size
+                bottom_edge = obstacle_y + size
+                if not (left_edge - radius <= next_x <= right_edge + radius and
+                        top_edge - radius <= next_y <= bottom_edge + radius):
+                    continue
+                if next_x > right_edge or next_x < left_edge:
+                    vx = -vx
+                elif next_y > bottom_edge or next_y < top_edge:
+                    vy = -vy
+                else:
+                    min_dist_sq = min((next_x - corner_x) ** 2 + (next_y - corner_y) ** 2
+                                      for corner_x in (left_edge, right_edge)
+                                      for corner_y in (top_edge, bottom_edge))
+                    if min_dist_sq <= radius * radius:
+                        vx = -vx
+                        vy = -vy
+            hits.append(index)
+            reflection_occurred = True
+            reflection_count += 1
+            hit_bounces.append(reflection_count)
+            break
+
+        if broken_position is not None:
+            destroyed.append(active.pop(broken_position)[0])
+
+        x += vx
+        y += vy
+
+        if reflection_occurred:
+            trajectory.append((x / SCALE, y / SCALE))
+
+        if reflection_count >= max_reflections:
+            trajectory.append((x / SCALE, y / SCALE))
+            break
+
+    return {
+        "trajectory": trajectory,
+        "hits": hits,
+        "hit_bounces": hit_bounces,
+        "destroyed": destroyed,
+        "reflections": reflection_count,
+    }
+
+def shot_key(start_x, start_y, angle_val, max_reflections, obstacles,
+             field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], durability=None):
+    """固定小数点での結果を一意に決める条件のハッシュ (キャッシュや重複除去のキー)"""
+    payload = json.dumps([ENGINE_VERSION, to_fixed(start_x), to_fixed(start_y), int(angle_val) % 1024,
+                          max_reflections, obstacles, field_width, field_height, durability],
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def main():
+    problems = check_direction_table()
+    for problem in problems:
+        print(problem)
+    if table_digest(DIRECTION_TABLE) != DIRECTION_TABLE_SHA1:
+        sys.exit(1)
+    print(f"方向表 OK ({ENGINE_VERSION}, {DIRECTION_TABLE_SHA1})")
+
+if __name__ == "__main__":
+    main()
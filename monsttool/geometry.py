@@ -0,0 +1,226 @@
+"""多角形と線分の障害物の形状
+
+障害物の辞書は円や正方形と同じく中心 (x, y) と大きさ size (中心から最も遠い頂点までの距離) を持ち、
+頂点は中心からの相対座標で points に並べる。中心を動かせば形ごと動くので、ドラッグでの移動や
+クリック判定は円や正方形と同じように扱える。
+
+  {"type": "polygon", "x": 320, "y": 300, "size": 57, "points": [[-40, -40], [40, -40], [0, 40]]}
+  {"type": "segment", "x": 320, "y": 300, "size": 80, "points": [[-80, 0], [80, 0]]}
+
+辺ごとの単位接線・外向き法線・外接矩形は PolygonShape に前計算し、辺が多い形状でも
+BVH (外接矩形の木) で軌道の近くの辺だけを調べる。
+"""
+import math
+
+POLYGON_TYPES = ("polygon", "segment")
+# 葉に入れる辺の数
+BVH_LEAF_SIZE = 4
+
+def make_polygon(points, obstacle_type="polygon"):
+    """絶対座標の頂点のリストから障害物の辞書を作る (中心は頂点の外接矩形の中心)"""
+    if obstacle_type == "segment" and len(points) != 2:
+        raise ValueError("線分の頂点は2つです")
+    if obstacle_type == "polygon" and len(points) < 3:
+        raise ValueError("多角形の頂点は3つ以上必要です")
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    center_x = round((min(xs) + max(xs)) / 2)
+    center_y = round((min(ys) + max(ys)) / 2)
+    obstacle = {
+        "type": obstacle_type,
+        "x": center_x,
+        "y": center_y,
+        "points": [[x - center_x, y - center_y] for x, y in points],
+    }
+    return normalize_polygon(obstacle)
+
+def normalize_polygon(obstacle):
+    """size を頂点から計算し直す (設定ファイルで size を省略した場合など)"""
+    obstacle["size"] = math.ceil(max(math.hypot(dx, dy) for dx, dy in obstacle["points"]))
+    return obstacle
+
+def absolute_points(obstacle):
+    return [(obstacle["x"] + dx, obstacle["y"] + dy) for dx, dy in obstacle["points"]]
+
+class BoundingVolumeHierarchy:
+    """外接矩形 (min_x, min_y, max_x, max_y) の木。葉は要素の番号のリストを持つ"""
+    def __init__(self, boxes):
+        self.boxes = boxes
+        # ノード: [min_x, min_y, max_x, max_y, 左の子, 右の子, 要素のリスト (葉のみ)]
+        self.nodes = []
+        if boxes:
+            self.build(list(range(len(boxes))))
+
+    def build(self, items):
+        boxes = self.boxes
+        bounds = [min(boxes[i][0] for i in items), min(boxes[i][1] for i in items),
+                  max(boxes[i][2] for i in items), max(boxes[i][3] for i in items)]
+        index = len(self.nodes)
+        self.nodes.append(bounds + [None, None, None])
+        if len(items) <= BVH_LEAF_SIZE:
+            self.nodes[index][6] = items
+            return index
+        # 長い方の軸で、矩形の中心の中央値で2つに分ける
+        axis = 0 if bounds[2] - bounds[0] >= bounds[3] - bounds[1] else 1
+        items.sort(key=lambda i: boxes[i][axis] + boxes[i][axis + 2])
+        middle = len(items) // 2
+        self.nodes[index][4] = self.build(items[:middle])
+        self.nodes[index][5] = self.build(items[middle:])
+        return index
+
+    def query_point(self, x, y, pad):
+        """点を pad だけ広げた矩形に含む要素"""
+        found = []
+        stack = [0] if self.nodes else []
+        while stack:
+            node = self.nodes[stack.pop()]
+            if not (node[0] - pad <= x <= node[2] + pad and node[1] - pad <= y <= node[3] + pad):
+                continue
+            if node[6] is not None:
+                found.extend(node[6])
+            else:
+                stack.append(node[4])
+                stack.append(node[5])
+        return found
+
+    def query_ray(self, x, y, vx, vy, limit, pad):
+        """(x, y) から (x + limit * vx, y + limit * vy) までの線分が pad だけ広げた矩形を通る要素"""
+        found = []
+        stack = [0] if self.nodes else []
+        while stack:
+            node = self.nodes[stack.pop()]
+            low, high = 0.0, limit
+            for position, velocity, box_low, box_high in ((x, vx, node[0] - pad, node[2] + pad),
+                                                          (y, vy, node[1] - pad, node[3] + pad)):
+                if velocity == 0:
+                    if not box_low <= position <= box_high:
+                        high = -1.0
+                    continue
+                a = (box_low - position) / velocity
+                b = (box_high - position) / velocity
+                low, high = max(low, min(a, b)), min(high, max(a, b))
+            if low > high:
+                continue
+            if node[6] is not None:
+                found.extend(node[6])
+            else:
+                stack.append(node[4])
+                stack.append(node[5])
+        return found
+
+class PolygonShape:
+    """多角形・線分の辺 (始点, 終点, 単位接線, 外向き法線, 長さ) と辺のBVH"""
+    def __init__(self, obstacle):
+        self.closed = obstacle["type"] == "polygon"
+        points = absolute_points(obstacle)
+        if self.closed:
+            # 頂点の並びの向きによらず、法線が外を向くようにする
+            area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]))
+            if area < 0:
+                points = points[::-1]
+            pairs = list(zip(points, points[1:] + points[:1]))
+        else:
+            pairs = [(points[0], points[1])]
+        self.points = points
+        self.edges = []
+        for (ax, ay), (bx, by) in pairs:
+            length = math.hypot(bx - ax, by - ay)
+            if length == 0:
+                continue
+            tx, ty = (bx - ax) / length, (by - ay) / length
+            # y軸が下向きの画面座標で、頂点を面積が正の向きに並べたときの外向き
+            self.edges.append((ax, ay, bx, by, tx, ty, ty, -tx, length))
+        boxes = [(min(e[0], e[2]), min(e[1], e[3]), max(e[0], e[2]), max(e[1], e[3])) for e in self.edges]
+        self.bbox = (min(x for x, _ in points), min(y for _, y in points),
+                     max(x for x, _ in points), max(y for _, y in points))
+        self.bvh = BoundingVolumeHierarchy(boxes)
+
+    def contains(self, x, y):
+        """点が多角形の内側にあるか (交差数による判定、線分は常にFalse)"""
+        left, top, right, bottom = self.bbox
+        if not (self.closed and left <= x <= right and top <= y <= bottom):
+            return False
+        inside = False
+        for ax, ay, bx, by, *_ in self.edges:
+            if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+        return inside
+
+    def nearest_edge(self, x, y, candidates):
+        """候補の辺のうち点に最も近いもの (辺, 辺上の位置, 距離の2乗)"""
+        best = None
+        for index in candidates:
+            edge = self.edges[index]
+            ax, ay, _, _, tx, ty, _, _, length = edge
+            t = min(max((x - ax) * tx + (y - ay) * ty, 0.0), length)
+            dx, dy = x - (ax + tx * t), y - (ay + ty * t)
+            distance_sq = dx * dx + dy * dy
+            if best is None or distance_sq < best[2]:
+                best = (edge, t, distance_sq)
+        return best
+
+    def contact_normal(self, x, y, radius):
+        """中心が形状から radius 以内 (または内側) にあれば反射に使う単位法線を、なければNoneを返す"""
+        nearest = self.nearest_edge(x, y, self.bvh.query_point(x, y, radius))
+        inside = self.contains(x, y)
+        if nearest is None:
+            if not inside:
+                return None
+            nearest = self.nearest_edge(x, y, range(len(self.edges)))
+        edge, t, distance_sq = nearest
+        if distance_sq > radius * radius and not inside:
+            return None
+        ax, ay, _, _, tx, ty, nx, ny, length = edge
+        if 0.0 < t < length or distance_sq == 0:
+            # 辺の途中: 辺の法線 (線分はどちら側から当たったかで向きを決める)
+            if not self.closed and (x - ax) * nx + (y - ay) * ny < 0:
+                return -nx, -ny
+            return nx, ny
+        # 頂点: 頂点から中心への向き
+        distance = math.sqrt(distance_sq)
+        return (x - (ax + tx * t)) / distance, (y - (ay + ty * t)) / distance
+
+    def segment_distance_sq(self, x0, y0, x1, y1):
+        """線分と形状の最短距離の2乗 (交わるか内側なら0)"""
+        if self.contains(x0, y0):
+            return 0.0
+        best = None
+        for ax, ay, bx, by, *_ in self.edges:
+            distance_sq = segments_distance_sq(x0, y0, x1, y1, ax, ay, bx, by)
+            if best is None or distance_sq < best:
+                best = distance_sq
+        return best
+
+def _point_segment_distance_sq(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else min(max(((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0), 1.0)
+    ex, ey = px - (ax + dx * t), py - (ay + dy * t)
+    return ex * ex + ey * ey
+
+def segments_distance_sq(x0, y0, x1, y1, ax, ay, bx, by):
+    """2つの線分の最短距離の2乗 (交われば0)"""
+    def cross(ox, oy, px, py, qx, qy):
+        return (px - ox) * (qy - oy) - (py - oy) * (qx - ox)
+    d1 = cross(ax, ay, bx, by, x0, y0)
+    d2 = cross(ax, ay, bx, by, x1, y1)
+    d3 = cross(x0, y0, x1, y1, ax, ay)
+    d4 = cross(x0, y0, x1, y1, bx, by)
+    if ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0)):
+        return 0.0
+    return min(_point_segment_distance_sq(x0, y0, ax, ay, bx, by),
+               _point_segment_distance_sq(x1, y1, ax, ay, bx, by),
+               _point_segment_distance_sq(ax, ay, x0, y0, x1, y1),
+               _point_segment_distance_sq(bx, by, x0, y0, x1, y1))
+
+_shapes = {}
+
+def polygon_shape(obstacle):
+    """障害物の辞書に対応する PolygonShape (位置と頂点が同じなら作ったものを使い回す)"""
+    key = (obstacle["type"], obstacle["x"], obstacle["y"], tuple(map(tuple, obstacle["points"])))
+    shape = _shapes.get(key)
+    if shape is None:
+        if len(_shapes) >= 1024:
+            _shapes.clear()
+        shape = _shapes[key] = PolygonShape(obstacle)
+    return shape
@@ -0,0 +1,70 @@
+"""コアモジュールのimport時間と重い依存の読み込みを確認する
+
+    python -m monsttool.importcheck
+"""
+import json
+import subprocess
+import sys
+
+# Tkや画像処理ライブラリを使わない環境(サーバー、バッチ)から読み込むモジュール
+CORE_MODULES = (
+    "monsttool.paths",
+    "monsttool.profiles",
+    "monsttool.detector",
+    "monsttool.storage",
+    "monsttool.capture",
+    "monsttool.geometry",
+    "monsttool.motion",
+    "monsttool.simulation",
+    "monsttool.resultcache",
+    "monsttool.stagelibrary",
+    "monsttool.tracing",
+    "monsttool.pipeline",
+    "monsttool.overlay",
+    "monsttool.coverage",
+    "monsttool.reachability",
+    "monsttool.batch",
+    "monsttool.robustness",
+    "monsttool.planner",
+    "monsttool.fixedpoint",
+    "monsttool.sdf",
+    "monsttool.unfolding",
+    "monsttool.server",
+)
+# コアのimportで読み込まれてはいけないモジュール
+HEAVY_MODULES = ("tkinter", "cv2", "numpy", "PIL")
+IMPORT_BUDGET = 0.15
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+def measure_import(module):
+    """新しいプロセスでモジュールをimportし、所要時間と読み込まれた重い依存を返す"""
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(budget=IMPORT_BUDGET):
+    failed = False
+    for module in CORE_MODULES:
+        report = measure_import(module)
+        problems = []
+        if report["elapsed"] > budget:
+            problems.append(f"予算{budget * 1000:.0f}ms超過")
+        if report["heavy"]:
+            problems.append("読み込み: " + ", ".join(report["heavy"]))
+        status = "NG " + " / ".join(problems) if problems else "OK"
+        print(f"{module}: {report['elapsed'] * 1000:.1f}ms {status}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""ショット中に動く障害物の動き
+
+障害物の辞書に "motion" を持たせると、x, y はショット開始時の位置になり、そこからずれて動く。
+時間はショット開始からのステップ数 (1ステップでキャラクターは STEP_VELOCITY ピクセル進む) で表す。
+
+  {"type": "linear", "vx": 0.05, "vy": 0.0}
+      1ステップあたり (vx, vy) ピクセルずつ等速で動き続ける
+  {"type": "patrol", "dx": 200, "dy": 0, "period": 4000, "phase": 0}
+      開始位置と (dx, dy) だけずれた位置の間を period ステップで往復する (phase は開始時の経過ステップ)
+
+どちらも区間ごとに等速な動きなので、区間の中ではキャラクターとの相対運動も等速になり、
+静止した障害物と同じ式で最初に触れるステップ数を解ける。キャラクターより速く動く障害物は扱わない。
+"""
+import math
+
+MOTION_TYPES = ("linear", "patrol")
+
+def validate_motion(motion):
+    """動きの設定を確かめる (不正なら ValueError)"""
+    if motion["type"] == "linear":
+        float(motion["vx"]), float(motion["vy"])
+    elif motion["type"] == "patrol":
+        float(motion["dx"]), float(motion["dy"])
+        if not float(motion["period"]) > 0:
+            raise ValueError("往復の周期は正の値にしてください")
+    else:
+        raise ValueError("不明な動きの種類です: %s" % motion["type"])
+    return motion
+
+def motion_state(motion, time):
+    """時刻 time での開始位置からのずれと速度 (ox, oy, ux, uy)"""
+    if motion["type"] == "linear":
+        vx, vy = motion["vx"], motion["vy"]
+        return vx * time, vy * time, vx, vy
+    half = motion["period"] / 2
+    phase = (time + motion.get("phase", 0)) % motion["period"]
+    if phase < half:
+        fraction, direction = phase / half, 1
+    else:
+        fraction, direction = 2 - phase / half, -1
+    return (motion["dx"] * fraction, motion["dy"] * fraction,
+            direction * motion["dx"] / half, direction * motion["dy"] / half)
+
+def motion_pieces(motion, time, limit):
+    """時刻 time から limit ステップ先までを、等速で動く区間に分けて順に返す
+
+    各区間は (始まり, 終わり, 始まりでのずれ ox, oy, 速度 ux, uy)。始まりと終わりは time からのステップ数。
+    """
+    if motion["type"] == "linear":
+        ox, oy, ux, uy = motion_state(motion, time)
+        yield 0, math.inf, ox, oy, ux, uy
+        return
+    half = motion["period"] / 2
+    phase = (time + motion.get("phase", 0)) % half
+    start = 0
+    while start <= limit:
+        end = start + (half - phase)
+        # 区間の境目では向きが変わるので、速度は区間の中ほどで求める
+        ox, oy, _, _ = motion_state(motion, time + start)
+        _, _, ux, uy = motion_state(motion, time + (start + end) / 2)
+        yield start, end, ox, oy, ux, uy
+        start, phase = end, 0
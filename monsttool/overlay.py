@@ -0,0 +1,106 @@
+"""多数の軌道を1枚のRGBA画像にまとめて描画する
+
+Tkのキャンバスに線分ごとのアイテムを作ると数万個になって操作が止まるため、
+軌道は重なり回数として配列に積算し、表示のたびに1枚の画像へ変換する。
+"""
+
+def rasterize_trajectories(trajectories, width, height, cell_size=1, with_segments=False):
+    """軌道が通るマスの通し番号 (y * 幅 + x) と、それぞれがどの軌道のものかを返す
+
+    マスは cell_size ピクセル四方で、width x height はマス単位の大きさ。
+    線分上で同じマスに続けて落ちた点は1回と数える (同じ経路を往復した分は重ねる)。
+    with_segments を指定すると、軌道の何本目の線分 (=それまでの反射回数) かも返す。
+    """
+    import numpy as np
+
+    lengths = np.array([len(t) for t in trajectories], dtype=np.int64)
+    points = np.concatenate([np.asarray(t, dtype=np.float32) for t in trajectories]) / cell_size
+    deltas = points[1:] - points[:-1]
+    # 1マス以下の間隔で線分上に点を打つ (軌道の境目をまたぐ線分は除く)
+    counts = np.maximum(np.ceil(np.abs(deltas).max(axis=1)).astype(np.int64), 1)
+    ends = np.cumsum(lengths)
+    counts[ends[:-1] - 1] = 0
+    segment = np.repeat(np.arange(len(deltas)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = (offsets / np.repeat(np.maximum(counts, 1), counts)).astype(np.float32)[:, None]
+    samples = np.vstack([points[segment] + deltas[segment] * t, points[ends - 1]])
+    owners = np.concatenate([np.searchsorted(ends, segment, side="right"),
+                             np.arange(len(lengths))])
+    xs = np.clip(np.floor(samples[:, 0]).astype(np.int64), 0, width - 1)
+    ys = np.clip(np.floor(samples[:, 1]).astype(np.int64), 0, height - 1)
+    cells = ys * width + xs
+    keep = np.empty(len(cells), dtype=bool)
+    keep[0] = True
+    np.not_equal(cells[1:], cells[:-1], out=keep[1:])
+    keep[1:] |= owners[1:] != owners[:-1]
+    if not with_segments:
+        return cells[keep], owners[keep]
+    first_point = ends - lengths
+    segments = np.concatenate([segment - first_point[owners[:len(segment)]],
+                               np.maximum(lengths - 2, 0)])
+    return cells[keep], owners[keep], segments[keep]
+
+class TrajectoryOverlay:
+    """軌道の重なりを積算し、アルファ合成したRGBA画像を作る
+
+    1本あたりの不透明度 alpha を n 本重ねた結果は 1 - (1 - alpha)^n になる。
+    """
+    def __init__(self, width, height, color=(0, 255, 0), alpha=0.08, thickness=2):
+        import numpy as np
+
+        self.width = width
+        self.height = height
+        self.color = color
+        self.alpha = alpha
+        self.thickness = thickness
+        self.counts = np.zeros((height, width), dtype=np.float32)
+        self.trajectory_count = 0
+        self.dirty = False
+        self.cached = None
+
+    def clear(self):
+        self.counts.fill(0)
+        self.trajectory_count = 0
+        self.dirty = True
+
+    def add_trajectories(self, trajectories):
+        import numpy as np
+
+        trajectories = [t for t in trajectories if len(t) >= 2]
+        if not trajectories:
+            return
+        pixels, _ = rasterize_trajectories(trajectories, self.width, self.height)
+        hits = np.bincount(pixels, minlength=self.width * self.height)
+        self.counts += hits.reshape(self.height, self.width).astype(np.float32)
+        self.trajectory_count += len(trajectories)
+        self.dirty = True
+
+    def add_trajectory(self, trajectory):
+        self.add_trajectories([trajectory])
+
+    def render(self):
+        """RGBA (uint8, 高さx幅x4) の画像を返す。変化がなければ前回の画像を使い回す"""
+        import cv2
+        import numpy as np
+
+        if self.cached is not None and not self.dirty:
+            return self.cached
+        counts = self.counts
+        if self.thickness > 1:
+            # 1ピクセル幅で積算した回数を近傍の最大値で太らせる
+            kernel = np.ones((self.thickness, self.thickness), dtype=np.uint8)
+            counts = cv2.dilate(counts, kernel)
+        rgba = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        rgba[..., 0] = self.color[0]
+        rgba[..., 1] = self.color[1]
+        rgba[..., 2] = self.color[2]
+        coverage = 1.0 - np.power(1.0 - self.alpha, counts)
+        rgba[..., 3] = np.clip(coverage * 255.0, 0, 255).astype(np.uint8)
+        self.cached = rgba
+        self.dirty = False
+        return rgba
+
+    def to_pil(self):
+        from PIL import Image
+
+        return Image.fromarray(self.render(), "RGBA")
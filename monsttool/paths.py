@@ -0,0 +1,18 @@
+import os
+import sys
+
+def resource_path(relative_path):
+     if hasattr(sys, '_MEIPASS'):
+         return os.path.join(sys._MEIPASS, relative_path)
+     return os.path.join(os.path.abspath("."), relative_path)
+
+def default_screenshot_dir():
+    # PyInstallerの一時展開先は終了時に消えるため、ホームディレクトリに保存する
+    return os.path.join(os.path.expanduser("~"), "MonsterStrikeSimulator")
+
+def default_result_cache_path():
+    # 計算結果のキャッシュも起動をまたいで残るよう、同じ場所に置く
+    return os.path.join(default_screenshot_dir(), "results.sqlite3")
+
+def default_stage_library_path():
+    return os.path.join(default_screenshot_dir(), "stages.sqlite3")
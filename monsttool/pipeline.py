@@ -0,0 +1,90 @@
+import time
+
+from monsttool import tracing
+from monsttool.detector import PlayerIconDetector
+from monsttool.resultcache import sweep_key
+from monsttool.robustness import robust_best_shot
+from monsttool.simulation import best_shot, sweep_angle_order, sweep_angles
+
+class ShotPipeline:
+    """撮影→アイコン検出→開始位置の設定→角度スイープを一括で実行する"""
+    def __init__(self, frame_source, latency_budget=1.5):
+        self.frame_source = frame_source
+        # 検出器は初回の実行時に作成する (numpyの読み込みを起動時に行わない)
+        self.icon_detector = None
+        # 撮影から表示までの目標時間 (秒)。スイープはこの範囲で打ち切る
+        self.latency_budget = latency_budget
+        # 表示の更新用に残しておく割合
+        self.render_reserve = 0.2
+        # 安定度を調べる上位候補の数 (0なら調べない)
+        self.robust_candidates = 8
+        # 全角度スイープの結果を保存する ResultCache (Noneなら毎回計算する)
+        self.result_cache = None
+
+    def run(self, obstacles, max_reflections, frame=None, decay=None, pierce=False):
+        """プレイヤーごとの最良ショットと各段階の処理時間を返す (decay は減速モードの設定、pierce は貫通)"""
+        started = time.perf_counter()
+        timings = {}
+
+        stage_start = time.perf_counter()
+        if frame is None:
+            frame = self.frame_source.capture(publish=False)
+        timings["capture"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        if frame.detections is None:
+            if self.icon_detector is None:
+                self.icon_detector = PlayerIconDetector()
+            frame.detections, _ = self.icon_detector.detect_icon_in_cropped(frame.cropped)
+        players = [(result['resized_center']['x'], result['resized_center']['y'])
+                   for result in frame.detections]
+        timings["detect"] = time.perf_counter() - stage_start
+
+        # 残りの時間をプレイヤー数で分け、粗い角度から順に調べる
+        stage_start = time.perf_counter()
+        deadline = started + self.latency_budget * (1 - self.render_reserve)
+        order = sweep_angle_order()
+        shots = []
+        for i, (player_x, player_y) in enumerate(players):
+            key = results = None
+            if self.result_cache is not None:
+                with tracing.span("simulate.cache_lookup"):
+                    key = sweep_key(player_x, player_y, max_reflections, obstacles, decay=decay, pierce=pierce)
+                    results = self.result_cache.get_sweep(key)
+            if results is None:
+                now = time.perf_counter()
+                player_deadline = now + max(0.0, deadline - now) / (len(players) - i)
+                with tracing.span("simulate.sweep", player=i):
+                    results = sweep_angles(player_x, player_y, max_reflections, obstacles,
+                                           order, player_deadline, decay=decay, pierce=pierce)
+                # 最後まで調べられたときだけ保存する
+                if key is not None:
+                    with tracing.span("simulate.cache_store"):
+                        self.result_cache.put_sweep(key, results)
+            shots.append({
+                "x": player_x,
+                "y": player_y,
+                "results": results,
+                "evaluated": len(results),
+            })
+        timings["sweep"] = time.perf_counter() - stage_start
+
+        # 時間が残っていれば、評価値が同じ候補のうちずれに強いものを選ぶ
+        stage_start = time.perf_counter()
+        for shot in shots:
+            results = shot.pop("results")
+            robust = None
+            if self.robust_candidates and time.perf_counter() < deadline:
+                with tracing.span("simulate.robustness"):
+                    robust = robust_best_shot(results, shot["x"], shot["y"], max_reflections,
+                                              obstacles, self.robust_candidates, decay=decay, pierce=pierce)
+            if robust is not None:
+                shot["angle"], shot["result"], shot["robustness"] = robust
+            else:
+                best = best_shot(results)
+                shot["angle"] = best[0] if best else None
+                shot["result"] = best[1] if best else None
+                shot["robustness"] = None
+        timings["robustness"] = time.perf_counter() - stage_start
+
+        return {"frame": frame, "shots": shots, "timings": timings, "started": started}
@@ -0,0 +1,156 @@
+"""障害物の耐久回数を引き継ぎながら、複数ターンのショットをビームサーチで計画する
+
+ターンは検出したプレイヤーの順に回り、各プレイヤーは前に自分が撃って止まった位置から
+次のショットを撃つ。状態 (残り耐久回数と各プレイヤーの位置) はタプルで持つので複製が安く、
+同じ状態からの展開は覚えておいて使い回す。ビーム内の状態の展開はプロセスプールで並列にできる。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from monsttool.batch import simulate_batch
+from monsttool.profiles import FIELD_SIZE
+from monsttool.simulation import simulate_shot
+
+def initial_durability(obstacles):
+    """障害物ごとの残り耐久回数のタプル (耐久回数で壊れない障害物は None)"""
+    return tuple(obstacle["durability"] if obstacle["type"] == "circle" and "durability" in obstacle
+                 else None for obstacle in obstacles)
+
+def expand_state(durability, position, angles, max_reflections, obstacles, branch,
+                 field_width, field_height, decay=None, pierce=False):
+    """1つの状態から全角度を撃ち、結果の異なるショットを良い順に branch 個返す (ワーカーで実行)
+
+    戻り値は [(角度, 撃った後の耐久回数, 止まった位置, 壊した数, 当たった回数), ...]。
+    """
+    import numpy as np
+
+    angles = list(angles)
+    batch = simulate_batch([position[0]] * len(angles), [position[1]] * len(angles), angles,
+                           max_reflections, obstacles, field_width, field_height, durability, decay, pierce)
+    hits = batch["hits"]
+    destroyed_counts = batch["destroyed"].sum(axis=1)
+    hit_counts = hits.sum(axis=1)
+    tracked = np.array([remaining is not None for remaining in durability], dtype=bool)
+    before = np.array([0 if remaining is None else remaining for remaining in durability])
+    after = np.where(tracked, before - hits, 0)
+    end_x = np.rint(batch["end_x"]).astype(np.int64)
+    end_y = np.rint(batch["end_y"]).astype(np.int64)
+
+    # 評価の高い順に見て、同じ状態になるショットは最初の1本だけ残す
+    order = np.lexsort((-hit_counts, -destroyed_counts))
+    children = []
+    seen = set()
+    for row in order.tolist():
+        remaining = tuple(int(value) if flag else None for value, flag in zip(after[row], tracked))
+        end = (int(end_x[row]), int(end_y[row]))
+        if (remaining, end) in seen:
+            continue
+        seen.add((remaining, end))
+        children.append((angles[row], remaining, end, int(destroyed_counts[row]), int(hit_counts[row])))
+        if len(children) >= branch:
+            break
+    return children
+
+class ShotPlanner:
+    """複数ターンの計画を立てる
+
+    beam_width はターンごとに残す状態の数、branch は1つの状態から広げるショットの数。
+    workers が2以上なら、ビーム内の状態をプロセスプールで並列に展開する。
+    decay を渡すと減速モードで、pierce なら貫通で撃つ (simulate_shot と同じ設定)。
+    """
+    def __init__(self, obstacles, max_reflections, beam_width=8, branch=4, angles=None, workers=1,
+                 field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], decay=None, pierce=False):
+        self.obstacles = [dict(obstacle) for obstacle in obstacles]
+        self.max_reflections = max_reflections
+        self.beam_width = beam_width
+        self.branch = branch
+        self.angles = list(range(1024) if angles is None else angles)
+        self.workers = workers
+        self.field_width = field_width
+        self.field_height = field_height
+        self.decay = decay
+        self.pierce = pierce
+        # (耐久回数, 撃つ位置) → 展開結果
+        self.expansions = {}
+        self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def expand_all(self, keys):
+        """まだ展開していない (耐久回数, 位置) をまとめて展開する"""
+        pending = [key for key in dict.fromkeys(keys) if key not in self.expansions]
+        arguments = [(durability, position, self.angles, self.max_reflections, self.obstacles,
+                      self.branch, self.field_width, self.field_height, self.decay, self.pierce)
+                     for durability, position in pending]
+        if self.workers > 1 and len(pending) > 1:
+            if self.pool is None:
+                context = multiprocessing.get_context("spawn")
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            results = self.pool.map(expand_state, *zip(*arguments))
+        else:
+            results = (expand_state(*args) for args in arguments)
+        for key, children in zip(pending, results):
+            self.expansions[key] = children
+        return len(pending)
+
+    def plan(self, players, turns):
+        """players (開始位置のリスト) が順に turns 回撃つときの最良の計画を返す
+
+        戻り値は辞書:
+          shots      ターンごとの {"player", "x", "y", "angle", "result"}
+          destroyed  壊した障害物の合計
+          hits       当たった回数の合計
+          durability 計画後の残り耐久回数
+          expanded   新たに展開した状態の数 (残りは覚えていた結果を使った)
+        """
+        if not players:
+            return None
+        start = (initial_durability(self.obstacles), tuple(tuple(p) for p in players))
+        # ビームの要素: (壊した数, 当たった回数, 状態, 角度のリスト)
+        beam = [(0, 0, start, [])]
+        expanded = 0
+        for turn in range(turns):
+            player = turn % len(players)
+            expanded += self.expand_all([(state[0], state[1][player]) for _, _, state, _ in beam])
+            candidates = {}
+            for destroyed, hits, (durability, positions), angles in beam:
+                for angle, remaining, end, shot_destroyed, shot_hits in \
+                        self.expansions[(durability, positions[player])]:
+                    next_positions = positions[:player] + (end,) + positions[player + 1:]
+                    state = (remaining, next_positions)
+                    entry = (destroyed + shot_destroyed, hits + shot_hits, state, angles + [angle])
+                    # 同じ状態に別の順で着いた場合は評価の高い方だけ残す
+                    if state not in candidates or entry[:2] > candidates[state][:2]:
+                        candidates[state] = entry
+            beam = sorted(candidates.values(), key=lambda entry: entry[:2], reverse=True)
+            beam = beam[:self.beam_width]
+
+        destroyed, hits, (durability, _), angles = beam[0]
+        return {
+            "shots": self.replay(players, angles),
+            "destroyed": destroyed,
+            "hits": hits,
+            "durability": durability,
+            "expanded": expanded,
+        }
+
+    def replay(self, players, angles):
+        """計画した角度を順に撃ち直し、表示用の軌道を含む結果を返す"""
+        durability = list(initial_durability(self.obstacles))
+        positions = [tuple(p) for p in players]
+        shots = []
+        for turn, angle in enumerate(angles):
+            player = turn % len(players)
+            x, y = positions[player]
+            result = simulate_shot(x, y, angle, self.max_reflections, self.obstacles,
+                                   self.field_width, self.field_height, durability, self.decay, self.pierce)
+            for index in result["hits"]:
+                if durability[index] is not None:
+                    durability[index] -= 1
+            shots.append({"player": player, "x": x, "y": y, "angle": angle, "result": result})
+            end_x, end_y = result["trajectory"][-1]
+            positions[player] = (int(round(end_x)), int(round(end_y)))
+        return shots
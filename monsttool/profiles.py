@@ -0,0 +1,98 @@
+# 基準端末(1080x2400)でのフィールド領域とシミュレーターのフィールドサイズ
+REFERENCE_SCREEN_SIZE = (1080, 2400)
+REFERENCE_CROP = (0, 440, 1080, 1215)
+FIELD_SIZE = (640, 720)
+
+# 実機で確認済みのクロップ領域 (画面幅, 画面高さ) -> (x, y, 幅, 高さ)
+KNOWN_DEVICE_CROPS = {
+    (1080, 2400): REFERENCE_CROP,
+}
+
+class DeviceProfile:
+    """端末解像度ごとのクロップ領域とフィールドへの変換をまとめたもの"""
+    def __init__(self, screen_width, screen_height, crop):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.crop_x, self.crop_y, self.crop_width, self.crop_height = crop
+        self.crop_box = (self.crop_x, self.crop_y,
+                         self.crop_x + self.crop_width, self.crop_y + self.crop_height)
+        self.field_width, self.field_height = FIELD_SIZE
+
+        # 検出のしきい値は基準クロップ(1080x1215)のピクセル単位で調整されている
+        self.detect_width, self.detect_height = REFERENCE_CROP[2], REFERENCE_CROP[3]
+        self.is_reference = (self.crop_width, self.crop_height) == (self.detect_width, self.detect_height)
+
+        # 出力サイズごとのremapテーブル (初回使用時に一度だけ作成)
+        self._remap_tables = {}
+
+    @property
+    def name(self):
+        return f"{self.screen_width}x{self.screen_height}"
+
+    def remap_tables(self, out_width, out_height, origin_y=0):
+        """クロップと拡大縮小を1回のremapで行うためのテーブルを返す
+
+        origin_y は画像の1行目が画面の何行目か (フィールドの行だけ転送した場合)。
+        """
+        import cv2
+        import numpy as np
+
+        key = (out_width, out_height, origin_y)
+        tables = self._remap_tables.get(key)
+        if tables is None:
+            scale_x = self.crop_width / out_width
+            scale_y = self.crop_height / out_height
+            map_x = self.crop_x + (np.arange(out_width, dtype=np.float32) + 0.5) * scale_x - 0.5
+            map_y = self.crop_y - origin_y + (np.arange(out_height, dtype=np.float32) + 0.5) * scale_y - 0.5
+            map_x, map_y = np.meshgrid(map_x, map_y)
+            # 固定小数点形式に変換しておくとremapが高速になる
+            tables = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            self._remap_tables[key] = tables
+        return tables
+
+    def crop_for_detection(self, image, origin_y=0):
+        """検出用に基準サイズのクロップ画像を返す"""
+        import cv2
+
+        if self.is_reference:
+            x, y, right, bottom = self.crop_box
+            return image[y - origin_y:bottom - origin_y, x:right]
+        map1, map2 = self.remap_tables(self.detect_width, self.detect_height, origin_y)
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+    def to_field(self, image, origin_y=0):
+        """BGR画像をフィールドサイズ(640x720)に変換する"""
+        import cv2
+
+        map1, map2 = self.remap_tables(self.field_width, self.field_height, origin_y)
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+_device_profiles = {}
+
+def get_device_profile(screen_width, screen_height):
+    """画面サイズに対応する端末プロファイルを返す (同じ解像度は使い回す)"""
+    key = (screen_width, screen_height)
+    profile = _device_profiles.get(key)
+    if profile is None:
+        crop = KNOWN_DEVICE_CROPS.get(key)
+        if crop is None:
+            # 未登録の解像度は基準端末から推定する (フィールドは画面幅に合わせて拡縮、縦は画面中央基準)
+            scale = screen_width / REFERENCE_SCREEN_SIZE[0]
+            crop_height = min(screen_height, int(round(REFERENCE_CROP[3] * scale)))
+            center_offset = REFERENCE_SCREEN_SIZE[1] / 2 - REFERENCE_CROP[1]
+            crop_y = int(round(screen_height / 2 - center_offset * scale))
+            crop_y = max(0, min(crop_y, screen_height - crop_height))
+            crop = (0, crop_y, screen_width, crop_height)
+        profile = DeviceProfile(screen_width, screen_height, crop)
+        _device_profiles[key] = profile
+    return profile
+
+def read_screencap_size(data):
+    """screencapの出力ヘッダーから画面サイズ(幅, 高さ)を読み取る"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        # PNGはIHDRチャンクに幅と高さが入っている
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    if len(data) >= 12:
+        # rawはリトルエンディアンの幅、高さ、フォーマット
+        return int.from_bytes(data[0:4], "little"), int.from_bytes(data[4:8], "little")
+    raise ValueError("スクリーンショットのヘッダーを読み取れませんでした")
@@ -0,0 +1,216 @@
+"""開始位置から、どの角度が各障害物・各マスに届くかの索引
+
+角度スイープの結果から、障害物ごと・マスごとに (角度, 反射回数) の昇順リストを作る。
+配置を変えたときは、変わった障害物に触れていた軌道と新しい障害物に触れる軌道だけを
+シミュレーションし直す。
+"""
+from monsttool.profiles import FIELD_SIZE
+from monsttool.simulation import CHARACTER_RADIUS, simulate_shot
+
+ANGLE_COUNT = 1024
+
+class ReachabilityIndex:
+    """1つの開始位置についての 障害物/マス → [(角度, 反射回数), ...] の索引
+
+    障害物の反射回数はその障害物に当たったのが何回目の反射か、マスの反射回数は
+    そのマスを通ったときまでに何回反射していたか (最初に通ったとき) を表す。
+    """
+    def __init__(self, start_x, start_y, max_reflections, obstacles, cell_size=16,
+                 field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], decay=None, pierce=False,
+                 results=None):
+        self.start_x = start_x
+        self.start_y = start_y
+        self.max_reflections = max_reflections
+        self.decay = decay
+        self.pierce = pierce
+        self.cell_size = cell_size
+        self.field_width = field_width
+        self.field_height = field_height
+        self.cells_w = -(-field_width // cell_size)
+        self.cells_h = -(-field_height // cell_size)
+        self.obstacles = []
+        self.results = [None] * ANGLE_COUNT
+        # 角度ごとの通過マスと反射回数 (作り直しが必要な角度はNone)
+        self.angle_cells = [None] * ANGLE_COUNT
+        self.obstacle_angles = {}
+        self.cell_angles = {}
+        if results is not None:
+            # 同じ条件で保存しておいた全角度スイープの結果から作る (シミュレーションしない)
+            self.obstacles = [dict(obstacle) for obstacle in obstacles]
+            for angle, result in results:
+                self.results[angle] = result
+            self.rebuild_tables()
+        else:
+            self.update(obstacles)
+
+    def matches(self, start_x, start_y, max_reflections, decay=None, pierce=False):
+        return ((self.start_x, self.start_y, self.max_reflections, self.decay, self.pierce) ==
+                (start_x, start_y, max_reflections, decay, pierce))
+
+    def update(self, obstacles):
+        """配置の変更を反映する。シミュレーションし直した角度の数を返す"""
+        old_obstacles = self.obstacles
+        mapping, removed, added = match_obstacles(old_obstacles, obstacles)
+        self.obstacles = [dict(obstacle) for obstacle in obstacles]
+
+        if all(result is None for result in self.results):
+            stale = set(range(ANGLE_COUNT))
+        else:
+            changed = [old_obstacles[i] for i in removed] + [obstacles[i] for i in added]
+            stale = self.angles_touching(changed)
+            # 変更のなかった障害物は番号だけ付け替える
+            for angle, result in enumerate(self.results):
+                if angle not in stale:
+                    result["hits"] = [mapping[index] for index in result["hits"]]
+                    result["destroyed"] = [mapping[index] for index in result["destroyed"]]
+
+        for angle in stale:
+            self.results[angle] = simulate_shot(self.start_x, self.start_y, angle,
+                                                self.max_reflections, self.obstacles,
+                                                self.field_width, self.field_height,
+                                                decay=self.decay, pierce=self.pierce)
+            self.angle_cells[angle] = None
+        self.rebuild_tables()
+        return len(stale)
+
+    def angles_touching(self, obstacles):
+        """いずれかの障害物に触れうる軌道の角度 (距離で判定するので多めに拾う)"""
+        import numpy as np
+
+        if not obstacles:
+            return set()
+        if any("motion" in obstacle for obstacle in obstacles):
+            # 動く障害物はどこで軌道と出会うかが時刻によるので、全角度を計算し直す
+            return set(range(ANGLE_COUNT))
+        starts, ends, owners = self.segment_arrays()
+        stale = np.zeros(len(owners), dtype=bool)
+        for obstacle in obstacles:
+            center = np.array([obstacle["x"], obstacle["y"]], dtype=np.float64)
+            reach = CHARACTER_RADIUS + obstacle["size"]
+            if obstacle["type"] == "square":
+                # 正方形の当たり判定は半径分広げた正方形なので、その外接円で判定する
+                # (多角形と線分の size は頂点までの距離なので、そのままで外接円になる)
+                reach *= 2 ** 0.5
+            # 線分と中心の距離 (+1 は1ステップ分の余裕)
+            direction = ends - starts
+            length_sq = np.maximum((direction ** 2).sum(axis=1), 1e-12)
+            t = np.clip(((center - starts) * direction).sum(axis=1) / length_sq, 0.0, 1.0)
+            nearest = starts + direction * t[:, None]
+            distance_sq = ((nearest - center) ** 2).sum(axis=1)
+            stale |= distance_sq <= (reach + 1) ** 2
+        return set(int(angle) for angle in np.unique(owners[stale]))
+
+    def segment_arrays(self):
+        """全角度の軌道の線分を (始点, 終点, 角度) の配列で返す"""
+        import numpy as np
+
+        starts, ends, owners = [], [], []
+        for angle, result in enumerate(self.results):
+            points = np.asarray(result["trajectory"], dtype=np.float64)
+            if len(points) < 2:
+                points = np.vstack([points, points])
+            starts.append(points[:-1])
+            ends.append(points[1:])
+            owners.append(np.full(len(points) - 1, angle))
+        return np.concatenate(starts), np.concatenate(ends), np.concatenate(owners)
+
+    def rebuild_tables(self):
+        import numpy as np
+
+        from monsttool.overlay import rasterize_trajectories
+
+        obstacle_angles = {}
+        for angle, result in enumerate(self.results):
+            for index, bounce in zip(result["hits"], result["hit_bounces"]):
+                obstacle_angles.setdefault(index, []).append((angle, bounce))
+        for entries in obstacle_angles.values():
+            entries.sort()
+
+        # 作り直した角度の軌道だけ塗り直し、ほかは前回の結果を使う
+        stale = [angle for angle in range(ANGLE_COUNT) if self.angle_cells[angle] is None]
+        if stale:
+            trajectories = []
+            for angle in stale:
+                trajectory = self.results[angle]["trajectory"]
+                trajectories.append(trajectory if len(trajectory) >= 2 else trajectory * 2)
+            cells, owners, bounces = rasterize_trajectories(
+                trajectories, self.cells_w, self.cells_h, self.cell_size, with_segments=True
+            )
+            # 終点の標本は末尾にまとめて付くので、軌道ごとに並べ直してから分ける
+            order = np.argsort(owners, kind="stable")
+            sorted_owners = owners[order]
+            boundaries = np.flatnonzero(sorted_owners[1:] != sorted_owners[:-1]) + 1
+            for group in np.split(order, boundaries):
+                angle = stale[int(owners[group[0]])]
+                self.angle_cells[angle] = (cells[group], bounces[group])
+        cells = np.concatenate([self.angle_cells[angle][0] for angle in range(ANGLE_COUNT)])
+        bounces = np.concatenate([self.angle_cells[angle][1] for angle in range(ANGLE_COUNT)])
+        angles = np.repeat(np.arange(ANGLE_COUNT),
+                           [len(self.angle_cells[angle][0]) for angle in range(ANGLE_COUNT)])
+        # マスと角度の組ごとに最初に通ったときの反射回数だけを残す
+        order = np.lexsort((bounces, angles, cells))
+        cells, angles, bounces = cells[order], angles[order], bounces[order]
+        first = np.ones(len(cells), dtype=bool)
+        first[1:] = (cells[1:] != cells[:-1]) | (angles[1:] != angles[:-1])
+        cells, angles, bounces = cells[first], angles[first], bounces[first]
+        boundaries = np.flatnonzero(cells[1:] != cells[:-1]) + 1
+        cell_angles = {}
+        for group in np.split(np.arange(len(cells)), boundaries):
+            if len(group):
+                cell_angles[int(cells[group[0]])] = list(zip(angles[group].tolist(),
+                                                             bounces[group].tolist()))
+
+        self.obstacle_angles = obstacle_angles
+        self.cell_angles = cell_angles
+
+    def angles_for_obstacle(self, index, max_bounce=None):
+        """障害物に当たる (角度, 反射回数) のリスト"""
+        entries = self.obstacle_angles.get(index, [])
+        if max_bounce is None:
+            return entries
+        return [entry for entry in entries if entry[1] <= max_bounce]
+
+    def angles_for_point(self, x, y, max_bounce=None):
+        """座標を含むマスを通る (角度, 反射回数) のリスト"""
+        column = min(max(int(x) // self.cell_size, 0), self.cells_w - 1)
+        row = min(max(int(y) // self.cell_size, 0), self.cells_h - 1)
+        entries = self.cell_angles.get(row * self.cells_w + column, [])
+        if max_bounce is None:
+            return entries
+        return [entry for entry in entries if entry[1] <= max_bounce]
+
+def match_obstacles(old_obstacles, new_obstacles):
+    """配置の差分を求める
+
+    戻り値は (旧番号→新番号, 消えた旧番号のリスト, 増えた新番号のリスト)。
+    内容がまったく同じ障害物を同じものとみなす。
+    """
+    unmatched = {}
+    for new_index, obstacle in enumerate(new_obstacles):
+        unmatched.setdefault(repr(sorted(obstacle.items())), []).append(new_index)
+    mapping = {}
+    removed = []
+    for old_index, obstacle in enumerate(old_obstacles):
+        candidates = unmatched.get(repr(sorted(obstacle.items())))
+        if candidates:
+            mapping[old_index] = candidates.pop(0)
+        else:
+            removed.append(old_index)
+    matched = set(mapping.values())
+    added = [i for i in range(len(new_obstacles)) if i not in matched]
+    return mapping, removed, added
+
+def angle_ranges(entries):
+    """(角度, 反射回数) のリストを連続した角度の範囲 [(開始, 終了, 最小の反射回数), ...] にまとめる"""
+    best = {}
+    for angle, bounce in entries:
+        if angle not in best or bounce < best[angle]:
+            best[angle] = bounce
+    ranges = []
+    for angle in sorted(best):
+        if ranges and ranges[-1][1] == angle - 1:
+            first, _, bounce = ranges[-1]
+            ranges[-1] = (first, angle, min(bounce, best[angle]))
+        else:
+            ranges.append((angle, angle, best[angle]))
+    return ranges
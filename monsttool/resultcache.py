@@ -0,0 +1,197 @@
+"""計算結果をディスクに保存し、次回以降の起動で使い回す
+
+    python -m monsttool.resultcache
+    python -m monsttool.resultcache --clear
+
+全角度スイープの結果を、配置・開始位置・条件・計算方式のバージョンから作ったキーで
+SQLite に保存する。同じステージを読み込み直したときは、軌道の重ね合わせや到達角度の索引、
+最良ショットを再計算せずにすぐ表示できる。結果は圧縮したJSONで持ち、合計の大きさが上限を
+超えたら最後に使ったのが古いものから消す。
+WALモードで開き、書き込みは短いトランザクションにまとめるので、バッチのワーカープロセスが
+同時に書き込んでも壊れない (ロック中は待ってから書き込む)。
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from monsttool.paths import default_result_cache_path
+from monsttool.profiles import FIELD_SIZE
+
+# 保存する形式を変えたら上げる
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# ロックが解けるまで待つ秒数
+LOCK_TIMEOUT = 30.0
+# 最後に使った時刻はこの秒数より古いときだけ書き換える (読み込みのたびに書き込まない)
+TOUCH_INTERVAL = 60.0
+
+def open_database(path):
+    """複数プロセスから同時に読み書きできる設定で SQLite のファイルを開く (自動コミット)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+def engine_version(engine="float"):
+    """計算方式の名前 ("float"、"fixed"、"sdf") に対応する結果のバージョン"""
+    if engine == "fixed":
+        from monsttool.fixedpoint import ENGINE_VERSION
+
+        return ENGINE_VERSION
+    if engine in ("float", "sdf"):
+        from monsttool.simulation import ENGINE_VERSION
+
+        return ENGINE_VERSION
+    raise ValueError(f"不明なengineです: {engine}")
+
+def sweep_key(start_x, start_y, max_reflections, obstacles, field_width=FIELD_SIZE[0],
+              field_height=FIELD_SIZE[1], engine="float", decay=None, pierce=False):
+    """全角度スイープの結果を引くキー (障害物の順番も含めて同じ条件なら同じ値)"""
+    payload = json.dumps(["sweep", CACHE_VERSION, engine, engine_version(engine), float(start_x), float(start_y),
+                          int(max_reflections), obstacles, int(field_width), int(field_height),
+                          decay, bool(pierce)],
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _decode_result(result):
+    # JSONでは座標の組がリストになるので、計算したときと同じタプルに戻す
+    result["trajectory"] = [tuple(point) for point in result["trajectory"]]
+    return result
+
+class ResultCache:
+    """キー → 計算結果 の SQLite のキャッシュ
+
+    読み書きに失敗してもキャッシュがないものとして扱い、計算そのものは止めない。
+    """
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_result_cache_path()
+        self.max_bytes = max_bytes
+        self.connection = None
+        self.hits = 0
+        self.misses = 0
+
+    def connect(self):
+        # 接続はプロセスごとに作る (ワーカーには開く前のオブジェクトかパスを渡す)
+        if self.connection is None:
+            connection = open_database(self.path)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, payload BLOB NOT NULL,"
+                "size INTEGER NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self.connection = connection
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __getstate__(self):
+        # プロセスプールに渡すときは接続を持たせない
+        state = dict(self.__dict__)
+        state["connection"] = None
+        return state
+
+    def get(self, key):
+        """保存した値 (なければNone)"""
+        try:
+            connection = self.connect()
+            row = connection.execute("SELECT payload, used FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                connection.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+            value = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        except (sqlite3.Error, zlib.error, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, kind, value):
+        """値を保存し、合計が上限を超えたら古いものから消す。保存できたかを返す"""
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        if len(payload) > self.max_bytes:
+            return False
+        try:
+            connection = self.connect()
+            now = time.time()
+            # 書き込みのロックを最初に取り、合計の計算と削除が他のプロセスと混ざらないようにする
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (key, kind, payload, size, created, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, payload, len(payload), now, now)
+                )
+                self.evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            return False
+        return True
+
+    def evict(self, connection):
+        excess = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return 0
+        removed = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY used"):
+            removed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM results WHERE key = ?", removed)
+        return len(removed)
+
+    def get_sweep(self, key):
+        """保存した全角度スイープの結果 [(角度, 結果), ...] (なければNone)"""
+        value = self.get(key)
+        if value is None:
+            return None
+        return [(angle, _decode_result(result)) for angle, result in value]
+
+    def put_sweep(self, key, results):
+        """全角度スイープの結果を保存する (途中で打ち切ったスイープは保存しない)"""
+        if len(results) != 1024:
+            return False
+        ordered = sorted(results, key=lambda item: item[0])
+        return self.put(key, "sweep", [[angle, result] for angle, result in ordered])
+
+    def stats(self):
+        connection = self.connect()
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        self.connect().execute("DELETE FROM results")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="保存した計算結果のキャッシュの件数と大きさを表示する")
+    parser.add_argument("--path", default=None, help="キャッシュのファイル (省略時はホームディレクトリ)")
+    parser.add_argument("--clear", action="store_true", help="すべて削除する")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.path)
+    if args.clear:
+        cache.clear()
+    stats = cache.stats()
+    print(f"{stats['path']}: {stats['entries']}件, {stats['bytes'] / 1024 / 1024:.1f}MB "
+          f"(上限 {stats['max_bytes'] / 1024 / 1024:.0f}MB)")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
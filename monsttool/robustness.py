@@ -0,0 +1,86 @@
+"""ショットの安定度 (角度と開始位置のずれに対する結果のばらつき) を調べる
+
+実際のショットは入力した角度ぴったりには飛ばないので、角度を ±angle_spread、
+開始位置を ±position_jitter ずらしたショットをまとめてシミュレーションし、
+結果の分布を返す。
+"""
+from monsttool.batch import simulate_batch
+from monsttool.profiles import FIELD_SIZE
+
+def jitter_samples(start_x, start_y, angle, angle_spread=4, position_jitter=3):
+    """角度と開始位置をずらした (x, y, 角度) の配列を返す (先頭は元のショット)"""
+    shifts = sorted(set((-position_jitter, 0, position_jitter)))
+    samples = [(0, 0, 0)]
+    for dx in shifts:
+        for dy in shifts:
+            for delta in range(-angle_spread, angle_spread + 1):
+                if (dx, dy, delta) != (0, 0, 0):
+                    samples.append((dx, dy, delta))
+    xs = [start_x + dx for dx, _, _ in samples]
+    ys = [start_y + dy for _, dy, _ in samples]
+    angles = [(angle + delta) % 1024 for _, _, delta in samples]
+    return xs, ys, angles
+
+def analyze_robustness(start_x, start_y, angle, max_reflections, obstacles, angle_spread=4,
+                       position_jitter=3, field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], decay=None,
+                       pierce=False):
+    """ずらしたショットの結果の分布を返す
+
+    戻り値の辞書:
+      samples        シミュレーションした本数
+      stability      元のショットと同じ評価値 (壊した数, 当たった回数) になった割合
+      hit_rate       障害物ごとの、1回以上当たった割合
+      mean_hits      障害物ごとの平均の当たった回数
+      destroy_rate   障害物ごとの、壊した割合
+      destroyed      壊した数ごとの割合 {壊した数: 割合}
+      end_spread     止まった位置の標準偏差 (x, y)
+      end_max_shift  元のショットの止まった位置からの最大のずれ
+    """
+    import numpy as np
+
+    xs, ys, angles = jitter_samples(start_x, start_y, angle, angle_spread, position_jitter)
+    batch = simulate_batch(xs, ys, angles, max_reflections, obstacles, field_width, field_height,
+                           decay=decay, pierce=pierce)
+    hits = batch["hits"]
+    destroyed = batch["destroyed"]
+    samples = len(xs)
+
+    destroyed_counts = destroyed.sum(axis=1)
+    hit_counts = hits.sum(axis=1)
+    same_score = (destroyed_counts == destroyed_counts[0]) & (hit_counts == hit_counts[0])
+    values, counts = np.unique(destroyed_counts, return_counts=True)
+    histogram = {int(value): int(count) / samples for value, count in zip(values, counts)}
+
+    end_x, end_y = batch["end_x"], batch["end_y"]
+    shifts = np.hypot(end_x - end_x[0], end_y - end_y[0])
+    return {
+        "samples": samples,
+        "stability": float(same_score.mean()),
+        "hit_rate": (hits > 0).mean(axis=0).tolist(),
+        "mean_hits": hits.mean(axis=0).tolist(),
+        "destroy_rate": destroyed.mean(axis=0).tolist(),
+        "destroyed": histogram,
+        "end_spread": (float(end_x.std()), float(end_y.std())),
+        "end_max_shift": float(shifts.max()),
+    }
+
+def robust_best_shot(sweep_results, start_x, start_y, max_reflections, obstacles, candidates=8,
+                     angle_spread=4, position_jitter=3,
+                     field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], decay=None, pierce=False):
+    """評価値の高い候補について安定度を調べ、(評価値, 安定度) が最も良いものを返す
+
+    戻り値は (角度, 結果, 安定度の辞書)。候補がなければNone。
+    """
+    from monsttool.simulation import shot_score
+
+    if not sweep_results:
+        return None
+    ranked = sorted(sweep_results, key=lambda item: shot_score(item[1]), reverse=True)
+    best = None
+    for angle, result in ranked[:candidates]:
+        robustness = analyze_robustness(start_x, start_y, angle, max_reflections, obstacles,
+                                        angle_spread, position_jitter, field_width, field_height, decay, pierce)
+        key = (shot_score(result), robustness["stability"])
+        if best is None or key > best[0]:
+            best = (key, angle, result, robustness)
+    return best[1], best[2], best[3]
@@ -0,0 +1,372 @@
+"""障害物の配置の距離場 (SDF) を使った球追跡 (sphere tracing) によるシミュレーション
+
+フィールドの画素ごとに、障害物の当たり判定の境界までの距離を持っておき、
+その距離ぶんは何にも触れないので何ステップもまとめて進む。壁は直線なので距離場に入れず、
+触れるまでのステップ数を区間の始めに直接求める (壁沿いに進むときに細切れにならないように)。
+障害物の近くでは、最も近い障害物とは simulation と同じ式で接触までのステップ数を求め、
+ほかの障害物には2番目に近い距離の分だけ近づけるので、1ステップずつ進めることはない。
+接触の判定は simulation と同じなので、軌道は元の計算と変わらない。
+
+距離は形状ごとの関数 (SHAPE_DISTANCES) で求める。関数は「距離が半径以下なら当たり」となり、
+1ピクセル動いても1以上は変わらない値を返せばよい (正方形は当たり判定に合わせてチェビシェフ距離)。
+距離は MAX_DISTANCE で打ち切るので、障害物が距離場に影響するのは外接矩形 (SHAPE_BOUNDS) を
+MAX_DISTANCE 広げた範囲だけになる。障害物を動かしたり壊したりしたときはその範囲だけを計算し直す。
+
+    python -m monsttool.sdf    # simulate_shot と結果が一致するかの確認
+"""
+import math
+import random
+import sys
+
+from monsttool.geometry import polygon_shape
+from monsttool.profiles import FIELD_SIZE
+from monsttool.reachability import match_obstacles
+from monsttool.simulation import (CHARACTER_RADIUS, STEP_VELOCITY, _obstacle_first_step, _reflect_at,
+                                   _steps_until_contact, simulate_shot)
+
+# 距離を最寄りの画素で引く誤差 (最大 √2/2) を見込んだ余裕
+SAFETY_MARGIN = 0.75
+# 距離場に持つ最大の距離 (キャラクターの半径より十分大きくする)。これより遠い障害物は距離場に影響しない
+MAX_DISTANCE = 96.0
+# どの障害物も MAX_DISTANCE 以内にない画素の owner の値
+NO_OWNER = -1
+# 障害物までの余裕がこのステップ数より少なくなったら、距離場で細かく進めずに接触を式で求める
+NEAR_STEPS = 150
+
+def circle_distance(np, xs, ys, obstacle):
+    return np.hypot(xs - obstacle["x"], ys - obstacle["y"]) - obstacle["size"]
+
+def square_distance(np, xs, ys, obstacle):
+    return np.maximum(np.abs(xs - obstacle["x"]), np.abs(ys - obstacle["y"])) - obstacle["size"]
+
+def polygon_distance(np, xs, ys, obstacle):
+    """辺までの距離 (多角形の内側は負)"""
+    shape = polygon_shape(obstacle)
+    distance = np.full(np.broadcast(xs, ys).shape, np.inf, dtype=np.float32)
+    inside = np.zeros(distance.shape, dtype=bool)
+    for ax, ay, bx, by, tx, ty, _, _, length in shape.edges:
+        t = np.clip((xs - ax) * tx + (ys - ay) * ty, 0.0, length)
+        distance = np.minimum(distance, np.hypot(xs - (ax + tx * t), ys - (ay + ty * t)))
+        if shape.closed and ay != by:
+            crossing = ((ay > ys) != (by > ys)) & (xs < ax + (ys - ay) * (bx - ax) / (by - ay))
+            inside ^= crossing
+    return np.where(inside, -distance, distance)
+
+def centered_bounds(obstacle):
+    """中心から size の範囲に収まる形状 (円・正方形) の外接矩形 (左, 上, 右, 下)"""
+    x, y, size = obstacle["x"], obstacle["y"], obstacle["size"]
+    return x - size, y - size, x + size, y + size
+
+def polygon_bounds(obstacle):
+    return polygon_shape(obstacle).bbox
+
+SHAPE_DISTANCES = {"circle": circle_distance, "square": square_distance,
+                   "polygon": polygon_distance, "segment": polygon_distance}
+SHAPE_BOUNDS = {"circle": centered_bounds, "square": centered_bounds,
+                "polygon": polygon_bounds, "segment": polygon_bounds}
+
+def register_shape(kind, distance, bounds=None):
+    """新しい形状の距離関数 distance(np, xs, ys, obstacle) と外接矩形の関数 bounds(obstacle) を登録する
+
+    bounds を省略した形状は、動かしたり壊したりするたびにフィールド全体を計算し直す。
+    """
+    SHAPE_DISTANCES[kind] = distance
+    if bounds is not None:
+        SHAPE_BOUNDS[kind] = bounds
+    else:
+        SHAPE_BOUNDS.pop(kind, None)
+
+class DistanceField:
+    """フィールドの解像度 (1ピクセル) の距離場
+
+    画素ごとに最も近い障害物までの距離 (distance) とその番号 (owner)、2番目に近い障害物までの
+    距離 (second) を持つ。距離は MAX_DISTANCE で打ち切り、その範囲に障害物がなければ owner は NO_OWNER。
+    """
+    def __init__(self, obstacles, field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1]):
+        import numpy as np
+
+        self.field_width = field_width
+        self.field_height = field_height
+        self.obstacles = [dict(obstacle) for obstacle in obstacles]
+        self.windows = [self.window(obstacle) for obstacle in self.obstacles]
+        # 壊れたものとして距離場から外した障害物
+        self.excluded = frozenset()
+        self.derived = {}
+        self.distance = np.empty((field_height, field_width), dtype=np.float32)
+        self.owner = np.empty((field_height, field_width), dtype=np.int32)
+        self.second = np.empty((field_height, field_width), dtype=np.float32)
+        self.recompute((0, 0, field_width, field_height))
+
+    def window(self, obstacle):
+        """障害物が距離場に影響する範囲 (左, 上, 右, 下 の画素。右と下は含まない)"""
+        bounds = SHAPE_BOUNDS.get(obstacle["type"])
+        if bounds is None:
+            return 0, 0, self.field_width, self.field_height
+        left, top, right, bottom = bounds(obstacle)
+        return (min(max(int(math.floor(left - MAX_DISTANCE)), 0), self.field_width),
+                min(max(int(math.floor(top - MAX_DISTANCE)), 0), self.field_height),
+                min(max(int(math.ceil(right + MAX_DISTANCE)) + 1, 0), self.field_width),
+                min(max(int(math.ceil(bottom + MAX_DISTANCE)) + 1, 0), self.field_height))
+
+    def active(self):
+        return [(i, obstacle) for i, obstacle in enumerate(self.obstacles) if i not in self.excluded]
+
+    def recompute(self, region):
+        """範囲 (左, 上, 右, 下) の画素を、そこに影響する障害物だけから計算し直す。計算した画素数を返す"""
+        import numpy as np
+
+        left, top, right, bottom = region
+        if left >= right or top >= bottom:
+            return 0
+        distance = self.distance[top:bottom, left:right]
+        owner = self.owner[top:bottom, left:right]
+        second = self.second[top:bottom, left:right]
+        distance[:] = MAX_DISTANCE
+        owner[:] = NO_OWNER
+        second[:] = MAX_DISTANCE
+        for index, obstacle in self.active():
+            window = self.windows[index]
+            x0, y0 = max(left, window[0]), max(top, window[1])
+            x1, y1 = min(right, window[2]), min(bottom, window[3])
+            if x0 >= x1 or y0 >= y1:
+                continue
+            ys = np.arange(y0, y1, dtype=np.float32)[:, None]
+            xs = np.arange(x0, x1, dtype=np.float32)[None, :]
+            candidate = SHAPE_DISTANCES[obstacle["type"]](np, xs, ys, obstacle)
+            part = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+            nearest = distance[part]
+            closer = candidate < nearest
+            # 最も近いものより近ければ元の最寄りが2番目になり、そうでなければ2番目と比べる
+            second[part] = np.where(closer, nearest, np.minimum(second[part], candidate))
+            owner[part][closer] = index
+            distance[part] = np.minimum(nearest, candidate)
+        return distance.size
+
+    def update(self, obstacles):
+        """配置の変更を反映する。計算し直した画素数を返す"""
+        import numpy as np
+
+        mapping, removed, added = match_obstacles(self.obstacles, obstacles)
+        old_windows = self.windows
+        self.obstacles = [dict(obstacle) for obstacle in obstacles]
+        self.windows = [self.window(obstacle) for obstacle in self.obstacles]
+        self.excluded = frozenset()
+        self.derived = {}
+        # 変わらなかった障害物の番号が変わったときだけ付け替える
+        if any(old_index != new_index for old_index, new_index in mapping.items()):
+            # 末尾の要素は障害物のない (owner が -1 の) 画素用
+            lookup = np.full(len(mapping) + len(removed) + 1, NO_OWNER, dtype=np.int32)
+            for old_index, new_index in mapping.items():
+                lookup[old_index] = new_index
+            self.owner = lookup[self.owner]
+        # 消えた障害物と増えた障害物が影響する範囲だけを計算し直す
+        regions = [old_windows[index] for index in removed] + [self.windows[index] for index in added]
+        return sum(self.recompute(region) for region in regions)
+
+    def without(self, indices):
+        """障害物を壊したあとの距離場 (番号は元のまま)。同じ組み合わせは使い回す"""
+        excluded = self.excluded | frozenset(indices)
+        if excluded == self.excluded:
+            return self
+        if excluded not in self.derived:
+            field = DistanceField.__new__(DistanceField)
+            field.field_width = self.field_width
+            field.field_height = self.field_height
+            field.obstacles = self.obstacles
+            field.windows = self.windows
+            field.excluded = excluded
+            field.derived = self.derived
+            field.distance = self.distance.copy()
+            field.owner = self.owner.copy()
+            field.second = self.second.copy()
+            for index in excluded - self.excluded:
+                field.recompute(self.windows[index])
+            self.derived[excluded] = field
+        return self.derived[excluded]
+
+    def lookup(self, x, y):
+        """位置の最寄りの画素の (最も近い障害物までの距離, その番号, 2番目に近い障害物までの距離)"""
+        column = min(max(int(round(x)), 0), self.field_width - 1)
+        row = min(max(int(round(y)), 0), self.field_height - 1)
+        return self.distance.item(row, column), self.owner.item(row, column), self.second.item(row, column)
+
+    def clearance(self, x, y):
+        """位置から最も近い障害物の当たり判定の境界までの距離 (MAX_DISTANCE で打ち切り)"""
+        return self.lookup(x, y)[0]
+
+def simulate_shot_sdf(start_x, start_y, angle_val, max_reflections, field, durability=None):
+    """距離場で安全な区間を飛ばしながら simulate_shot と同じ判定で軌道を求める"""
+    radius = CHARACTER_RADIUS
+    obstacles = field.obstacles
+    field_width, field_height = field.field_width, field.field_height
+    angle_rad = (angle_val / 1024.0) * 2 * math.pi
+    vx = STEP_VELOCITY * math.cos(angle_rad)
+    vy = STEP_VELOCITY * math.sin(angle_rad)
+
+    trajectory = [(start_x, start_y)]
+    x, y = start_x, start_y
+    active = list(enumerate(obstacles))
+    if durability is None:
+        durability = {i: obstacle["durability"] for i, obstacle in active if "durability" in obstacle}
+    else:
+        durability = {i: remaining for i, remaining in enumerate(durability) if remaining is not None}
+        active = [(i, obstacle) for i, obstacle in active if durability.get(i, 1) > 0]
+    current = field.without(i for i, _ in enumerate(obstacles) if durability.get(i, 1) <= 0)
+    hits = []
+    hit_bounces = []
+    destroyed = []
+
+    reflection_count = 0
+    # 前回の反射から何にも触れずに進んだステップ数 (位置にはまとめて足し、元の計算と同じ丸めにする)
+    pending = 0
+    # 区間の始め (x, y) から壁に触れるまでのステップ数
+    wall_steps = _steps_until_contact(x, y, vx, vy, [], radius, field_width, field_height)
+    while reflection_count < max_reflections:
+        px = x + pending * vx
+        py = y + pending * vy
+        # 壁に触れる直前までのステップ数
+        limit = wall_steps - 1 - pending
+        if limit < 0:
+            # 丸めで予想したステップでは壁に触れなかったので、今の位置から求め直す
+            wall_steps = pending + _steps_until_contact(px, py, vx, vy, [], radius, field_width, field_height)
+            limit = wall_steps - 1 - pending
+        distance, owner, second = current.lookup(px, py)
+        # 境界までの距離 (から余裕を引いた分) はどの向きに進んでも障害物に触れない
+        clearance = distance - radius - SAFETY_MARGIN
+        if clearance >= limit * STEP_VELOCITY:
+            # 壁の方が近い (近くに障害物がないときも含む) なら壁の手前まで進む
+            pending += limit
+        elif clearance >= NEAR_STEPS * STEP_VELOCITY:
+            pending += int(clearance / STEP_VELOCITY)
+            continue
+        else:
+            # 最も近い障害物とは接触までのステップ数を式で求め、ほかの障害物は2番目に近い距離の分だけ近づける
+            others = second - radius - SAFETY_MARGIN
+            bound = min(int(others / STEP_VELOCITY) if others > 0 else 0, limit)
+            contact = None
+            if owner != NO_OWNER:
+                contact = _obstacle_first_step(px, py, vx, vy, obstacles[owner], radius, bound + 1)
+            if contact is not None and contact - 1 <= bound:
+                pending += contact - 1
+            elif bound > 0:
+                pending += bound
+                continue
+            else:
+                # ほかの障害物も近いときは、残っている障害物と壁すべてとの接触を求める
+                pending += _steps_until_contact(px, py, vx, vy, active, radius, field_width, field_height) - 1
+
+        # 次のステップで接触する
+        px = x + pending * vx
+        py = y + pending * vy
+        next_vx, next_vy, wall_count, hit_position = _reflect_at(px + vx, py + vy, vx, vy, active, radius,
+                                                                 field_width, field_height)
+        if wall_count == 0 and hit_position is None:
+            # 離れる向きに動いていて当たらなかった
+            pending += 1
+            continue
+        x, y = px, py
+        vx, vy = next_vx, next_vy
+        pending = 0
+        reflection_count += wall_count
+
+        if hit_position is not None:
+            index, obstacle = active[hit_position]
+            hits.append(index)
+            if index in durability and obstacle["type"] == "circle":
+                durability[index] -= 1
+                if durability[index] <= 0:
+                    destroyed.append(active.pop(hit_position)[0])
+                    current = current.without([index])
+            reflection_count += 1
+            hit_bounces.append(reflection_count)
+
+        x += vx
+        y += vy
+        trajectory.append((x, y))
+        wall_steps = _steps_until_contact(x, y, vx, vy, [], radius, field_width, field_height)
+
+        if reflection_count >= max_reflections:
+            trajectory.append((x, y))
+            break
+
+    return {
+        "trajectory": trajectory,
+        "hits": hits,
+        "hit_bounces": hit_bounces,
+        "destroyed": destroyed,
+        "reflections": reflection_count,
+    }
+
+class DistanceFieldEngine:
+    """simulate_shot と同じ引数で呼べる距離場版 (配置が変わったら距離場を差分で更新する)
+
+    距離場は止まった配置についてのものなので、動く障害物があるときは simulate_shot で計算する。
+    """
+    def __init__(self):
+        self.field = None
+
+    def __call__(self, start_x, start_y, angle_val, max_reflections, obstacles,
+                 field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], durability=None):
+        if any("motion" in obstacle for obstacle in obstacles):
+            return simulate_shot(start_x, start_y, angle_val, max_reflections, obstacles,
+                                 field_width, field_height, durability)
+        field = self.field
+        if field is None or (field.field_width, field.field_height) != (field_width, field_height):
+            self.field = DistanceField(obstacles, field_width, field_height)
+        elif field.obstacles != obstacles:
+            field.update(obstacles)
+        return simulate_shot_sdf(start_x, start_y, angle_val, max_reflections, self.field, durability)
+
+# 結果を simulate_shot と突き合わせる配置 (名前, 障害物, 開始位置)。
+# 障害物がない場合と、最後の障害物を壊して距離場が空になる場合を含める
+CHECK_LAYOUTS = (
+    ("障害物なし", [], (320, 600)),
+    ("最後の障害物を壊す", [{"type": "circle", "x": 320, "y": 300, "size": 40, "durability": 1}], (320, 600)),
+    ("壊れる円と正方形", [{"type": "circle", "x": 200, "y": 250, "size": 35, "durability": 2},
+                          {"type": "square", "x": 450, "y": 400, "size": 30}], (300, 650)),
+    ("多角形と線分", [{"type": "polygon", "x": 320, "y": 300, "size": 57, "points": [[-40, -40], [40, -40], [0, 40]]},
+                      {"type": "segment", "x": 200, "y": 500, "size": 80, "points": [[-80, 0], [80, 0]]},
+                      {"type": "circle", "x": 480, "y": 520, "size": 30, "durability": 1}], (420, 650)),
+)
+
+# 軌道の座標は進め方の違いで丸め誤差が残るので、この差までは一致とみなす
+POSITION_TOLERANCE = 1e-6
+
+def _same_result(result, expected):
+    if {key: value for key, value in result.items() if key != "trajectory"} != \
+            {key: value for key, value in expected.items() if key != "trajectory"}:
+        return False
+    if len(result["trajectory"]) != len(expected["trajectory"]):
+        return False
+    return all(abs(x1 - x2) <= POSITION_TOLERANCE and abs(y1 - y2) <= POSITION_TOLERANCE
+               for (x1, y1), (x2, y2) in zip(result["trajectory"], expected["trajectory"]))
+
+def compare_with_simulation(angles=range(0, 1024, 4), max_reflections=8, random_layouts=8, seed=0):
+    """距離場版と simulate_shot の結果が違った (配置の名前, 角度) のリストを返す"""
+    rng = random.Random(seed)
+    layouts = list(CHECK_LAYOUTS)
+    for i in range(random_layouts):
+        obstacles = [{"type": rng.choice(("circle", "square")), "x": rng.randint(60, 580),
+                      "y": rng.randint(60, 660), "size": rng.randint(15, 50), "durability": rng.randint(1, 3)}
+                     for _ in range(rng.randint(1, 6))]
+        layouts.append((f"ランダム{i + 1}", obstacles, (rng.randint(40, 600), rng.randint(40, 680))))
+    mismatches = []
+    for name, obstacles, (start_x, start_y) in layouts:
+        # 配置ごとに作り直し、差分更新に頼らない状態で比べる
+        engine = DistanceFieldEngine()
+        for angle in angles:
+            expected = simulate_shot(start_x, start_y, angle, max_reflections, obstacles)
+            if not _same_result(engine(start_x, start_y, angle, max_reflections, obstacles), expected):
+                mismatches.append((name, angle))
+    return mismatches
+
+def main():
+    mismatches = compare_with_simulation()
+    for name, angle in mismatches:
+        print(f"不一致: {name} 角度 {angle}")
+    if mismatches:
+        sys.exit(1)
+    print("距離場版の結果は simulate_shot と一致しました")
+
+if __name__ == "__main__":
+    main()
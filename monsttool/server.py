@@ -0,0 +1,635 @@
+"""シミュレーションと検出をローカルのJSON APIとして提供する
+
+    python -m monsttool.server --port 8765
+    python -m monsttool.server --unix /tmp/monsttool.sock
+
+POST /simulate, /sweep, /detect にJSONを送ると結果をJSONで返す。GET /metrics で
+エンドポイントごとのレイテンシを確認できる。待ち行列が一杯のときは 503 を返して
+呼び出し側に再送を任せる。計算はプロセスプールで行い、短時間に届いた要求はまとめて
+ワーカーに渡す。
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from monsttool.geometry import POLYGON_TYPES, normalize_polygon
+from monsttool.motion import validate_motion
+from monsttool.profiles import FIELD_SIZE
+from monsttool.resultcache import ResultCache, sweep_key
+from monsttool.simulation import best_shot, make_decay, shot_score, simulate_shot, sweep_angles
+from monsttool.stagelibrary import OBSTACLE_TYPES
+
+ENDPOINTS = ("simulate", "sweep", "detect")
+REQUIRED_FIELDS = {"simulate": ("x", "y", "angle"), "sweep": ("x", "y"), "detect": ()}
+MAX_BODY_SIZE = 32 * 1024 * 1024
+ENGINES = ("float", "fixed", "sdf")
+# 1回の要求で計算させる量の上限 (反射回数とフィールドの一辺のピクセル数)
+MAX_REFLECTIONS = 1000
+MAX_FIELD_SIZE = 4096
+
+class ServiceError(Exception):
+    """HTTPステータス付きで呼び出し側に返すエラー"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# ---- 要求の検証 (ワーカーに渡す前に値の型と範囲を確かめ、不正なら 400 を返す) ----
+
+def _coerce(value, name, kind, minimum=None, maximum=None):
+    """value を kind (int か float) に変換し、範囲を確かめる"""
+    try:
+        # JSON の真偽値は数値として受け付けない
+        if isinstance(value, bool):
+            raise TypeError
+        converted = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ServiceError(400, f"{name} の値が正しくありません: {value!r}")
+    if not math.isfinite(converted):
+        raise ServiceError(400, f"{name} の値が正しくありません: {value!r}")
+    if (minimum is not None and converted < minimum) or (maximum is not None and converted > maximum):
+        raise ServiceError(400, f"{name} は {minimum} から {maximum} の範囲で指定してください")
+    return converted
+
+def _number(value, name, minimum=None):
+    """障害物の値が数値か確かめる (整数と小数の区別はキャッシュのキーに入るので変えない)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ServiceError(400, f"{name} は数値で指定してください: {value!r}")
+    if minimum is not None and value < minimum:
+        raise ServiceError(400, f"{name} は {minimum} 以上で指定してください")
+    return value
+
+def _validate_obstacles(obstacles):
+    if not isinstance(obstacles, list):
+        raise ServiceError(400, "obstacles は障害物のリストで指定してください")
+    validated = []
+    for i, obstacle in enumerate(obstacles):
+        name = f"obstacles[{i}]"
+        if not isinstance(obstacle, dict) or obstacle.get("type") not in OBSTACLE_TYPES:
+            raise ServiceError(400, f"{name} の種類が正しくありません")
+        obstacle = dict(obstacle)
+        _number(obstacle.get("x"), f"{name}.x")
+        _number(obstacle.get("y"), f"{name}.y")
+        if obstacle["type"] in POLYGON_TYPES:
+            points = obstacle.get("points")
+            if not isinstance(points, list) or not all(isinstance(point, list) and len(point) == 2
+                                                       for point in points):
+                raise ServiceError(400, f"{name}.points は [x, y] のリストで指定してください")
+            if (len(points) != 2) if obstacle["type"] == "segment" else (len(points) < 3):
+                raise ServiceError(400, f"{name}.points の頂点の数が正しくありません")
+            for point in points:
+                _number(point[0], f"{name}.points")
+                _number(point[1], f"{name}.points")
+            normalize_polygon(obstacle)
+        else:
+            _number(obstacle.get("size"), f"{name}.size", minimum=0)
+        if "durability" in obstacle:
+            _number(obstacle["durability"], f"{name}.durability", minimum=0)
+        if "motion" in obstacle:
+            try:
+                validate_motion(obstacle["motion"])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ServiceError(400, f"{name}.motion が正しくありません: {e}")
+        validated.append(obstacle)
+    return validated
+
+def validate_params(endpoint, params):
+    """要求の値を確かめ、ワーカーで使う型に揃えた新しい辞書を返す (不正なら ServiceError(400))"""
+    params = dict(params)
+    if endpoint == "detect":
+        for name in ("path", "image"):
+            if name in params and not isinstance(params[name], str):
+                raise ServiceError(400, f"{name} は文字列で指定してください")
+        if "image" in params:
+            try:
+                base64.b64decode(params["image"], validate=True)
+            except (binascii.Error, ValueError):
+                raise ServiceError(400, "image はbase64で指定してください")
+        return params
+
+    params["field_width"] = _coerce(params.get("field_width", FIELD_SIZE[0]), "field_width", int,
+                                    minimum=1, maximum=MAX_FIELD_SIZE)
+    params["field_height"] = _coerce(params.get("field_height", FIELD_SIZE[1]), "field_height", int,
+                                     minimum=1, maximum=MAX_FIELD_SIZE)
+    params["x"] = _coerce(params["x"], "x", float, minimum=0, maximum=params["field_width"])
+    params["y"] = _coerce(params["y"], "y", float, minimum=0, maximum=params["field_height"])
+    params["max_reflections"] = _coerce(params.get("max_reflections", 10), "max_reflections", int,
+                                        minimum=0, maximum=MAX_REFLECTIONS)
+    if endpoint == "simulate":
+        params["angle"] = _coerce(params["angle"], "angle", int)
+    elif params.get("angles") is not None:
+        if not isinstance(params["angles"], list):
+            raise ServiceError(400, "angles は角度のリストで指定してください")
+        params["angles"] = [_coerce(angle, "angles", int) for angle in params["angles"]]
+    params["obstacles"] = _validate_obstacles(params.get("obstacles", []))
+
+    engine = params.get("engine", "float")
+    if engine not in ENGINES:
+        raise ServiceError(400, f"不明なengineです: {engine}")
+    if params.get("decay") is not None:
+        decay = params["decay"]
+        try:
+            if not isinstance(decay, dict):
+                raise TypeError
+            params["decay"] = make_decay(_coerce(decay.get("speed"), "decay.speed", float),
+                                         _coerce(decay.get("deceleration"), "decay.deceleration", float),
+                                         _coerce(decay.get("bounce_loss", 0.0), "decay.bounce_loss", float))
+        except (TypeError, ValueError) as e:
+            raise ServiceError(400, f"decay が正しくありません: {e}")
+    if not isinstance(params.get("pierce", False), bool):
+        raise ServiceError(400, "pierce は true か false で指定してください")
+    if engine != "float" and (params.get("decay") is not None or params.get("pierce")):
+        raise ServiceError(400, "減速モードと貫通は engine が float のときだけ使えます")
+    if engine == "fixed":
+        from monsttool.fixedpoint import unsupported_reason
+
+        reason = unsupported_reason(params["obstacles"])
+        if reason is not None:
+            raise ServiceError(400, reason)
+    return params
+
+# ---- ワーカープロセス側の処理 ----
+
+_worker_detector = None
+_worker_sdf_engine = None
+_worker_result_cache = None
+
+def _init_worker(result_cache_path):
+    """ワーカーの起動時に、全角度スイープを保存するキャッシュを開く (パスがNoneなら使わない)"""
+    global _worker_result_cache
+    if result_cache_path is not None:
+        _worker_result_cache = ResultCache(result_cache_path)
+
+def _field_size(params):
+    return (int(params.get("field_width", FIELD_SIZE[0])),
+            int(params.get("field_height", FIELD_SIZE[1])))
+
+def _shot_summary(angle, result):
+    return {
+        "angle": angle,
+        "destroyed": len(result["destroyed"]),
+        "hits": len(result["hits"]),
+        "reflections": result["reflections"],
+    }
+
+def _engine(params):
+    """要求の engine ("float"、結果がビット単位で再現する "fixed"、距離場を使う "sdf") に応じた計算関数を返す"""
+    global _worker_sdf_engine
+    name = params.get("engine", "float")
+    if name == "fixed":
+        from monsttool.fixedpoint import simulate_shot_fixed
+
+        return simulate_shot_fixed
+    if name == "sdf":
+        from monsttool.sdf import DistanceFieldEngine
+
+        # 距離場はワーカーごとに持ち、配置が変わった分だけ作り直す
+        if _worker_sdf_engine is None:
+            _worker_sdf_engine = DistanceFieldEngine()
+        return _worker_sdf_engine
+    if name == "float":
+        return simulate_shot
+    raise ValueError(f"不明なengineです: {name}")
+
+def _shot_options(params):
+    """要求の decay ({"speed", "deceleration", "bounce_loss"}) と pierce から計算のオプションを作る"""
+    options = {}
+    decay = params.get("decay")
+    if decay is not None:
+        options["decay"] = make_decay(float(decay["speed"]), float(decay["deceleration"]),
+                                      float(decay.get("bounce_loss", 0.0)))
+    if params.get("pierce"):
+        options["pierce"] = True
+    if options and params.get("engine", "float") != "float":
+        raise ValueError("減速モードと貫通は engine が float のときだけ使えます")
+    return options
+
+def run_simulate(params):
+    field_width, field_height = _field_size(params)
+    engine = _engine(params)
+    result = engine(float(params["x"]), float(params["y"]), int(params["angle"]) % 1024,
+                    int(params.get("max_reflections", 10)), params.get("obstacles", []),
+                    field_width, field_height, **_shot_options(params))
+    result["score"] = list(shot_score(result))
+    return result
+
+def run_sweep(params):
+    field_width, field_height = _field_size(params)
+    angles = params.get("angles")
+    if angles is not None:
+        angles = [int(angle) % 1024 for angle in angles]
+    engine = _engine(params)
+    options = _shot_options(params)
+    start_x, start_y = float(params["x"]), float(params["y"])
+    max_reflections = int(params.get("max_reflections", 10))
+    obstacles = params.get("obstacles", [])
+    # 全角度のスイープはサーバーを再起動しても使えるようディスクにも保存する
+    key = results = None
+    if angles is None and _worker_result_cache is not None:
+        key = sweep_key(start_x, start_y, max_reflections, obstacles, field_width, field_height,
+                        engine=params.get("engine", "float"), **options)
+        results = _worker_result_cache.get_sweep(key)
+    if results is None:
+        results = sweep_angles(start_x, start_y, max_reflections, obstacles,
+                               angles=angles, field_width=field_width, field_height=field_height,
+                               engine=engine, **options)
+        if key is not None:
+            _worker_result_cache.put_sweep(key, results)
+    best = best_shot(results)
+    response = {"results": [_shot_summary(angle, result) for angle, result in results]}
+    response["best"] = None
+    if best is not None:
+        response["best"] = dict(_shot_summary(*best), trajectory=best[1]["trajectory"])
+    return response
+
+def run_detect(params):
+    global _worker_detector
+    import cv2
+    import numpy as np
+
+    from monsttool.detector import PlayerIconDetector
+
+    if _worker_detector is None:
+        _worker_detector = PlayerIconDetector()
+    if "image" in params:
+        data = base64.b64decode(params["image"])
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        image = cv2.imread(params["path"])
+    if image is None:
+        raise ServiceError(400, "画像を読み込めませんでした")
+    profile = _worker_detector.get_profile(image)
+    results, _ = _worker_detector.detect_icon_in_cropped(profile.crop_for_detection(image))
+    return {"profile": profile.name, "detections": results}
+
+RUNNERS = {"simulate": run_simulate, "sweep": run_sweep, "detect": run_detect}
+
+def run_batch(endpoint, batch):
+    """ワーカーで同じ種類の要求をまとめて処理する
+
+    1件ごとに (True, 結果) か (False, (HTTPステータス, メッセージ)) を返す。要求の内容が原因で
+    ワーカーでしか分からない失敗 (画像を読み込めないなど) は ServiceError で返し、それ以外は 500 にする。
+    """
+    runner = RUNNERS[endpoint]
+    outcomes = []
+    for params in batch:
+        try:
+            outcomes.append((True, runner(params)))
+        except ServiceError as e:
+            outcomes.append((False, (e.status, str(e))))
+        except Exception as e:
+            outcomes.append((False, (500, f"{type(e).__name__}: {e}")))
+    return outcomes
+
+# ---- サーバー側の処理 ----
+
+class EndpointMetrics:
+    """エンドポイントごとの件数とレイテンシ"""
+    def __init__(self, history=1000):
+        self.latencies = deque(maxlen=history)
+        self.count = 0
+        self.errors = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_items = 0
+
+    def record(self, seconds, ok=True):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.latencies.append(seconds)
+
+    def snapshot(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "cache_hits": self.cache_hits,
+            "avg_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            "avg_batch": self.batched_items / self.batches if self.batches else 0.0,
+        }
+
+class SimulationService:
+    """要求の待ち行列、まとめ処理、キャッシュを管理する"""
+    def __init__(self, workers=None, queue_size=256, batch_size=32, batch_window=0.005,
+                 cache_size=1024, result_cache_path=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        # 全角度スイープを保存する SQLite のファイル (ワーカーがそれぞれ開いて同時に書き込む)
+        self.result_cache_path = result_cache_path
+        self.inflight = {}
+        self.metrics = {endpoint: EndpointMetrics() for endpoint in ENDPOINTS}
+        self.started = time.time()
+        self.pool = None
+        self.queue = None
+        self.slots = None
+        self.dispatcher = None
+        self.tasks = set()
+
+    async def start(self):
+        # forkだと受付中のソケットまでワーカーに複製され、切断が相手に届かなくなる
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(self.result_cache_path,))
+        # 最初の要求でワーカーの起動を待たないよう、先に全ワーカーを立ち上げておく
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, run_batch, "simulate", [])
+                               for _ in range(self.workers)])
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        # ワーカー数の2倍までしか同時に投入せず、残りは待ち行列に溜める
+        self.slots = asyncio.Semaphore(self.workers * 2)
+        self.dispatcher = asyncio.create_task(self.dispatch())
+
+    async def stop(self):
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def cache_key(self, endpoint, params):
+        if endpoint == "detect" and "path" in params:
+            # ファイルが差し替えられたら別の要求として扱う
+            try:
+                stat = os.stat(params["path"])
+            except OSError as e:
+                raise ServiceError(404, f"画像が見つかりません: {e}")
+            params = dict(params, _stat=(stat.st_mtime_ns, stat.st_size))
+        payload = json.dumps([endpoint, params], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    async def submit(self, endpoint, params):
+        if endpoint not in RUNNERS:
+            raise ServiceError(404, f"不明なエンドポイントです: {endpoint}")
+        if not isinstance(params, dict):
+            raise ServiceError(400, "リクエストはJSONオブジェクトで送ってください")
+        missing = [name for name in REQUIRED_FIELDS[endpoint] if name not in params]
+        if endpoint == "detect" and "path" not in params and "image" not in params:
+            missing.append("path または image")
+        if missing:
+            raise ServiceError(400, "必須の項目がありません: " + ", ".join(missing))
+        params = validate_params(endpoint, params)
+        metrics = self.metrics[endpoint]
+        key = self.cache_key(endpoint, params)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            metrics.cache_hits += 1
+            return self.cache[key]
+        # 同じ内容の要求が処理中なら結果を共有する
+        if key in self.inflight:
+            metrics.cache_hits += 1
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((endpoint, params, key, future))
+        except asyncio.QueueFull:
+            metrics.rejected += 1
+            raise ServiceError(503, "処理待ちの要求が多すぎます。しばらくしてから再送してください")
+        self.inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.inflight.pop(key, None)
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            # 少しだけ待って、その間に届いた要求を同じバッチに入れる
+            deadline = loop.time() + self.batch_window
+            while len(items) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for item in items:
+                groups.setdefault(item[0], []).append(item)
+            for endpoint, group in groups.items():
+                # 1つのワーカーに偏らないよう、ワーカー数に合わせて分割する
+                chunk = max(1, -(-len(group) // self.workers))
+                for start in range(0, len(group), chunk):
+                    await self.slots.acquire()
+                    task = asyncio.create_task(self.run_chunk(endpoint, group[start:start + chunk]))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+    async def run_chunk(self, endpoint, items):
+        loop = asyncio.get_running_loop()
+        metrics = self.metrics[endpoint]
+        metrics.batches += 1
+        metrics.batched_items += len(items)
+        try:
+            outcomes = await loop.run_in_executor(
+                self.pool, run_batch, endpoint, [params for _, params, _, _ in items]
+            )
+        except Exception as e:
+            outcomes = [(False, (500, f"{type(e).__name__}: {e}"))] * len(items)
+        finally:
+            self.slots.release()
+
+        for (_, _, key, future), (ok, value) in zip(items, outcomes):
+            if future.done():
+                continue
+            if ok:
+                self.store(key, value)
+                future.set_result(value)
+            else:
+                future.set_exception(ServiceError(*value))
+
+    def store(self, key, value):
+        if self.cache_size <= 0:
+            return
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def metrics_snapshot(self):
+        return {
+            "uptime": time.time() - self.started,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            "cache_entries": len(self.cache),
+            "endpoints": {name: metrics.snapshot() for name, metrics in self.metrics.items()},
+        }
+
+# ---- HTTP/1.1 (TCPとUnixソケットで共通) ----
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+async def read_request(reader):
+    """リクエストを読み取り (メソッド, パス, ヘッダー, 本文) を返す。接続が閉じたらNone"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ServiceError(400, "リクエスト行を解釈できません")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise ServiceError(400, "Content-Length を解釈できません")
+    if length < 0:
+        raise ServiceError(400, "Content-Length が負の値です")
+    if length > MAX_BODY_SIZE:
+        raise ServiceError(413, "リクエストが大きすぎます")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], headers, body
+
+def write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        "Connection: " + ("keep-alive" if keep_alive else "close"),
+    ]
+    if status == 503:
+        head.append("Retry-After: 1")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+async def handle_request(service, method, path, body):
+    if path == "/metrics" and method == "GET":
+        return 200, service.metrics_snapshot()
+    if path == "/health" and method == "GET":
+        return 200, {"status": "ok"}
+    endpoint = path.strip("/")
+    if endpoint not in RUNNERS:
+        raise ServiceError(404, f"不明なパスです: {path}")
+    if method != "POST":
+        raise ServiceError(405, "POSTで送ってください")
+    try:
+        params = json.loads(body or b"{}")
+    except ValueError as e:
+        raise ServiceError(400, f"JSONを解釈できません: {e}")
+
+    started = time.perf_counter()
+    try:
+        result = await service.submit(endpoint, params)
+    except ServiceError as e:
+        # 拒否した要求はレイテンシに含めず、件数だけ数える
+        if e.status != 503:
+            service.metrics[endpoint].record(time.perf_counter() - started, ok=False)
+        raise
+    service.metrics[endpoint].record(time.perf_counter() - started)
+    return 200, result
+
+def make_handler(service):
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                # リクエストを読み切れなかったとき (本文が残っているかもしれない) は応答して閉じる
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await handle_request(service, method, path, body)
+                except ServiceError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except asyncio.IncompleteReadError:
+                    break
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    return handle_connection
+
+async def serve(service, host="127.0.0.1", port=8765, unix_path=None, ready=None):
+    """サービスを起動して停止されるまで待つ (ready にはサーバーを開始したら値を設定する)"""
+    await service.start()
+    handler = make_handler(service)
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        address = unix_path
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        address = "%s:%d" % server.sockets[0].getsockname()[:2]
+    print(f"シミュレーションサービスを開始しました: {address}")
+    if ready is not None:
+        ready.set_result(address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        if unix_path and os.path.exists(unix_path):
+            os.unlink(unix_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シミュレーション/検出のローカルJSONサービス")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="TCPの代わりに使うUnixソケットのパス")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--result-cache", nargs="?", const="", default=None,
+                        help="全角度スイープをSQLiteに保存する (パスの省略時はホームディレクトリ)")
+    args = parser.parse_args(argv)
+
+    service = SimulationService(workers=args.workers, queue_size=args.queue_size,
+                                batch_size=args.batch_size,
+                                batch_window=args.batch_window_ms / 1000,
+                                cache_size=args.cache_size,
+                                result_cache_path=args.result_cache)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+import math
+import time
+
+from monsttool.geometry import POLYGON_TYPES, polygon_shape
+from monsttool.motion import motion_pieces, motion_state
+from monsttool.profiles import FIELD_SIZE
+
+# キャラクターの半径と1ステップあたりの移動量
+CHARACTER_RADIUS = 30
+STEP_VELOCITY = 0.2
+# 計算結果が変わる修正をしたら上げる (保存済みの結果のキャッシュが使われなくなる)
+ENGINE_VERSION = "float-1"
+
+def make_decay(speed, deceleration, bounce_loss=0.0):
+    """減速モードの設定 (simulate_shot の decay) を作る
+
+    speed は初速、deceleration は減速度、bounce_loss は反射1回ごとに失う速さの割合 (0-1)。
+    速さと減速度の時間の単位は揃っていれば何でもよい (止まる位置は 速さ² / (2 × 減速度) で決まる)。
+    """
+    if not (speed > 0 and deceleration >= 0 and 0 <= bounce_loss < 1):
+        raise ValueError("減速モードの値が正しくありません")
+    return {"speed": float(speed), "deceleration": float(deceleration), "bounce_loss": float(bounce_loss)}
+
+def stop_distance(speed, deceleration):
+    """速さ speed から一定の減速度で止まるまでに進む距離"""
+    if deceleration == 0:
+        return math.inf
+    return speed * speed / (2 * deceleration)
+
+def _steps_in_range(position, velocity, low, high):
+    """low <= position + n * velocity <= high を満たす n の範囲を返す"""
+    if velocity > 0:
+        return (low - position) / velocity, (high - position) / velocity
+    if velocity < 0:
+        return (high - position) / velocity, (low - position) / velocity
+    if low <= position <= high:
+        return -math.inf, math.inf
+    return math.inf, -math.inf
+
+def _first_step(low, high):
+    """low <= n <= high を満たす最小のステップ数 n (1以上) を返す。なければNone"""
+    if low > high or low == math.inf:
+        return None
+    n = 1 if low <= 1 else math.ceil(low - 1e-9)
+    return n if n <= high else None
+
+def _circle_first_step(dx, dy, vx, vy, reach):
+    """|d + n v| <= reach を n の2次不等式として解き、最小のステップ数を返す。なければNone"""
+    a = vx * vx + vy * vy
+    b = 2 * (vx * dx + vy * dy)
+    c = dx * dx + dy * dy - reach * reach
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+    root = math.sqrt(discriminant)
+    return _first_step((-b - root) / (2 * a), (-b + root) / (2 * a))
+
+def _polygon_first_step(x, y, vx, vy, shape, radius, limit):
+    """多角形・線分の辺から radius 以内 (辺を半径分太らせたカプセル) に入るステップ数を返す
+
+    limit (ほかの接触までのステップ数) が分かっていれば、その間に通る辺だけをBVHで選んで調べる。
+    """
+    if limit is None:
+        candidates = range(len(shape.edges))
+    else:
+        candidates = shape.bvh.query_ray(x, y, vx, vy, limit, radius)
+    best = None
+    for index in candidates:
+        ax, ay, bx, by, tx, ty, nx, ny, length = shape.edges[index]
+        # 辺に沿った帯 (法線方向に ±radius、接線方向に辺の長さ) と両端の円
+        px, py = x - ax, y - ay
+        u_low, u_high = _steps_in_range(px * nx + py * ny, vx * nx + vy * ny, -radius, radius)
+        w_low, w_high = _steps_in_range(px * tx + py * ty, vx * tx + vy * ty, 0.0, length)
+        for n in (_first_step(max(u_low, w_low), min(u_high, w_high)),
+                  _circle_first_step(px, py, vx, vy, radius),
+                  _circle_first_step(x - bx, y - by, vx, vy, radius)):
+            if n is not None and (best is None or n < best):
+                best = n
+    return best
+
+def _obstacle_first_step(x, y, vx, vy, obstacle, radius, limit):
+    """止まっている障害物の判定に最初に引っかかるステップ数を返す。なければNone"""
+    size = obstacle["size"]
+    obstacle_x, obstacle_y = obstacle["x"], obstacle["y"]
+    if obstacle["type"] == "circle":
+        # |p + n v - c| <= radius + size を n の2次不等式として解く
+        return _circle_first_step(x - obstacle_x, y - obstacle_y, vx, vy, radius + size)
+    if obstacle["type"] in POLYGON_TYPES:
+        return _polygon_first_step(x, y, vx, vy, polygon_shape(obstacle), radius, limit)
+    # 正方形: 半径分拡張した正方形に中心が入る区間 (x方向とy方向の共通部分)
+    reach = radius + size
+    x_low, x_high = _steps_in_range(x, vx, obstacle_x - reach, obstacle_x + reach)
+    y_low, y_high = _steps_in_range(y, vy, obstacle_y - reach, obstacle_y + reach)
+    return _first_step(max(x_low, y_low), min(x_high, y_high))
+
+def _moving_first_step(x, y, vx, vy, obstacle, radius, elapsed, limit):
+    """動く障害物の判定に最初に引っかかるステップ数 (limit まで)。なければNone
+
+    等速で動く区間ごとに、障害物が開始位置に止まって見える座標系 (キャラクターの位置から
+    障害物のずれを引き、速度は相対速度) に直して、止まっている障害物と同じ式で解く。
+    """
+    for start, end, ox, oy, ux, uy in motion_pieces(obstacle["motion"], elapsed, limit):
+        # 区間に入る直前のステップを起点にする
+        base = max(math.ceil(start), 1) - 1
+        rx = x + base * vx - (ox + (base - start) * ux)
+        ry = y + base * vy - (oy + (base - start) * uy)
+        n = _obstacle_first_step(rx, ry, vx - ux, vy - uy, obstacle, radius, min(end, limit) - base)
+        if n is not None and base + n <= min(end, limit):
+            return base + n
+    return None
+
+def _steps_until_contact(x, y, vx, vy, active, radius, field_width, field_height, elapsed=0):
+    """壁か障害物の判定に最初に引っかかるステップ数を返す (elapsed は発射からのステップ数)"""
+    best = None
+    # フィールド境界 (各軸とも手前側と奥側の2区間)
+    for position, velocity, size in ((x, vx, field_width), (y, vy, field_height)):
+        for low, high in ((-math.inf, radius), (size - radius, math.inf)):
+            n = _first_step(*_steps_in_range(position, velocity, low, high))
+            if n is not None and (best is None or n < best):
+                best = n
+                if best == 1:
+                    return best
+
+    for _, obstacle in active:
+        if "motion" in obstacle:
+            n = _moving_first_step(x, y, vx, vy, obstacle, radius, elapsed, best)
+        else:
+            n = _obstacle_first_step(x, y, vx, vy, obstacle, radius, best)
+        if n is not None and (best is None or n < best):
+            best = n
+            if best == 1:
+                return best
+    return best
+
+def _pierce_entries(x, y, vx, vy, targets, radius, elapsed, limit):
+    """貫通で limit ステップまでに外から入る円を、入った順に [(ステップ数, targets 内の位置), ...] で返す
+
+    直線の区間と円 (半径分広げたもの) の交わりを式で求める。区間の始めにすでに中にいる円は数えない
+    (反射しても中にいる間は同じ円に何度も当たらない)。
+    """
+    entries = []
+    for position, (_, obstacle) in enumerate(targets):
+        reach = radius + obstacle["size"]
+        dx = x - obstacle["x"]
+        dy = y - obstacle["y"]
+        if "motion" in obstacle:
+            ox, oy, _, _ = motion_state(obstacle["motion"], elapsed)
+            dx -= ox
+            dy -= oy
+        if dx * dx + dy * dy <= reach * reach:
+            continue
+        if "motion" in obstacle:
+            n = _moving_first_step(x, y, vx, vy, obstacle, radius, elapsed, limit)
+        else:
+            n = _circle_first_step(dx, dy, vx, vy, reach)
+        if n is not None and n <= limit:
+            entries.append((n, position))
+    entries.sort()
+    return entries
+
+def _reflect_at(next_x, next_y, vx, vy, active, radius, field_width, field_height, elapsed=0):
+    """次の位置で壁と障害物に触れていれば反射させる
+
+    戻り値は (反射後の vx, vy, 壁で反射した回数, 当たった障害物の active 内の位置またはNone)。
+    障害物は active の順に調べ、最初に重なったものだけと衝突する。
+    多角形と線分、動く障害物は、重なっていても離れる向きに動いているときは衝突しない。
+    elapsed は次の位置での発射からのステップ数 (動く障害物の位置を決める)。
+    """
+    wall_count = 0
+    # フィールド境界での反射チェック
+    if next_x - radius <= 0 or next_x + radius >= field_width:
+        vx = -vx
+        wall_count += 1
+
+    if next_y - radius <= 0 or next_y + radius >= field_height:
+        vy = -vy
+        wall_count += 1
+
+    # 障害物との衝突チェック
+    for position, (_, obstacle) in enumerate(active):
+        size = obstacle["size"]
+        obstacle_x, obstacle_y = obstacle["x"], obstacle["y"]
+        hit_x, hit_y = next_x, next_y
+        ux = uy = 0.0
+        if "motion" in obstacle:
+            # 障害物が開始位置に止まって見える座標系で判定する
+            ox, oy, ux, uy = motion_state(obstacle["motion"], elapsed)
+            hit_x, hit_y = next_x - ox, next_y - oy
+            if (obstacle["type"] not in POLYGON_TYPES and
+                    (vx - ux) * (hit_x - obstacle_x) + (vy - uy) * (hit_y - obstacle_y) >= 0):
+                # 相対的に離れていく間は当たらない (反射した直後に同じ障害物に追いつかれた場合など)
+                continue
+        if obstacle["type"] == "circle":
+            dx = hit_x - obstacle_x
+            dy = hit_y - obstacle_y
+            reach = radius + size
+            if dx * dx + dy * dy <= reach * reach:
+                # 内接する正方形の領域に基づいて反射方向を決定
+                if abs(dx) > abs(dy):
+                    vx = -vx
+                else:
+                    vy = -vy
+                return vx, vy, wall_count, position
+        elif obstacle["type"] in POLYGON_TYPES:
+            normal = polygon_shape(obstacle).contact_normal(hit_x, hit_y, radius)
+            if normal is None:
+                continue
+            # 近づく向きに動いているときだけ、接触点の法線について鏡映する
+            nx, ny = normal
+            if (vx - ux) * nx + (vy - uy) * ny >= 0:
+                continue
+            dot = vx * nx + vy * ny
+            vx -= 2 * dot * nx
+            vy -= 2 * dot * ny
+            return vx, vy, wall_count, position
+        else:  # square
+            left_edge = obstacle_x - size
+            right_edge = obstacle_x + size
+            top_edge = obstacle_y - size
+            bottom_edge = obstacle_y + size
+
+            if (left_edge - radius <= hit_x <= right_edge + radius and
+                top_edge - radius <= hit_y <= bottom_edge + radius):
+
+                # 中心が辺の外側にあればその辺で反射
+                if hit_x > right_edge or hit_x < left_edge:
+                    vx = -vx
+                elif hit_y > bottom_edge or hit_y < top_edge:
+                    vy = -vy
+                else:
+                    # 角との衝突
+                    min_dist_sq = min((hit_x - corner_x) ** 2 + (hit_y - corner_y) ** 2
+                                      for corner_x in (left_edge, right_edge)
+                                      for corner_y in (top_edge, bottom_edge))
+                    if min_dist_sq <= radius * radius:
+                        vx = -vx
+                        vy = -vy
+                return vx, vy, wall_count, position
+    return vx, vy, wall_count, None
+
+def simulate_shot(start_x, start_y, angle_val, max_reflections, obstacles,
+                  field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], durability=None, decay=None,
+                  pierce=False):
+    """発射角度 (0-1023) から反射軌道を計算する
+
+    0.2ピクセルずつ進める判定はそのままに、次に壁か障害物に触れるステップ数を
+    解析的に求めて、その間の直進を一度に進める。
+    戻り値は軌道 (trajectory)、当たった障害物 (hits)、それぞれが何回目の反射か (hit_bounces)、
+    壊した障害物 (destroyed)、反射回数 (reflections) の辞書。障害物は元のリストのインデックスで表す。
+    durability を渡すと、障害物に保存された耐久回数の代わりにその残り回数
+    (障害物ごとのリスト、None は耐久なし) から始め、0以下の障害物は壊れたものとして扱う。
+    motion を持つ障害物は発射からのステップ数に応じて動く (monsttool.motion)。
+    decay (make_decay で作る) を渡すと、減速して止まった位置でも終わる。止まる位置は
+    接触から接触までの区間ごとに式で求めるので、1ステップずつ速さを計算することはない。
+    減速しても軌道の形は変わらないので、動く障害物の時刻は進んだステップ数のまま数える。
+    pierce (貫通) なら円は反射せずに通り抜け、外から入るたびに当たりと耐久回数の減少を数える
+    (反射回数には数えない)。壁とそれ以外の障害物では反射する。
+    """
+    radius = CHARACTER_RADIUS
+
+    # 角度の変換 (0-1023 → ラジアン)
+    angle_rad = (angle_val / 1024.0) * 2 * math.pi
+
+    # 初期速度ベクトル (速度の大きさは一定)
+    vx = STEP_VELOCITY * math.cos(angle_rad)
+    vy = STEP_VELOCITY * math.sin(angle_rad)
+
+    trajectory = [(start_x, start_y)]
+    x, y = start_x, start_y
+
+    # 元の障害物は変更せず、耐久回数はシミュレーション中だけの値として持つ
+    active = list(enumerate(obstacles))
+    if durability is None:
+        durability = {i: obstacle["durability"] for i, obstacle in active if "durability" in obstacle}
+    else:
+        durability = {i: remaining for i, remaining in enumerate(durability) if remaining is not None}
+        active = [(i, obstacle) for i, obstacle in active if durability.get(i, 1) > 0]
+    hits = []
+    hit_bounces = []
+    destroyed = []
+    # 貫通で通り抜ける円 (反射の判定からは外す)
+    targets = []
+    if pierce:
+        targets = [(i, obstacle) for i, obstacle in active if obstacle["type"] == "circle"]
+        active = [(i, obstacle) for i, obstacle in active if obstacle["type"] != "circle"]
+
+    reflection_count = 0
+    # 発射からのステップ数 (動く障害物の位置を決める)
+    elapsed = 0
+    speed = None if decay is None else decay["speed"]
+    while reflection_count < max_reflections:
+        steps = _steps_until_contact(x, y, vx, vy, active, radius, field_width, field_height, elapsed)
+        if steps is None:
+            break
+        # この区間で進むステップ数 (接触までに止まるなら止まる位置まで)
+        limit = steps
+        stopped = False
+        if decay is not None:
+            travel = steps * STEP_VELOCITY
+            remaining = stop_distance(speed, decay["deceleration"])
+            if remaining < travel:
+                limit = remaining / STEP_VELOCITY
+                stopped = True
+            else:
+                speed = math.sqrt(max(speed * speed - 2 * decay["deceleration"] * travel, 0.0))
+
+        if targets:
+            # 区間の中で通り抜ける円に当たりを付ける
+            for _, position in _pierce_entries(x, y, vx, vy, targets, radius, elapsed, limit):
+                index = targets[position][0]
+                hits.append(index)
+                hit_bounces.append(reflection_count)
+                if index in durability:
+                    durability[index] -= 1
+                    if durability[index] <= 0:
+                        destroyed.append(index)
+            targets = [(i, obstacle) for i, obstacle in targets if durability.get(i, 1) > 0]
+
+        if stopped:
+            x += limit * vx
+            y += limit * vy
+            trajectory.append((x, y))
+            break
+        elapsed += steps
+
+        # 接触の直前までは何にも触れずに直進する
+        x += (steps - 1) * vx
+        y += (steps - 1) * vy
+        vx, vy, wall_count, hit_position = _reflect_at(x + vx, y + vy, vx, vy, active, radius,
+                                                       field_width, field_height, elapsed)
+        reflection_count += wall_count
+        reflection_occurred = wall_count > 0
+
+        broken_position = None
+        if hit_position is not None:
+            index, obstacle = active[hit_position]
+            hits.append(index)
+            # 耐久回数を減らす (耐久回数を持つのは円だけ)
+            if index in durability and obstacle["type"] == "circle":
+                durability[index] -= 1
+                if durability[index] <= 0:
+                    broken_position = hit_position
+            reflection_occurred = True
+            reflection_count += 1
+            hit_bounces.append(reflection_count)
+
+        if decay is not None and reflection_occurred:
+            speed *= (1 - decay["bounce_loss"]) ** (wall_count + (hit_position is not None))
+
+        # 障害物が壊れた場合、一時リストから削除
+        if broken_position is not None:
+            destroyed.append(active.pop(broken_position)[0])
+
+        # 位置の更新
+        x += vx
+        y += vy
+
+        # 反射が発生した場合のみ軌道に追加
+        if reflection_occurred:
+            trajectory.append((x, y))
+
+        # 反射回数が最大値に達した場合は終了
+        if reflection_count >= max_reflections:
+            trajectory.append((x, y))
+            break
+
+    return {
+        "trajectory": trajectory,
+        "hits": hits,
+        "hit_bounces": hit_bounces,
+        "destroyed": destroyed,
+        "reflections": reflection_count,
+    }
+
+def sweep_angle_order(stride=64):
+    """粗い刻みから細かい刻みの順に0-1023の角度を並べる (途中で打ち切っても全体を見渡せる)"""
+    order = []
+    seen = set()
+    step = stride
+    while step >= 1:
+        for angle in range(0, 1024, step):
+            if angle not in seen:
+                seen.add(angle)
+                order.append(angle)
+        step //= 2
+    return order
+
+def shot_score(result):
+    """ショットの評価値 (壊した数、当たった回数の順で比較する)"""
+    return (len(result["destroyed"]), len(result["hits"]))
+
+def sweep_angles(start_x, start_y, max_reflections, obstacles, angles=None, deadline=None,
+                 field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], engine=None, decay=None, pierce=False):
+    """角度ごとにシミュレーションし、(角度, 結果) のリストを返す
+
+    deadline (time.perf_counter() の値) を過ぎた時点で打ち切る。
+    engine には simulate_shot と同じ引数を取る関数 (固定小数点版など) を渡せる。
+    decay を渡すと減速モードで、pierce なら貫通で計算する (engine もそれらを受け取れる必要がある)。
+    """
+    if angles is None:
+        angles = range(1024)
+    if engine is None:
+        engine = simulate_shot
+    options = {}
+    if decay is not None:
+        options["decay"] = decay
+    if pierce:
+        options["pierce"] = True
+    results = []
+    for angle in angles:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        results.append((angle, engine(start_x, start_y, angle, max_reflections, obstacles,
+                                      field_width, field_height, **options)))
+    return results
+
+def best_shot(sweep_results):
+    """スイープ結果から最も評価の高い (角度, 結果) を返す"""
+    if not sweep_results:
+        return None
+    return max(sweep_results, key=lambda item: shot_score(item[1]))
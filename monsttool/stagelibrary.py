@@ -0,0 +1,326 @@
+"""ステージ (障害物の配置と開始位置) を SQLite のライブラリにまとめて保存する
+
+    python -m monsttool.stagelibrary import stages/*.json --tag 降臨
+    python -m monsttool.stagelibrary list --name 塔 --tag 降臨 --min-obstacles 5
+    python -m monsttool.stagelibrary export out_dir --tag 降臨
+    python -m monsttool.stagelibrary delete 塔1
+
+ステージ名、障害物の数、タグに索引を張るので、数千件あっても JSON を1つずつ開かずに検索できる。
+障害物は基本の項目 (種類, x, y, 大きさ) を並べたリストにし、それ以外の項目 (耐久、頂点、動き) だけを
+辞書で残して圧縮する。読み書きするステージはシミュレーターの設定ファイルと同じ形式の辞書で、
+"obstacles", "start_position", "angle", "max_reflections" (と書き出し時の "tags") を持つ。
+"""
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+
+from monsttool.geometry import POLYGON_TYPES, normalize_polygon
+from monsttool.motion import validate_motion
+from monsttool.paths import default_stage_library_path
+from monsttool.resultcache import open_database
+
+OBSTACLE_TYPES = ("circle", "square") + POLYGON_TYPES
+# リストの位置で持つ障害物の項目
+BASE_FIELDS = ("type", "x", "y", "size")
+# ファイル名に使えない文字
+UNSAFE_NAME = re.compile(r'[\\/:*?"<>|]')
+
+def parse_tags(text):
+    """カンマか空白で区切ったタグの文字列をリストにする (重複は除く)"""
+    tags = []
+    for tag in re.split(r"[,、\s]+", text or ""):
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+def normalize_stage(stage):
+    """設定ファイルの内容を確かめて障害物を整える (不正なら ValueError)"""
+    obstacles = []
+    for obstacle in stage.get("obstacles", []):
+        if obstacle.get("type") not in OBSTACLE_TYPES:
+            raise ValueError("不明な障害物の種類です: %s" % obstacle.get("type"))
+        if obstacle["type"] in POLYGON_TYPES:
+            obstacle = normalize_polygon(obstacle)
+        if "motion" in obstacle:
+            validate_motion(obstacle["motion"])
+        obstacles.append(obstacle)
+    return dict(stage, obstacles=obstacles)
+
+def pack_obstacles(obstacles):
+    rows = []
+    for obstacle in obstacles:
+        row = [obstacle[name] for name in BASE_FIELDS]
+        extra = {key: value for key, value in obstacle.items() if key not in BASE_FIELDS}
+        if extra:
+            row.append(extra)
+        rows.append(row)
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def unpack_obstacles(data):
+    obstacles = []
+    for row in json.loads(zlib.decompress(data).decode("utf-8")):
+        obstacle = dict(zip(BASE_FIELDS, row))
+        if len(row) > len(BASE_FIELDS):
+            obstacle.update(row[len(BASE_FIELDS)])
+        obstacles.append(obstacle)
+    return obstacles
+
+class StageLibrary:
+    """名前をキーにしたステージの SQLite のライブラリ"""
+    def __init__(self, path=None):
+        self.path = path or default_stage_library_path()
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            connection = open_database(self.path)
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stages ("
+                "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, obstacle_count INTEGER NOT NULL,"
+                "start_x INTEGER, start_y INTEGER, angle INTEGER, max_reflections INTEGER,"
+                "obstacles BLOB NOT NULL, updated REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stage_tags ("
+                "stage_id INTEGER NOT NULL REFERENCES stages (id) ON DELETE CASCADE, tag TEXT NOT NULL,"
+                "PRIMARY KEY (stage_id, tag))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS stages_obstacle_count ON stages (obstacle_count)")
+            connection.execute("CREATE INDEX IF NOT EXISTS stage_tags_tag ON stage_tags (tag)")
+            self.connection = connection
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __getstate__(self):
+        # ワーカープロセスに渡すときは接続を持たせない
+        state = dict(self.__dict__)
+        state["connection"] = None
+        return state
+
+    def transaction(self):
+        return _Transaction(self.connect())
+
+    def write_stage(self, connection, name, stage, tags=None):
+        start = stage.get("start_position") or {}
+        obstacles = stage.get("obstacles", [])
+        connection.execute(
+            "INSERT INTO stages (name, obstacle_count, start_x, start_y, angle, max_reflections, obstacles, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+            "obstacle_count = excluded.obstacle_count, start_x = excluded.start_x, start_y = excluded.start_y, "
+            "angle = excluded.angle, max_reflections = excluded.max_reflections, "
+            "obstacles = excluded.obstacles, updated = excluded.updated",
+            (name, len(obstacles), start.get("x"), start.get("y"), stage.get("angle"),
+             stage.get("max_reflections"), pack_obstacles(obstacles), time.time())
+        )
+        stage_id = connection.execute("SELECT id FROM stages WHERE name = ?", (name,)).fetchone()[0]
+        if tags is not None:
+            connection.execute("DELETE FROM stage_tags WHERE stage_id = ?", (stage_id,))
+            connection.executemany("INSERT INTO stage_tags (stage_id, tag) VALUES (?, ?)",
+                                   [(stage_id, tag) for tag in tags])
+        return stage_id
+
+    def save(self, name, stage, tags=None):
+        """ステージを保存する (同じ名前があれば上書き)。tags がNoneなら今のタグを残す"""
+        name = name.strip()
+        if not name:
+            raise ValueError("ステージ名を入力してください")
+        stage = normalize_stage(stage)
+        with self.transaction() as connection:
+            return self.write_stage(connection, name, stage, tags)
+
+    def load(self, name):
+        """名前でステージを読み込む (なければ KeyError)"""
+        row = self.connect().execute(
+            "SELECT name, start_x, start_y, angle, max_reflections, obstacles FROM stages WHERE name = ?",
+            (name,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return _stage_from_row(row)[1]
+
+    def tags_of(self, name):
+        return [tag for tag, in self.connect().execute(
+            "SELECT tag FROM stage_tags JOIN stages ON stages.id = stage_id WHERE name = ? ORDER BY tag",
+            (name,)
+        )]
+
+    def delete(self, name):
+        """ステージを削除する。削除したかを返す"""
+        with self.transaction() as connection:
+            return connection.execute("DELETE FROM stages WHERE name = ?", (name,)).rowcount > 0
+
+    def where(self, name=None, tags=(), min_obstacles=None, max_obstacles=None):
+        """検索条件を SQL の WHERE 句と値にする (name は名前の一部、tags はすべて持つもの)"""
+        clauses, values = [], []
+        if name:
+            clauses.append("instr(lower(name), lower(?)) > 0")
+            values.append(name)
+        for tag in tags:
+            clauses.append("id IN (SELECT stage_id FROM stage_tags WHERE tag = ?)")
+            values.append(tag)
+        if min_obstacles is not None:
+            clauses.append("obstacle_count >= ?")
+            values.append(min_obstacles)
+        if max_obstacles is not None:
+            clauses.append("obstacle_count <= ?")
+            values.append(max_obstacles)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), values
+
+    def search(self, name=None, tags=(), min_obstacles=None, max_obstacles=None, limit=None):
+        """条件に合うステージの一覧 ({"name", "obstacle_count", "tags", "updated"} を名前順に)
+
+        障害物は展開しないので、一覧の表示だけなら件数が多くても速い。
+        """
+        where, values = self.where(name, tags, min_obstacles, max_obstacles)
+        query = ("SELECT name, obstacle_count, updated,"
+                 " (SELECT group_concat(tag, char(10)) FROM stage_tags WHERE stage_id = stages.id)"
+                 " FROM stages" + where + " ORDER BY name")
+        if limit is not None:
+            query += " LIMIT ?"
+            values.append(limit)
+        return [{"name": name, "obstacle_count": count, "updated": updated,
+                 "tags": sorted(tags.split("\n")) if tags else []}
+                for name, count, updated, tags in self.connect().execute(query, values)]
+
+    def count(self, name=None, tags=(), min_obstacles=None, max_obstacles=None):
+        where, values = self.where(name, tags, min_obstacles, max_obstacles)
+        return self.connect().execute("SELECT COUNT(*) FROM stages" + where, values).fetchone()[0]
+
+    def all_tags(self):
+        """タグと、そのタグを持つステージの数"""
+        return self.connect().execute(
+            "SELECT tag, COUNT(*) FROM stage_tags GROUP BY tag ORDER BY tag"
+        ).fetchall()
+
+    def iter_stages(self, name=None, tags=(), min_obstacles=None, max_obstacles=None, batch_size=256):
+        """条件に合う (名前, ステージ) を名前順に少しずつ読み出す (バッチ処理用)"""
+        where, values = self.where(name, tags, min_obstacles, max_obstacles)
+        cursor = self.connect().execute(
+            "SELECT name, start_x, start_y, angle, max_reflections, obstacles FROM stages" + where +
+            " ORDER BY name", values
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _stage_from_row(row)
+
+    def import_files(self, paths, tags=()):
+        """設定ファイル (JSON) をまとめて取り込む。名前はファイル名 (拡張子なし)
+
+        ファイルに "tags" があればそれも付ける。読めなかったファイルは飛ばし、
+        (取り込んだ数, [(パス, エラー), ...]) を返す。
+        """
+        imported, failed = 0, []
+        with self.transaction() as connection:
+            for path in paths:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        stage = normalize_stage(json.load(f))
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    stage_tags = parse_tags(" ".join(stage.get("tags", [])))
+                    stage_tags += [tag for tag in tags if tag not in stage_tags]
+                    self.write_stage(connection, name, stage, stage_tags)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    failed.append((path, str(e)))
+                    continue
+                imported += 1
+        return imported, failed
+
+    def export_files(self, directory, name=None, tags=(), min_obstacles=None, max_obstacles=None):
+        """条件に合うステージを設定ファイル (JSON) として書き出す。書き出した数を返す"""
+        os.makedirs(directory, exist_ok=True)
+        stage_tags = {}
+        for summary in self.search(name, tags, min_obstacles, max_obstacles):
+            stage_tags[summary["name"]] = summary["tags"]
+        exported = 0
+        for stage_name, stage in self.iter_stages(name, tags, min_obstacles, max_obstacles):
+            if stage_tags.get(stage_name):
+                stage["tags"] = stage_tags[stage_name]
+            with open(os.path.join(directory, safe_file_name(stage_name) + ".json"), "w", encoding="utf-8") as f:
+                json.dump(stage, f, ensure_ascii=False, indent=4)
+            exported += 1
+        return exported
+
+class _Transaction:
+    """書き込みのロックを先に取り、ブロックを抜けたらコミットする (例外ならロールバック)"""
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        return False
+
+def _stage_from_row(row):
+    name, start_x, start_y, angle, max_reflections, obstacles = row
+    stage = {"obstacles": unpack_obstacles(obstacles)}
+    if start_x is not None and start_y is not None:
+        stage["start_position"] = {"x": start_x, "y": start_y}
+    if angle is not None:
+        stage["angle"] = angle
+    if max_reflections is not None:
+        stage["max_reflections"] = max_reflections
+    return name, stage
+
+def safe_file_name(name):
+    return UNSAFE_NAME.sub("_", name)
+
+def add_query_arguments(parser):
+    """ライブラリからステージを選ぶ検索条件の引数 (バッチ処理のコマンドと共有する)"""
+    parser.add_argument("--name", default=None, help="名前の一部")
+    parser.add_argument("--tag", action="append", default=[], help="付いているタグ (複数指定はすべて)")
+    parser.add_argument("--min-obstacles", type=int, default=None)
+    parser.add_argument("--max-obstacles", type=int, default=None)
+
+def query_from_args(args):
+    return {"name": args.name, "tags": args.tag,
+            "min_obstacles": args.min_obstacles, "max_obstacles": args.max_obstacles}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ステージライブラリの取り込み・書き出し・検索")
+    parser.add_argument("--library", default=None, help="ライブラリのファイル (省略時はホームディレクトリ)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="設定ファイルを取り込む")
+    import_parser.add_argument("files", nargs="+")
+    import_parser.add_argument("--tag", action="append", default=[], help="取り込んだステージに付けるタグ")
+    export_parser = commands.add_parser("export", help="設定ファイルとして書き出す")
+    export_parser.add_argument("directory")
+    add_query_arguments(export_parser)
+    list_parser = commands.add_parser("list", help="条件に合うステージを一覧する")
+    add_query_arguments(list_parser)
+    delete_parser = commands.add_parser("delete", help="ステージを削除する")
+    delete_parser.add_argument("names", nargs="+")
+    args = parser.parse_args(argv)
+
+    library = StageLibrary(args.library)
+    if args.command == "import":
+        imported, failed = library.import_files(args.files, parse_tags(" ".join(args.tag)))
+        for path, message in failed:
+            print(f"取り込めませんでした: {path}: {message}")
+        print(f"{imported}件を取り込みました: {library.path}")
+    elif args.command == "export":
+        print(f"{library.export_files(args.directory, **query_from_args(args))}件を書き出しました: {args.directory}")
+    elif args.command == "list":
+        for summary in library.search(**query_from_args(args)):
+            print(f"{summary['name']}\t障害物 {summary['obstacle_count']}\t{' '.join(summary['tags'])}")
+    else:
+        for name in args.names:
+            if not library.delete(name):
+                print(f"見つかりません: {name}")
+    library.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from monsttool import tracing
+
+class ScreenshotWriter:
+    """スクリーンショットをバックグラウンドで保存し、保持件数・容量・期間を超えた古いファイルを削除する"""
+    EXTENSIONS = {"png": ".png", "jpg": ".jpg", "webp": ".webp"}
+
+    def __init__(self, directory, image_format="png", compression=None, max_queue=8,
+                 max_files=300, max_bytes=512 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.directory = directory
+        # compressionがNoneのPNGは端末から受け取ったバイト列をそのまま書き込む
+        # (PNG: 圧縮レベル0-9、JPEG/WebP: 品質0-100)
+        self.image_format = image_format
+        self.compression = compression
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.saved = deque()
+        self.total_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        # 保存スレッドでの失敗 (画面に表示するため件数と最後のエラーを残す)
+        self.failed = 0
+        self.last_error = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, data=None, image=None, origin_y=0, screen_size=None):
+        """保存を予約して保存先のパスを返す。キューが一杯なら保存せずNoneを返す
+
+        imageがフィールドの行だけの場合は先頭行と画面サイズを渡すと、画面全体の大きさに戻して保存する
+        """
+        self.start()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        path = os.path.join(self.directory, f"screenshot_{timestamp}{self.EXTENSIONS[self.image_format]}")
+        try:
+            self.queue.put_nowait((path, data, image, origin_y, screen_size))
+        except queue.Full:
+            # 撮影を待たせないよう、書き込みが追いつかない分は保存を諦める
+            self.dropped += 1
+            return None
+        return path
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="ScreenshotWriter", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.scan_existing()
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self.write(*item)
+                self.enforce_retention()
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
+            finally:
+                self.queue.task_done()
+
+    def encode(self, data, image, origin_y=0, screen_size=None):
+        import cv2
+
+        from monsttool.capture import decode_screencap
+
+        if self.image_format == "png" and self.compression is None and data is not None:
+            return data
+        if image is None:
+            image = decode_screencap(data)
+        image = self.restore_screen(image, origin_y, screen_size)
+        params = []
+        if self.compression is not None:
+            flag = {
+                "png": cv2.IMWRITE_PNG_COMPRESSION,
+                "jpg": cv2.IMWRITE_JPEG_QUALITY,
+                "webp": cv2.IMWRITE_WEBP_QUALITY,
+            }[self.image_format]
+            params = [flag, int(self.compression)]
+        ok, encoded = cv2.imencode(self.EXTENSIONS[self.image_format], image, params)
+        if not ok:
+            raise ValueError("画像のエンコードに失敗しました")
+        return encoded.tobytes()
+
+    def restore_screen(self, image, origin_y, screen_size):
+        """フィールドの行だけの画像を画面全体のサイズに戻す (読み込み時に端末の設定を正しく判定するため)"""
+        import numpy as np
+
+        if screen_size is None:
+            return image
+        width, height = screen_size
+        if image.shape[:2] == (height, width):
+            return image
+        # 転送していない行は黒で埋める
+        full = np.zeros((height, width) + image.shape[2:], dtype=image.dtype)
+        full[origin_y:origin_y + image.shape[0]] = image
+        return full
+
+    def write(self, path, data, image, origin_y=0, screen_size=None):
+        with tracing.span("storage.encode", format=self.image_format):
+            encoded = self.encode(data, image, origin_y, screen_size)
+        # 書きかけのファイルが見えないよう、一時ファイルに書いてから置き換える
+        temp_path = path + ".tmp"
+        with tracing.span("storage.write", size=len(encoded)):
+            with open(temp_path, 'wb') as f:
+                f.write(encoded)
+            os.replace(temp_path, path)
+        self.saved.append((path, len(encoded), time.time()))
+        self.total_bytes += len(encoded)
+        self.written += 1
+
+    def scan_existing(self):
+        """起動前から残っているスクリーンショットを古い順に登録する"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.startswith("screenshot_"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        self.saved.extend(entries)
+        self.total_bytes += sum(entry[1] for entry in entries)
+
+    def enforce_retention(self):
+        """古い順に削除して、件数・容量・経過時間の上限に収める"""
+        now = time.time()
+        while self.saved and (len(self.saved) > self.max_files or
+                              self.total_bytes > self.max_bytes or
+                              now - self.saved[0][2] > self.max_age):
+            path, size, _ = self.saved.popleft()
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def failure_text(self):
+        """保存に失敗していれば件数と最後のエラーを返す (失敗がなければNone)"""
+        if not self.failed:
+            return None
+        return f"スクリーンショットの保存に失敗しました ({self.failed}件): {self.last_error}"
+
+    def flush(self):
+        """予約済みの保存がすべて終わるまで待つ"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
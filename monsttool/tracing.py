@@ -0,0 +1,158 @@
+"""撮影から表示までの処理区間 (スパン) の所要時間を記録する
+
+    from monsttool import tracing
+
+    tracing.enable()
+    with tracing.span("capture.screencap", serial=serial):
+        ...
+    tracing.export_chrome_trace("trace.json")   # Perfetto (ui.perfetto.dev) で開ける
+    print(tracing.format_summary())
+
+記録していない間の span() は共有の何もしないオブジェクトを返すだけなので、計測のために
+コードを残したままでもほとんど遅くならない。環境変数 MONSTTOOL_TRACE=1 で起動時から記録する。
+スパンの名前は「段階.処理」(capture, detect, simulate, render など) にし、段階をカテゴリとして書き出す。
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 書き出し用に残すスパンの数と、集計に使う名前ごとの直近の数
+MAX_EVENTS = 100000
+SUMMARY_HISTORY = 200
+
+_enabled = False
+_events = deque(maxlen=MAX_EVENTS)
+_durations = {}
+_thread_names = {}
+_lock = threading.Lock()
+
+class _NullSpan:
+    """記録していないときの span() の戻り値"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args = dict(self.args, error=exc_type.__name__)
+        record(self.name, self.start, end, self.args)
+        return False
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def span(name, **args):
+    """with 文で囲んだ区間を name のスパンとして記録する (args は書き出すときの付加情報)"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def traced(name):
+    """関数の呼び出しを name のスパンとして記録するデコレーター"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record(name, start_ns, end_ns, args=None):
+    """計測済みの区間 (time.perf_counter_ns() の値) をスパンとして追加する"""
+    thread = threading.current_thread()
+    with _lock:
+        _events.append((name, start_ns, end_ns - start_ns, thread.ident, args or None))
+        _thread_names.setdefault(thread.ident, thread.name)
+        durations = _durations.get(name)
+        if durations is None:
+            durations = _durations[name] = deque(maxlen=SUMMARY_HISTORY)
+        durations.append((end_ns - start_ns) / 1e6)
+
+def clear():
+    with _lock:
+        _events.clear()
+        _durations.clear()
+
+def chrome_trace_events():
+    """記録したスパンを Chrome の trace event 形式 (完了イベント "X"、時刻はマイクロ秒) にする"""
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+    trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+             for tid, name in thread_names.items()]
+    for name, start_ns, duration_ns, tid, args in events:
+        event = {
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": duration_ns / 1000,
+            "pid": pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                             for key, value in args.items()}
+        trace.append(event)
+    return trace
+
+def export_chrome_trace(path):
+    """記録したスパンを Perfetto や chrome://tracing で開ける JSON に書き出し、スパンの数を返す"""
+    events = chrome_trace_events()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return sum(1 for event in events if event["ph"] == "X")
+
+def summary():
+    """スパンの名前ごとの直近 SUMMARY_HISTORY 回の回数と p50/p95/p99/最大 (ミリ秒)"""
+    with _lock:
+        snapshot = {name: sorted(values) for name, values in _durations.items() if values}
+    result = {}
+    for name, values in snapshot.items():
+        def percentile(p):
+            return values[min(len(values) - 1, int(len(values) * p / 100))]
+        result[name] = {"count": len(values), "p50": percentile(50), "p95": percentile(95),
+                        "p99": percentile(99), "max": values[-1]}
+    return result
+
+def format_summary():
+    lines = []
+    for name, stats in sorted(summary().items()):
+        lines.append(f"{name}: {stats['count']}回 p50 {stats['p50']:.1f}ms / p95 {stats['p95']:.1f}ms"
+                     f" / p99 {stats['p99']:.1f}ms / 最大 {stats['max']:.1f}ms")
+    return "\n".join(lines) if lines else "スパンは記録されていません"
+
+if os.environ.get("MONSTTOOL_TRACE"):
+    enable()
@@ -0,0 +1,120 @@
+import time
+from tkinter import ttk
+
+from monsttool.capture import FrameSource
+from monsttool.paths import default_screenshot_dir
+from monsttool.ui.detector import CombinedDetectorUI
+from monsttool.ui.simulator import MonsterStrikeSimulator
+
+class StartupReport:
+    """起動処理の段階ごとの所要時間を記録する"""
+    def __init__(self, begin=None):
+        self.begin = time.perf_counter() if begin is None else begin
+        self.last = self.begin
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def summary(self):
+        lines = [f"起動時間: {(self.last - self.begin) * 1000:.0f}ms"]
+        for stage, seconds in self.stages:
+            lines.append(f"  {stage}: {seconds * 1000:.0f}ms")
+        return "\n".join(lines)
+
+class CombinedToolApp:
+    def __init__(self, root, startup_begin=None):
+        self.root = root
+        self.root.title("スタジアムツール")
+        self.startup = StartupReport(startup_begin)
+        self.startup.mark("モジュール読み込み")
+        
+        # メインコンテナの作成
+        self.main_container = ttk.Notebook(root)
+        self.main_container.pack(expand=True, fill="both")
+        
+        # タブの作成
+        self.simulator_tab = ttk.Frame(self.main_container)
+        self.detector_tab = ttk.Frame(self.main_container)
+        
+        self.main_container.add(self.simulator_tab, text="反射シミュレーター")
+        self.main_container.add(self.detector_tab, text="座標検出")
+        
+        # タブ切り替えイベントの設定
+        self.main_container.bind("<<NotebookTabChanged>>", self.on_tab_change)
+        
+        # 両タブで共有する撮影・デコード処理
+        self.frame_source = FrameSource(default_screenshot_dir())
+        
+        # シミュレーターのみ初期化し、座標検出タブは初めて開いたときに作成する
+        self.detector = None
+        self.init_simulator()
+        self.startup.mark("シミュレーター")
+        
+        # 左右キーでのタブ切り替えを設定
+        self.setup_tab_navigation()
+        
+        # MacOSのCommandキー用にキーボードショートカットを変更
+        self.root.bind("<Command-Up>", self.on_command_up)
+        self.root.bind("<Command-Down>", self.on_command_down)
+        
+        # 終了時に保存待ちのスクリーンショットを書き出す
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 最初の描画が終わって操作可能になった時点で起動時間を報告
+        self.root.after_idle(self.report_startup)
+
+    def report_startup(self):
+        self.startup.mark("初回描画")
+        print(self.startup.summary())
+
+    def on_close(self):
+        self.frame_source.close()
+        self.root.destroy()
+
+    def on_command_up(self, event):
+        """Command+↑で角度を10度増加"""
+        if hasattr(self, 'simulator'):
+            self.simulator.increase_angle_by_ten(event)
+
+    def on_command_down(self, event):
+        """Command+↓で角度を10度減少"""
+        if hasattr(self, 'simulator'):
+            self.simulator.decrease_angle_by_ten(event)
+
+    def on_tab_change(self, event):
+        """タブが切り替わったときの処理"""
+        current_tab = self.main_container.select()
+        if current_tab == str(self.simulator_tab):
+            # シミュレータータブが選択されたときはキャンバスにフォーカスを設定
+            self.simulator.canvas.focus_set()
+        elif current_tab == str(self.detector_tab) and self.detector is None:
+            self.init_detector()
+
+    def setup_tab_navigation(self):
+        """左右キーでのタブ切り替え機能を設定"""
+        self.root.bind("<Left>", self.previous_tab)
+        self.root.bind("<Right>", self.next_tab)
+
+    def next_tab(self, event):
+        """次のタブに切り替え"""
+        current = self.main_container.index("current")
+        if current < self.main_container.index("end") - 1:
+            self.main_container.select(current + 1)
+
+    def previous_tab(self, event):
+        """前のタブに切り替え"""
+        current = self.main_container.index("current")
+        if current > 0:
+            self.main_container.select(current - 1)
+
+    def init_simulator(self):
+        self.simulator = MonsterStrikeSimulator(self.simulator_tab, self.frame_source)
+
+    def init_detector(self):
+        self.detector = CombinedDetectorUI(self.detector_tab, self.frame_source)
+        # タブ作成前に撮影済みのフレームがあれば表示する
+        if self.frame_source.latest_frame is not None:
+            self.detector.process_frame(self.frame_source.latest_frame)
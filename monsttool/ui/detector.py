@@ -0,0 +1,197 @@
+import tkinter as tk
+from tkinter import messagebox, filedialog, ttk
+
+from monsttool import tracing
+from monsttool.capture import TRANSPORTS, CaptureError, FrameSource, MultiDeviceCapture
+from monsttool.detector import FrameStats, PlayerIconDetector
+from monsttool.paths import default_screenshot_dir
+
+class CombinedDetectorUI:
+    def __init__(self, parent, frame_source=None):
+        self.parent = parent
+        self.icon_detector = PlayerIconDetector()
+        
+        # 撮影とデコードはシミュレーターと共有する
+        if frame_source is None:
+            frame_source = FrameSource(default_screenshot_dir())
+        self.frame_source = frame_source
+        self.frame_source.subscribe(self.process_frame)
+        self.device_profile = None
+        self.multi_capture = MultiDeviceCapture()
+
+        self.setup_ui()
+        self.image_path = None
+        self.cropped_image = None
+        self.last_results = None
+        self.frame_stats = FrameStats()
+
+    def setup_ui(self):
+        self.main_frame = tk.Frame(self.parent)
+        self.main_frame.pack(expand=True, fill="both", padx=10, pady=10)
+
+        self.left_frame = tk.Frame(self.main_frame)
+        self.left_frame.pack(side=tk.LEFT, padx=5)
+
+        self.preview_label = tk.Label(self.left_frame)
+        self.preview_label.pack()
+
+        self.right_frame = tk.Frame(self.main_frame)
+        self.right_frame.pack(side=tk.RIGHT, padx=5, fill="y")
+
+        self.upload_btn = tk.Button(self.right_frame, text="画像をアップロード", command=self.upload_image)
+        self.upload_btn.pack(pady=5)
+
+        self.screenshot_btn = tk.Button(self.right_frame, text="スクリーンショットを撮影", command=self.take_screenshot)
+        self.screenshot_btn.pack(pady=5)
+
+        self.multi_capture_btn = tk.Button(self.right_frame, text="全端末で撮影", command=self.capture_all_devices)
+        self.multi_capture_btn.pack(pady=5)
+
+        # 転送方式の選択と計測
+        self.transport_frame = tk.Frame(self.right_frame)
+        self.transport_frame.pack(pady=5)
+        tk.Label(self.transport_frame, text="転送方式:").pack(side=tk.LEFT)
+        self.transport_var = tk.StringVar(value=self.frame_source.capturer.transport)
+        self.transport_combo = ttk.Combobox(self.transport_frame, textvariable=self.transport_var,
+                                            values=TRANSPORTS, state="readonly", width=9)
+        self.transport_combo.pack(side=tk.LEFT, padx=5)
+        self.transport_combo.bind("<<ComboboxSelected>>", self.on_transport_change)
+        self.benchmark_btn = tk.Button(self.right_frame, text="転送方式を計測", command=self.benchmark_transports)
+        self.benchmark_btn.pack(pady=5)
+
+        self.result_text = tk.Text(self.right_frame, height=20, width=35)
+        self.result_text.pack(pady=5, fill="y")
+
+    def take_screenshot(self):
+        """ADBを使用してスクリーンショットを撮影する"""
+        try:
+            with tracing.span("ui.take_screenshot"):
+                self.frame_source.capture()
+        except CaptureError as e:
+            messagebox.showerror("エラー", str(e))
+        except Exception as e:
+            messagebox.showerror("エラー", f"予期せぬエラーが発生しました: {str(e)}")
+
+    def capture_all_devices(self):
+        """接続されている全端末を並列に撮影し、端末ごとの検出結果を表示する"""
+        try:
+            outcomes = self.multi_capture.capture_all()
+        except CaptureError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+
+        self.result_text.delete(1.0, tk.END)
+        for serial, outcome in outcomes.items():
+            self.result_text.insert(tk.END, f"端末 {serial}:\n")
+            if outcome["error"]:
+                self.result_text.insert(tk.END, f"  エラー: {outcome['error']}\n")
+                continue
+            timings = outcome["timings"]
+            self.result_text.insert(tk.END,
+                f"  撮影 {timings['capture'] * 1000:.0f}ms / デコード {timings['decode'] * 1000:.0f}ms"
+                f" / 検出 {timings['detect'] * 1000:.0f}ms\n")
+            average, worst = self.multi_capture.latency_summary(serial)["total"]
+            self.result_text.insert(tk.END, f"  合計 平均 {average * 1000:.0f}ms / 最大 {worst * 1000:.0f}ms\n")
+            for i, result in enumerate(outcome["detections"], 1):
+                center = result['resized_center']
+                self.result_text.insert(tk.END, f"  検出 {i}: 中心 ({center['x']}, {center['y']})\n")
+            if not outcome["detections"]:
+                self.result_text.insert(tk.END, "  アイコンは検出されませんでした\n")
+
+    def on_transport_change(self, event=None):
+        self.frame_source.capturer.transport = self.transport_var.get()
+        self.multi_capture.capturer.transport = self.transport_var.get()
+
+    def benchmark_transports(self):
+        """転送方式ごとの取得時間を計測し、最速の方式を選択する"""
+        try:
+            results = self.frame_source.benchmark_transports()
+        except CaptureError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+        if not results:
+            messagebox.showerror("エラー", "使用できる転送方式がありませんでした")
+            return
+        self.transport_var.set(self.frame_source.capturer.transport)
+        self.on_transport_change()
+
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, "転送方式の計測結果:\n")
+        for transport, seconds in sorted(results.items(), key=lambda item: item[1]):
+            self.result_text.insert(tk.END, f"  {transport}: {seconds * 1000:.0f}ms\n")
+        self.result_text.insert(tk.END, f"選択: {self.transport_var.get()}\n")
+
+    def upload_image(self):
+        file_path = filedialog.askopenfilename(
+            title="画像を選択",
+            filetypes=[("画像ファイル", "*.png *.jpg *.jpeg")]
+        )
+        if file_path:
+            try:
+                self.frame_source.load_file(file_path)
+            except CaptureError as e:
+                messagebox.showerror("エラー", str(e))
+
+    def process_frame(self, frame):
+        self.image_path = frame.path
+        self.device_profile = frame.profile
+
+        # 画面が変化していなければ前回の検出結果とプレビューを再利用
+        if not frame.changed and self.last_results is not None:
+            self.frame_stats.record(skipped=True)
+            self.display_icon_results(self.last_results)
+            return
+        self.frame_stats.record(skipped=False)
+
+        try:
+            self.cropped_image = frame.cropped
+            if frame.detections is None:
+                frame.detections, _ = self.icon_detector.detect_icon_in_cropped(frame.cropped)
+            results = frame.detections
+            self.last_results = results
+            self.display_icon_results(results)
+            visualized = self.icon_detector.visualize_results(self.cropped_image, results)
+            self.display_preview(visualized)
+        except Exception as e:
+            messagebox.showerror("エラー", f"画像処理中にエラーが発生しました: {str(e)}")
+
+    def display_icon_results(self, results):
+        self.result_text.delete(1.0, tk.END)
+        if results:
+            self.result_text.insert(tk.END, "検出結果:\n")
+            for i, result in enumerate(results, 1):
+                resized = result['resized']
+                original = result['original']
+                resized_center = result['resized_center']
+                text = (f"検出 {i}:\n"
+                        f"  P座標 (リサイズ後): ({resized['x']}, {resized['y']})\n"
+                        f"  P座標 (元画像): ({original['x']}, {original['y']})\n"
+                        f"  中心座標 (リサイズ後): ({resized_center['x']}, {resized_center['y']})\n")
+                self.result_text.insert(tk.END, text)
+        else:
+            self.result_text.insert(tk.END, "指定されたサイズ範囲のアイコンが検出されませんでした\n")
+        if self.device_profile is not None:
+            self.result_text.insert(tk.END, f"端末プロファイル: {self.device_profile.name}\n")
+        self.result_text.insert(tk.END, self.frame_stats.stats_text() + "\n")
+        failure = self.frame_source.writer.failure_text()
+        if failure:
+            self.result_text.insert(tk.END, failure + "\n")
+
+    @tracing.traced("render.preview")
+    def display_preview(self, image):
+        import cv2
+        from PIL import Image, ImageTk
+
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        pil_image = Image.fromarray(image_rgb)
+
+        # シミュレーターのサイズに合わせる
+        target_width = 640  # MonsterStrikeSimulatorのfield_widthと同じ
+        target_height = 720 # MonsterStrikeSimulatorのfield_heightと同じ
+        with tracing.span("render.resize"):
+            pil_image = pil_image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+
+        with tracing.span("render.photoimage"):
+            photo = ImageTk.PhotoImage(pil_image)
+        self.preview_label.configure(image=photo)
+        self.preview_label.image = photo
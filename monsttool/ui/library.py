@@ -0,0 +1,144 @@
+import tkinter as tk
+from tkinter import messagebox, filedialog
+
+from monsttool.stagelibrary import parse_tags
+
+class StageLibraryDialog:
+    """ステージライブラリを名前・タグ・障害物の数で絞り込んで選ぶ画面"""
+    def __init__(self, parent, library, on_load, limit=500):
+        self.library = library
+        # 選んだステージを渡す関数 on_load(名前, ステージ)
+        self.on_load = on_load
+        # 一覧に出す最大件数 (多すぎるときは条件で絞ってもらう)
+        self.limit = limit
+        self.names = []
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("ステージライブラリ")
+
+        search_frame = tk.Frame(self.window)
+        search_frame.pack(padx=10, pady=5, fill=tk.X)
+        self.name_var = tk.StringVar()
+        self.tags_var = tk.StringVar()
+        self.min_var = tk.StringVar()
+        self.max_var = tk.StringVar()
+        tk.Label(search_frame, text="名前:").grid(row=0, column=0, sticky=tk.W)
+        tk.Entry(search_frame, textvariable=self.name_var, width=20).grid(row=0, column=1, columnspan=3, sticky=tk.W)
+        tk.Label(search_frame, text="タグ:").grid(row=1, column=0, sticky=tk.W)
+        tk.Entry(search_frame, textvariable=self.tags_var, width=20).grid(row=1, column=1, columnspan=3, sticky=tk.W)
+        tk.Label(search_frame, text="障害物の数:").grid(row=2, column=0, sticky=tk.W)
+        tk.Entry(search_frame, textvariable=self.min_var, width=5).grid(row=2, column=1, sticky=tk.W)
+        tk.Label(search_frame, text="〜").grid(row=2, column=2)
+        tk.Entry(search_frame, textvariable=self.max_var, width=5).grid(row=2, column=3, sticky=tk.W)
+        for var in (self.name_var, self.tags_var, self.min_var, self.max_var):
+            var.trace_add("write", lambda *args: self.refresh())
+
+        list_frame = tk.Frame(self.window)
+        list_frame.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
+        scrollbar = tk.Scrollbar(list_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox = tk.Listbox(list_frame, width=50, height=20, yscrollcommand=scrollbar.set)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.listbox.yview)
+        self.listbox.bind("<Double-Button-1>", lambda event: self.load_selected())
+        self.listbox.bind("<Return>", lambda event: self.load_selected())
+
+        self.status_label = tk.Label(self.window, text="", anchor=tk.W)
+        self.status_label.pack(padx=10, fill=tk.X)
+
+        button_frame = tk.Frame(self.window)
+        button_frame.pack(padx=10, pady=5, fill=tk.X)
+        tk.Button(button_frame, text="読み込み", command=self.load_selected).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text="削除", command=self.delete_selected).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text="JSONを取り込み", command=self.import_files).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text="JSONに書き出し", command=self.export_files).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text="閉じる", command=self.window.destroy).pack(side=tk.RIGHT, padx=2)
+
+        self.refresh()
+
+    def query(self):
+        """入力中の検索条件 (障害物の数が数値でなければその条件は使わない)"""
+        query = {"name": self.name_var.get().strip() or None, "tags": parse_tags(self.tags_var.get())}
+        for key, var in (("min_obstacles", self.min_var), ("max_obstacles", self.max_var)):
+            try:
+                query[key] = int(var.get())
+            except ValueError:
+                query[key] = None
+        return query
+
+    def refresh(self):
+        """検索条件に合うステージを一覧に出し直す"""
+        query = self.query()
+        try:
+            summaries = self.library.search(limit=self.limit, **query)
+            total = self.library.count(**query)
+        except Exception as e:
+            self.status_label.config(text=f"検索に失敗しました: {str(e)}")
+            return
+        self.listbox.delete(0, tk.END)
+        self.names = []
+        for summary in summaries:
+            text = f"{summary['name']}  (障害物 {summary['obstacle_count']})"
+            if summary["tags"]:
+                text += "  [" + " ".join(summary["tags"]) + "]"
+            self.listbox.insert(tk.END, text)
+            self.names.append(summary["name"])
+        status = f"{total}件"
+        if total > len(summaries):
+            status += f" (先頭の{len(summaries)}件を表示)"
+        self.status_label.config(text=status)
+
+    def selected_name(self):
+        selection = self.listbox.curselection()
+        return self.names[selection[0]] if selection else None
+
+    def load_selected(self):
+        name = self.selected_name()
+        if name is None:
+            return
+        try:
+            self.on_load(name, self.library.load(name))
+        except Exception as e:
+            messagebox.showerror("エラー", f"ステージの読み込みに失敗しました: {str(e)}", parent=self.window)
+
+    def delete_selected(self):
+        name = self.selected_name()
+        if name is None:
+            return
+        if not messagebox.askyesno("確認", f"「{name}」を削除しますか?", parent=self.window):
+            return
+        try:
+            self.library.delete(name)
+        except Exception as e:
+            messagebox.showerror("エラー", f"ステージの削除に失敗しました: {str(e)}", parent=self.window)
+        self.refresh()
+
+    def import_files(self):
+        """設定ファイルをまとめて取り込む (タグ欄に入力中のタグを付ける)"""
+        paths = filedialog.askopenfilenames(title="取り込む設定ファイルを選択",
+                                            filetypes=[("JSON ファイル", "*.json")], parent=self.window)
+        if not paths:
+            return
+        try:
+            imported, failed = self.library.import_files(paths, parse_tags(self.tags_var.get()))
+        except Exception as e:
+            messagebox.showerror("エラー", f"取り込みに失敗しました: {str(e)}", parent=self.window)
+            return
+        self.refresh()
+        message = f"{imported}件を取り込みました"
+        if failed:
+            message += f"\n取り込めなかったファイル ({len(failed)}件):\n" + "\n".join(
+                f"{path}: {error}" for path, error in failed[:10])
+        messagebox.showinfo("取り込み", message, parent=self.window)
+
+    def export_files(self):
+        """一覧に出ている条件のステージを設定ファイルとして書き出す"""
+        directory = filedialog.askdirectory(title="書き出し先のディレクトリを選択", parent=self.window)
+        if not directory:
+            return
+        try:
+            exported = self.library.export_files(directory, **self.query())
+        except Exception as e:
+            messagebox.showerror("エラー", f"書き出しに失敗しました: {str(e)}", parent=self.window)
+            return
+        messagebox.showinfo("書き出し", f"{exported}件を書き出しました: {directory}", parent=self.window)
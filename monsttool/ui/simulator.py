@@ -0,0 +1,1397 @@
+import time
+import tkinter as tk
+from tkinter import messagebox, filedialog
+
+from monsttool import tracing
+from monsttool.capture import CaptureError, FrameSource
+from monsttool.detector import FrameStats
+from monsttool.geometry import POLYGON_TYPES, absolute_points, make_polygon, normalize_polygon
+from monsttool.motion import validate_motion
+from monsttool.paths import default_screenshot_dir
+from monsttool.pipeline import ShotPipeline
+from monsttool.profiles import FIELD_SIZE
+from monsttool.resultcache import ResultCache, sweep_key
+from monsttool.stagelibrary import StageLibrary, parse_tags
+from monsttool.simulation import (CHARACTER_RADIUS, make_decay, shot_score, simulate_shot, sweep_angle_order,
+                                  sweep_angles)
+
+class MonsterStrikeSimulator:
+    def __init__(self, parent, frame_source=None):
+        self.parent = parent
+        
+        # フィールドサイズの設定
+        self.field_width, self.field_height = FIELD_SIZE
+        
+        # 撮影とデコードは座標検出タブと共有する
+        if frame_source is None:
+            frame_source = FrameSource(default_screenshot_dir())
+        self.frame_source = frame_source
+        
+        # フィールドの余白設定
+        self.margin = 5
+        
+        # メインフレームの作成
+        self.main_frame = tk.Frame(parent, bg="gray")
+        self.main_frame.pack(padx=self.margin, pady=self.margin, side=tk.LEFT)
+        
+        # キャンバスの作成
+        self.canvas = tk.Canvas(parent, width=self.field_width, height=self.field_height, bg="black")
+        self.canvas.pack(side=tk.LEFT)
+        
+        # その他の初期化
+        self.init_variables()
+        self.create_control_panel()
+        self.setup_bindings()
+        self.draw_field()
+
+    def init_variables(self):
+        # 背景画像の初期化
+        self.background_image = None
+        self.background_image_tk = None
+        self.background_id = None
+        # 配信されたフレームのうち、背景を作り直したものと省いたものの件数
+        self.frame_stats = FrameStats()
+        
+        # 障害物リストと選択状態の初期化
+        self.obstacles = []
+        self.selected_obstacle = None
+        
+        # 軌道の描画用
+        self.trajectory = []
+        
+        # リアルタイムシミュレーションのフラグ
+        self.is_dragging_start = False
+        self.is_dragging_obstacle = False
+        
+        # 撮影されたフレームを背景として受け取る
+        self.device_profile = None
+        self.frame_source.subscribe(self.process_frame)
+        
+        # 自動解析 (撮影→検出→角度スイープ) の結果
+        self.pipeline = ShotPipeline(self.frame_source)
+        # 全角度スイープの結果を起動をまたいで保存する (重ね合わせ、索引、自動解析で共有する)
+        self.result_cache = ResultCache()
+        self.pipeline.result_cache = self.result_cache
+        
+        # 名前とタグで検索できるステージの保存先と、最後に読み書きしたステージ名
+        self.stage_library = StageLibrary()
+        self.stage_name = None
+        self.library_dialog = None
+        self.player_shots = []
+        self.pipeline_timings = None
+        
+        # 耐久回数を引き継いだ複数ターンの計画
+        self.turn_plan = None
+        
+        # 全角度の軌道をまとめて描いた重ね合わせ画像
+        self.sweep_overlay = None
+        self.overlay_image_tk = None
+        self.overlay_id = None
+        self.overlay_visible = False
+        self.overlay_job = None
+        self.overlay_key = None
+        self.overlay_angles = []
+        self.overlay_results = []
+        self.overlay_rendered_at = 0.0
+        
+        # 事前計算したカバレッジ (開始位置ごとの通過回数のヒートマップ)
+        self.coverage_map = None
+        self.coverage_index = None
+        self.coverage_image_tk = None
+        
+        # Shift+クリックした障害物・位置に届く角度の索引と強調表示
+        self.reach_index = None
+        self.reach_target = None
+        self.reach_ranges = []
+        # 選んだ障害物に壁の反射だけで届くショット (鏡像法で求める)
+        self.wall_shots = []
+        
+        # 角度と開始位置のずれに対する現在のショットの安定度
+        self.shot_robustness = None
+
+    def create_control_panel(self):
+        # コントロールパネルの作成
+        self.control_panel = tk.Frame(self.parent, width=300, height=self.field_height)
+        self.control_panel.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 発射角度入力
+        self.create_angle_controls()
+        
+        # 最大反射回数の設定
+        self.create_reflection_controls()
+        
+        # 開始位置入力
+        self.create_start_position_controls()
+        
+        # 障害物制御
+        self.create_obstacle_controls()
+        
+        # ボタン類
+        self.create_action_buttons()
+        
+        # 座標表示エリア
+        self.create_coordinates_display()
+
+    def create_angle_controls(self):
+        self.angle_frame = tk.Frame(self.control_panel)
+        self.angle_frame.pack(padx=10, pady=5, fill=tk.X)
+        
+        tk.Label(self.angle_frame, text="発射角度 (0-1023):").pack(side=tk.LEFT)
+        self.angle_var = tk.StringVar(value="512")
+        self.angle_entry = tk.Entry(self.angle_frame, textvariable=self.angle_var, width=6)
+        self.angle_entry.pack(side=tk.LEFT, padx=5)
+
+    def create_reflection_controls(self):
+        self.max_reflection_frame = tk.Frame(self.control_panel)
+        self.max_reflection_frame.pack(padx=10, pady=5, fill=tk.X)
+        
+        tk.Label(self.max_reflection_frame, text="最大反射回数:").pack(side=tk.LEFT)
+        self.max_reflection_var = tk.StringVar(value="10")
+        self.max_reflection_entry = tk.Entry(self.max_reflection_frame, 
+                                           textvariable=self.max_reflection_var, width=6)
+        self.max_reflection_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 計算方式 (固定小数点は環境によらず同じ結果、距離場は障害物から離れた区間を飛ばす)
+        self.engine_frame = tk.Frame(self.control_panel)
+        self.engine_frame.pack(padx=10, pady=5, fill=tk.X)
+        tk.Label(self.engine_frame, text="計算方式:").pack(side=tk.LEFT)
+        self.engine_var = tk.StringVar(value="標準")
+        tk.OptionMenu(self.engine_frame, self.engine_var, "標準", "固定小数点", "距離場",
+                      command=lambda _: self.simulate()).pack(side=tk.LEFT, padx=5)
+        # 選んだ方式で計算できずに標準で計算したときの理由
+        self.engine_notice_label = tk.Label(self.control_panel, text="", fg="red", wraplength=280, justify=tk.LEFT)
+        self.engine_notice_label.pack(padx=10, fill=tk.X)
+        self.sdf_engine = None
+        
+        # 終了条件 (最大反射回数で終わるか、減速して止まるか。減速でも最大反射回数は上限になる)
+        self.termination_frame = tk.Frame(self.control_panel)
+        self.termination_frame.pack(padx=10, pady=5, fill=tk.X)
+        tk.Label(self.termination_frame, text="終了条件:").pack(side=tk.LEFT)
+        self.termination_var = tk.StringVar(value="反射回数")
+        tk.OptionMenu(self.termination_frame, self.termination_var, "反射回数", "減速",
+                      command=lambda _: self.simulate()).pack(side=tk.LEFT, padx=5)
+        
+        # ショットの種類 (貫通は円を通り抜けて当たりを数え、壁とそれ以外の障害物でだけ反射する)
+        self.shot_kind_frame = tk.Frame(self.control_panel)
+        self.shot_kind_frame.pack(padx=10, pady=5, fill=tk.X)
+        tk.Label(self.shot_kind_frame, text="ショット:").pack(side=tk.LEFT)
+        self.shot_kind_var = tk.StringVar(value="反射")
+        tk.OptionMenu(self.shot_kind_frame, self.shot_kind_var, "反射", "貫通",
+                      command=lambda _: self.simulate()).pack(side=tk.LEFT, padx=5)
+        
+        self.decay_frame = tk.Frame(self.control_panel)
+        self.decay_frame.pack(padx=10, fill=tk.X)
+        tk.Label(self.decay_frame, text="初速:").pack(side=tk.LEFT)
+        self.decay_speed_var = tk.StringVar(value="20")
+        tk.Entry(self.decay_frame, textvariable=self.decay_speed_var, width=5).pack(side=tk.LEFT, padx=2)
+        tk.Label(self.decay_frame, text="減速度:").pack(side=tk.LEFT)
+        self.decay_deceleration_var = tk.StringVar(value="0.05")
+        tk.Entry(self.decay_frame, textvariable=self.decay_deceleration_var, width=5).pack(side=tk.LEFT, padx=2)
+        tk.Label(self.decay_frame, text="反射で減る速さ(%):").pack(side=tk.LEFT)
+        self.decay_loss_var = tk.StringVar(value="5")
+        tk.Entry(self.decay_frame, textvariable=self.decay_loss_var, width=4).pack(side=tk.LEFT, padx=2)
+
+    def create_start_position_controls(self):
+        self.start_pos_frame = tk.Frame(self.control_panel)
+        self.start_pos_frame.pack(padx=10, pady=5, fill=tk.X)
+        
+        tk.Label(self.start_pos_frame, text="開始位置:").pack(anchor=tk.W)
+        
+        # X座標
+        self.start_pos_x_frame = tk.Frame(self.start_pos_frame)
+        self.start_pos_x_frame.pack(fill=tk.X)
+        tk.Label(self.start_pos_x_frame, text="X:").pack(side=tk.LEFT)
+        self.start_x_var = tk.StringVar(value="320")
+        self.start_x_entry = tk.Entry(self.start_pos_x_frame, textvariable=self.start_x_var, width=6)
+        self.start_x_entry.pack(side=tk.LEFT, padx=5)
+        
+        # Y座標
+        self.start_pos_y_frame = tk.Frame(self.start_pos_frame)
+        self.start_pos_y_frame.pack(fill=tk.X)
+        tk.Label(self.start_pos_y_frame, text="Y:").pack(side=tk.LEFT)
+        self.start_y_var = tk.StringVar(value="600")
+        self.start_y_entry = tk.Entry(self.start_pos_y_frame, textvariable=self.start_y_var, width=6)
+        self.start_y_entry.pack(side=tk.LEFT, padx=5)
+
+    def create_obstacle_controls(self):
+        self.obstacle_frame = tk.Frame(self.control_panel)
+        self.obstacle_frame.pack(padx=10, pady=5, fill=tk.X)
+        
+        tk.Label(self.obstacle_frame, text="障害物:").pack(anchor=tk.W)
+        
+        # 障害物タイプ選択
+        self.obstacle_type_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_type_frame.pack(fill=tk.X)
+        
+        self.obstacle_type = tk.StringVar(value="circle")
+        tk.Radiobutton(self.obstacle_type_frame, text="円", variable=self.obstacle_type, value="circle").pack(side=tk.LEFT)
+        tk.Radiobutton(self.obstacle_type_frame, text="正方形", variable=self.obstacle_type, value="square").pack(side=tk.LEFT)
+        tk.Radiobutton(self.obstacle_type_frame, text="多角形", variable=self.obstacle_type, value="polygon").pack(side=tk.LEFT)
+        tk.Radiobutton(self.obstacle_type_frame, text="線分", variable=self.obstacle_type, value="segment").pack(side=tk.LEFT)
+        
+        # サイズ設定
+        self.obstacle_size_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_size_frame.pack(fill=tk.X)
+        tk.Label(self.obstacle_size_frame, text="サイズ:").pack(side=tk.LEFT)
+        self.obstacle_size_var = tk.StringVar(value="60")
+        self.obstacle_size_entry = tk.Entry(self.obstacle_size_frame, textvariable=self.obstacle_size_var, width=6)
+        self.obstacle_size_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 多角形・線分の頂点 (X, Y からの相対座標を "dx,dy" の空白区切りで)
+        self.obstacle_points_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_points_frame.pack(fill=tk.X)
+        tk.Label(self.obstacle_points_frame, text="頂点:").pack(side=tk.LEFT)
+        self.obstacle_points_var = tk.StringVar(value="-40,-40 40,-40 0,40")
+        self.obstacle_points_entry = tk.Entry(self.obstacle_points_frame, textvariable=self.obstacle_points_var, width=20)
+        self.obstacle_points_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 位置設定
+        self.create_obstacle_position_controls()
+        
+        # 耐久回数設定
+        self.create_obstacle_durability_controls()
+
+    def create_obstacle_position_controls(self):
+        # X座標
+        self.obstacle_pos_x_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_pos_x_frame.pack(fill=tk.X)
+        tk.Label(self.obstacle_pos_x_frame, text="X:").pack(side=tk.LEFT)
+        self.obstacle_x_var = tk.StringVar(value="320")
+        self.obstacle_x_entry = tk.Entry(self.obstacle_pos_x_frame, textvariable=self.obstacle_x_var, width=6)
+        self.obstacle_x_entry.pack(side=tk.LEFT, padx=5)
+        
+        # Y座標
+        self.obstacle_pos_y_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_pos_y_frame.pack(fill=tk.X)
+        tk.Label(self.obstacle_pos_y_frame, text="Y:").pack(side=tk.LEFT)
+        self.obstacle_y_var = tk.StringVar(value="300")
+        self.obstacle_y_entry = tk.Entry(self.obstacle_pos_y_frame, textvariable=self.obstacle_y_var, width=6)
+        self.obstacle_y_entry.pack(side=tk.LEFT, padx=5)
+
+    def create_obstacle_durability_controls(self):
+        self.obstacle_durability_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_durability_frame.pack(fill=tk.X)
+        tk.Label(self.obstacle_durability_frame, text="耐久回数:").pack(side=tk.LEFT)
+        self.obstacle_durability_var = tk.StringVar(value="3")
+        self.obstacle_durability_entry = tk.Entry(self.obstacle_durability_frame, 
+                                                textvariable=self.obstacle_durability_var, width=6)
+        self.obstacle_durability_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 動き (直線: "vx,vy"、往復: "dx,dy,周期"。速度と周期は発射からのステップ数あたり)
+        self.obstacle_motion_frame = tk.Frame(self.obstacle_frame)
+        self.obstacle_motion_frame.pack(fill=tk.X)
+        tk.Label(self.obstacle_motion_frame, text="動き:").pack(side=tk.LEFT)
+        self.obstacle_motion_var = tk.StringVar(value="なし")
+        tk.OptionMenu(self.obstacle_motion_frame, self.obstacle_motion_var, "なし", "直線", "往復").pack(side=tk.LEFT)
+        self.obstacle_motion_values_var = tk.StringVar(value="200,0,4000")
+        self.obstacle_motion_entry = tk.Entry(self.obstacle_motion_frame,
+                                              textvariable=self.obstacle_motion_values_var, width=14)
+        self.obstacle_motion_entry.pack(side=tk.LEFT, padx=5)
+
+    def obstacle_motion(self):
+        """入力された動きの辞書 (なしならNone)。数値が不正なら ValueError"""
+        kind = self.obstacle_motion_var.get()
+        if kind == "なし":
+            return None
+        values = [float(value) for value in self.obstacle_motion_values_var.get().split(",")]
+        if kind == "直線":
+            if len(values) != 2:
+                raise ValueError("直線の動きの値の数が違います")
+            return validate_motion({"type": "linear", "vx": values[0], "vy": values[1]})
+        if len(values) != 3:
+            raise ValueError("往復の動きの値の数が違います")
+        return validate_motion({"type": "patrol", "dx": values[0], "dy": values[1], "period": values[2]})
+
+    def create_action_buttons(self):
+        self.button_frame = tk.Frame(self.control_panel)
+        self.button_frame.pack(padx=10, pady=10, fill=tk.X)
+        
+        tk.Button(self.button_frame, text="障害物追加", command=self.add_obstacle).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="障害物削除", command=self.remove_obstacle).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="リセット", command=self.reset).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="背景画像を設定", command=self.load_background).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="背景画像を削除", command=self.clear_background).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="設定を保存", command=self.save_configuration).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="設定を読み込み", command=self.load_configuration).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="ライブラリに保存", command=self.save_to_library).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="ステージライブラリ", command=self.open_stage_library).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="スクリーンショット撮影", command=self.take_screenshot).pack(fill=tk.X, pady=2)
+        tk.Button(self.button_frame, text="自動解析 (撮影→最適角度)", command=self.run_pipeline).pack(fill=tk.X, pady=2)
+        self.overlay_button = tk.Button(self.button_frame, text="全角度の軌道を表示",
+                                        command=self.toggle_sweep_overlay)
+        self.overlay_button.pack(fill=tk.X, pady=2)
+        self.coverage_button = tk.Button(self.button_frame, text="カバレッジを読み込み",
+                                         command=self.toggle_coverage)
+        self.coverage_button.pack(fill=tk.X, pady=2)
+        
+        # 撮影から表示までの処理区間の計測 (オフの間はほぼ負荷なし)
+        self.trace_frame = tk.Frame(self.button_frame)
+        self.trace_frame.pack(fill=tk.X, pady=2)
+        self.trace_var = tk.BooleanVar(value=tracing.is_enabled())
+        tk.Checkbutton(self.trace_frame, text="処理時間を記録", variable=self.trace_var,
+                       command=self.toggle_tracing).pack(side=tk.LEFT)
+        tk.Button(self.trace_frame, text="トレースを書き出し",
+                  command=self.export_trace).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.plan_frame = tk.Frame(self.button_frame)
+        self.plan_frame.pack(fill=tk.X, pady=2)
+        tk.Label(self.plan_frame, text="ターン数:").pack(side=tk.LEFT)
+        self.plan_turns_var = tk.StringVar(value="3")
+        tk.Entry(self.plan_frame, textvariable=self.plan_turns_var, width=4).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.plan_frame, text="複数ターンを計画", command=self.plan_turns).pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+    def create_coordinates_display(self):
+        self.coordinates_frame = tk.Frame(self.control_panel)
+        self.coordinates_frame.pack(padx=10, pady=5, fill=tk.X)
+        
+        tk.Label(self.coordinates_frame, text="座標情報:", font=("Helvetica", 10, "bold")).pack(anchor=tk.W)
+        
+        self.coordinates_scrollbar = tk.Scrollbar(self.coordinates_frame)
+        self.coordinates_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.coordinates_text = tk.Text(self.coordinates_frame, height=5, width=30,
+                                      yscrollcommand=self.coordinates_scrollbar.set)
+        self.coordinates_text.pack(fill=tk.BOTH, expand=True)
+        self.coordinates_scrollbar.config(command=self.coordinates_text.yview)
+
+    def setup_bindings(self):
+        # マウスイベント
+        self.canvas.bind("<Button-1>", self.on_canvas_click)
+        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+        self.canvas.bind("<Shift-Button-1>", self.on_canvas_shift_click)
+        
+        # キーボードイベント - キャンバスにフォーカスを持たせる
+        self.canvas.bind("<Up>", self.increase_angle)
+        self.canvas.bind("<Down>", self.decrease_angle)
+        self.canvas.focus_set()  # キャンバスにフォーカスを設定
+        
+        # 入力値の変更検出
+        self.angle_var.trace_add("write", self.on_input_change)
+        self.start_x_var.trace_add("write", self.on_input_change)
+        self.start_y_var.trace_add("write", self.on_input_change)
+        self.max_reflection_var.trace_add("write", self.on_input_change)
+
+    def increase_angle(self, event=None):  # event=None を追加
+        try:
+            current_angle = int(self.angle_var.get())
+            new_angle = min(1023, current_angle + 1)
+            self.angle_var.set(str(new_angle))
+            self.simulate()  # 即座にシミュレーションを更新
+        except ValueError:
+            pass
+
+    def decrease_angle(self, event=None):  # event=None を追加
+        try:
+            current_angle = int(self.angle_var.get())
+            new_angle = max(0, current_angle - 1)
+            self.angle_var.set(str(new_angle))
+            self.simulate()  # 即座にシミュレーションを更新
+        except ValueError:
+            pass
+
+    def take_screenshot(self):
+        """ADBを使用してスクリーンショットを撮影する"""
+        try:
+            with tracing.span("ui.take_screenshot"):
+                self.frame_source.capture()
+        except CaptureError as e:
+            messagebox.showerror("エラー", str(e))
+        except Exception as e:
+            messagebox.showerror("エラー", f"予期せぬエラーが発生しました: {str(e)}")
+
+    def process_frame(self, frame):
+        """配信されたフレームを背景として設定する"""
+        from PIL import ImageTk
+        
+        self.device_profile = frame.profile
+        
+        # 画面が変化していなければ前回の背景画像と軌道をそのまま使う
+        if not frame.changed and self.background_image is not None:
+            self.frame_stats.record(skipped=True)
+            self.update_coordinates_display()
+            return
+        self.frame_stats.record(skipped=False)
+        
+        try:
+            # クロップとフィールドサイズへの変換はフレーム側で一度だけ行う
+            image = frame.field_image()
+            
+            # Tkinter用に変換
+            with tracing.span("render.photoimage"):
+                self.background_image_tk = ImageTk.PhotoImage(image)
+            self.background_image = image
+            
+            # 画面を再描画
+            self.draw_field()
+            
+            # シミュレーションを再実行
+            self.simulate()
+            
+        except Exception as e:
+            messagebox.showerror("エラー", f"画像処理中にエラーが発生しました: {str(e)}")
+
+    def load_background(self):
+        file_path = filedialog.askopenfilename(
+            title="背景画像を選択",
+            filetypes=[("画像ファイル", "*.png *.jpg *.jpeg *.gif *.bmp")]
+        )
+        
+        if file_path:
+            try:
+                self.frame_source.load_file(file_path)
+            except CaptureError as e:
+                messagebox.showerror("エラー", str(e))
+
+    def clear_background(self):
+        self.background_image = None
+        self.background_image_tk = None
+        self.background_id = None
+        self.draw_field()
+
+    @tracing.traced("render.draw_field")
+    def draw_field(self):
+        self.canvas.delete("all")
+        
+        # 背景画像の描画
+        if self.background_image_tk:
+            self.background_id = self.canvas.create_image(
+                self.field_width // 2, 
+                self.field_height // 2, 
+                image=self.background_image_tk
+            )
+        
+        # カバレッジのヒートマップ
+        if self.coverage_image_tk:
+            self.canvas.create_image(
+                self.field_width // 2,
+                self.field_height // 2,
+                image=self.coverage_image_tk
+            )
+        
+        # 全角度の軌道は1枚の画像として背景のすぐ上に重ねる
+        self.overlay_id = None
+        if self.overlay_visible and self.overlay_image_tk:
+            self.overlay_id = self.canvas.create_image(
+                self.field_width // 2,
+                self.field_height // 2,
+                image=self.overlay_image_tk
+            )
+        
+        # フィールドの枠を描画
+        self.canvas.create_rectangle(0, 0, self.field_width, self.field_height, outline="white")
+        
+        # グリッド線を描画
+        self.draw_grid()
+        
+        # 障害物を描画
+        self.draw_obstacles()
+        
+        # 開始位置を描画
+        self.draw_start_position()
+        
+        # 自動解析で求めた各プレイヤーの最良ショットを描画
+        self.draw_player_shots()
+        
+        # 複数ターンの計画を描画
+        self.draw_turn_plan()
+        
+        # 選んだ障害物・位置に届く角度の範囲を描画
+        self.draw_reach_ranges()
+        
+        # 軌道を描画
+        self.draw_trajectory()
+
+    def draw_grid(self):
+        grid_margin = 30
+        
+        # グリッド線の縁を描画
+        self.canvas.create_rectangle(
+            grid_margin, grid_margin, 
+            self.field_width - grid_margin, self.field_height - grid_margin, 
+            outline="pink", dash=(3, 3), width=2
+        )
+        
+        # 縦9分割のグリッド線
+        rows = 9
+        row_height = (self.field_height - 2 * grid_margin) / rows
+        for i in range(1, rows):
+            y = grid_margin + i * row_height
+            self.canvas.create_line(
+                grid_margin, y, 
+                self.field_width - grid_margin, y, 
+                fill="pink", dash=(2, 2), width=2
+            )
+        
+        # 横8分割のグリッド線
+        cols = 8
+        col_width = (self.field_width - 2 * grid_margin) / cols
+        for i in range(1, cols):
+            x = grid_margin + i * col_width
+            self.canvas.create_line(
+                x, grid_margin, 
+                x, self.field_height - grid_margin, 
+                fill="pink", dash=(2, 2), width=2
+            )
+
+    def draw_obstacles(self):
+        for i, obstacle in enumerate(self.obstacles):
+            color = "yellow" if i == self.selected_obstacle else "white"
+            if obstacle["type"] == "circle":
+                size = obstacle["size"]
+                x, y = obstacle["x"], obstacle["y"]
+                self.canvas.create_oval(x-size, y-size, x+size, y+size, outline=color, width=2)
+                
+                if "durability" in obstacle:
+                    self.canvas.create_text(x, y, text=str(obstacle["durability"]), fill="white")
+            elif obstacle["type"] == "polygon":
+                coords = [coord for point in absolute_points(obstacle) for coord in point]
+                self.canvas.create_polygon(*coords, outline=color, fill="", width=2)
+            elif obstacle["type"] == "segment":
+                coords = [coord for point in absolute_points(obstacle) for coord in point]
+                self.canvas.create_line(*coords, fill=color, width=3)
+            else:  # square
+                size = obstacle["size"]
+                x, y = obstacle["x"], obstacle["y"]
+                self.canvas.create_rectangle(x-size, y-size, x+size, y+size, outline=color, width=2)
+            
+            if "motion" in obstacle:
+                self.draw_obstacle_motion(obstacle, color)
+
+    def draw_obstacle_motion(self, obstacle, color):
+        """動く障害物の中心が動く道筋 (直線は 2000 ステップ分の矢印、往復は往復する区間)"""
+        motion = obstacle["motion"]
+        x, y = obstacle["x"], obstacle["y"]
+        if motion["type"] == "linear":
+            end_x, end_y = x + motion["vx"] * 2000, y + motion["vy"] * 2000
+            self.canvas.create_line(x, y, end_x, end_y, fill=color, dash=(3, 3), arrow=tk.LAST)
+        else:
+            self.canvas.create_line(x, y, x + motion["dx"], y + motion["dy"], fill=color, dash=(3, 3))
+            self.canvas.create_oval(x + motion["dx"] - 3, y + motion["dy"] - 3,
+                                    x + motion["dx"] + 3, y + motion["dy"] + 3, outline=color)
+
+    def draw_start_position(self):
+        try:
+            start_x = int(self.start_x_var.get())
+            start_y = int(self.start_y_var.get())
+            self.canvas.create_oval(start_x-45, start_y-45, start_x+45, start_y+45, outline="red", width=4)
+        except ValueError:
+            pass
+
+    def draw_player_shots(self):
+        colors = ["cyan", "magenta", "orange", "yellow"]
+        for i, shot in enumerate(self.player_shots):
+            color = colors[i % len(colors)]
+            x, y = shot["x"], shot["y"]
+            self.canvas.create_oval(x-45, y-45, x+45, y+45, outline=color, width=2)
+            self.canvas.create_text(x, y - 55, text=f"P{i+1}: {shot['angle']}", fill=color)
+            trajectory = shot["result"]["trajectory"]
+            if len(trajectory) > 1:
+                self.canvas.create_line(*[coord for point in trajectory for coord in point],
+                                        fill=color, width=2, dash=(4, 2))
+
+    def draw_turn_plan(self):
+        if self.turn_plan is None:
+            return
+        colors = ["cyan", "magenta", "orange", "yellow"]
+        for turn, shot in enumerate(self.turn_plan["shots"]):
+            color = colors[shot["player"] % len(colors)]
+            x, y = shot["x"], shot["y"]
+            self.canvas.create_oval(x-45, y-45, x+45, y+45, outline=color, width=2)
+            self.canvas.create_text(x, y - 55, text=f"T{turn+1} P{shot['player']+1}: {shot['angle']}", fill=color)
+            trajectory = shot["result"]["trajectory"]
+            if len(trajectory) > 1:
+                self.canvas.create_line(*[coord for point in trajectory for coord in point],
+                                        fill=color, width=2, dash=(2, 4))
+
+    def draw_reach_ranges(self):
+        """届く角度の範囲を開始位置のまわりの弧で示す (1回目の反射までに届く範囲は橙色)"""
+        if not self.reach_ranges:
+            return
+        try:
+            start_x = int(self.start_x_var.get())
+            start_y = int(self.start_y_var.get())
+        except ValueError:
+            return
+        radius = 70
+        for first, last, bounce in self.reach_ranges:
+            # キャンバスはy軸が下向きなので、Tkの角度 (反時計回り) は符号を反転する
+            self.canvas.create_arc(start_x - radius, start_y - radius, start_x + radius, start_y + radius,
+                                   start=-first * 360 / 1024, extent=-(last - first + 1) * 360 / 1024,
+                                   style=tk.ARC, outline="orange" if bounce <= 1 else "gold", width=6)
+
+    def draw_trajectory(self):
+        if self.trajectory:
+            for i in range(1, len(self.trajectory)):
+                x1, y1 = self.trajectory[i-1]
+                x2, y2 = self.trajectory[i]
+                self.canvas.create_line(x1, y1, x2, y2, fill="green", width=5)
+                
+                if i > 1 and i < len(self.trajectory)-1:
+                    self.canvas.create_oval(x1-30, y1-30, x1+30, y1+30, outline="lime", width=5)
+            
+            if len(self.trajectory) > 0:
+                last_x, last_y = self.trajectory[-1]
+                self.canvas.create_oval(last_x-30, last_y-30, last_x+30, last_y+30, outline="lime", width=5)
+
+    @tracing.traced("simulate")
+    def simulate(self):
+        try:
+            start_x = int(self.start_x_var.get())
+            start_y = int(self.start_y_var.get())
+            angle_val = int(self.angle_var.get())
+            max_reflections = int(self.max_reflection_var.get())
+            
+            decay = self.shot_decay()
+            pierce = self.shot_kind_var.get() == "貫通"
+            
+            with tracing.span("simulate.shot", engine=self.engine_var.get()):
+                engine = self.shot_engine(decay, pierce)
+                if decay is None and not pierce:
+                    result = engine(start_x, start_y, angle_val, max_reflections, self.obstacles,
+                                    self.field_width, self.field_height)
+                else:
+                    # 減速モードと貫通は標準の計算方式だけが対応する
+                    result = simulate_shot(start_x, start_y, angle_val, max_reflections, self.obstacles,
+                                           self.field_width, self.field_height, decay=decay, pierce=pierce)
+            self.trajectory = result["trajectory"]
+            with tracing.span("simulate.overlay"):
+                self.refresh_sweep_overlay(start_x, start_y, max_reflections, decay, pierce)
+            with tracing.span("render.coverage"):
+                self.refresh_coverage(start_x, start_y)
+            with tracing.span("simulate.reachability"):
+                self.update_reachability(start_x, start_y, max_reflections, decay, pierce)
+            with tracing.span("simulate.robustness"):
+                self.update_robustness(start_x, start_y, angle_val, max_reflections, decay, pierce)
+            self.draw_field()
+        except ValueError:
+            # エラーが発生した場合は軌道をクリア
+            self.trajectory = []
+            self.shot_robustness = None
+            self.draw_field()
+
+    def shot_decay(self):
+        """減速モードの設定 (反射回数で終わるならNone)。数値が正しくなければ ValueError"""
+        if self.termination_var.get() != "減速":
+            return None
+        return make_decay(float(self.decay_speed_var.get()), float(self.decay_deceleration_var.get()),
+                          float(self.decay_loss_var.get()) / 100)
+
+    def shot_engine(self, decay=None, pierce=False):
+        """選んだ計算方式のシミュレーション関数 (simulate_shot と同じ引数)
+
+        選んだ方式が今の配置や条件で計算できなければ simulate_shot を返し、その理由を表示する。
+        """
+        engine = simulate_shot
+        notice = ""
+        if self.engine_var.get() != "標準" and (decay is not None or pierce):
+            notice = "減速モードと貫通は標準の計算方式で計算しています"
+        elif self.engine_var.get() == "固定小数点":
+            from monsttool.fixedpoint import simulate_shot_fixed, unsupported_reason
+            
+            reason = unsupported_reason(self.obstacles)
+            if reason is None:
+                engine = simulate_shot_fixed
+            else:
+                notice = f"{reason} (標準の計算方式で計算しています)"
+        elif self.engine_var.get() == "距離場":
+            from monsttool.sdf import DistanceFieldEngine
+            
+            # 距離場は障害物を動かした分だけ更新するので、作ったものを使い続ける
+            if self.sdf_engine is None:
+                self.sdf_engine = DistanceFieldEngine()
+            engine = self.sdf_engine
+        self.engine_notice_label.config(text=notice)
+        return engine
+
+    def is_dragging(self):
+        """開始位置か障害物をドラッグ中か (重い更新は離したときにまとめて行う)"""
+        return self.is_dragging_start or self.is_dragging_obstacle
+
+    def update_robustness(self, start_x, start_y, angle, max_reflections, decay=None, pierce=False):
+        """現在のショットの安定度を調べる (ドラッグ中は離したときにまとめて行う)"""
+        if self.is_dragging():
+            return
+        from monsttool.robustness import analyze_robustness
+        
+        self.shot_robustness = analyze_robustness(start_x, start_y, angle, max_reflections,
+                                                  self.obstacles, field_width=self.field_width,
+                                                  field_height=self.field_height, decay=decay, pierce=pierce)
+
+    def toggle_tracing(self):
+        if self.trace_var.get():
+            tracing.clear()
+            tracing.enable()
+        else:
+            tracing.disable()
+
+    def export_trace(self):
+        """記録した処理区間を Perfetto で開ける JSON に書き出し、区間ごとの集計を表示する"""
+        file_path = filedialog.asksaveasfilename(
+            title="トレースを書き出し",
+            defaultextension=".json",
+            filetypes=[("JSON ファイル", "*.json")]
+        )
+        if not file_path:
+            return
+        try:
+            count = tracing.export_chrome_trace(file_path)
+        except Exception as e:
+            messagebox.showerror("エラー", f"トレースの書き出しに失敗しました: {str(e)}")
+            return
+        messagebox.showinfo("トレース", f"{count}区間を書き出しました: {file_path}\n\n{tracing.format_summary()}")
+
+    def toggle_sweep_overlay(self):
+        """全角度の軌道の重ね合わせ表示を切り替える"""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.overlay_button.config(text="全角度の軌道を隠す")
+            self.overlay_key = None
+            self.simulate()
+        else:
+            self.overlay_button.config(text="全角度の軌道を表示")
+            self.stop_sweep_overlay()
+            self.draw_field()
+
+    def stop_sweep_overlay(self):
+        if self.overlay_job is not None:
+            self.canvas.after_cancel(self.overlay_job)
+            self.overlay_job = None
+        self.overlay_angles = []
+        self.overlay_results = []
+
+    def refresh_sweep_overlay(self, start_x, start_y, max_reflections, decay=None, pierce=False):
+        """開始位置、反射回数、障害物が変わったときだけ全角度の軌道を描き直す"""
+        if not self.overlay_visible:
+            return
+        key = (start_x, start_y, max_reflections, repr(self.obstacles), decay, pierce)
+        if key == self.overlay_key:
+            return
+        from monsttool.overlay import TrajectoryOverlay
+        
+        self.stop_sweep_overlay()
+        self.overlay_key = key
+        if self.sweep_overlay is None:
+            self.sweep_overlay = TrajectoryOverlay(self.field_width, self.field_height,
+                                                   color=(0, 255, 255))
+        self.sweep_overlay.clear()
+        cached = self.result_cache.get_sweep(self.sweep_cache_key(start_x, start_y, max_reflections,
+                                                                  decay, pierce))
+        if cached is not None:
+            # 前に最後まで計算した結果があれば一度に描く
+            self.sweep_overlay.add_trajectories([result["trajectory"] for _, result in cached])
+            self.update_overlay_image()
+            return
+        # 粗い刻みから順に描くので、途中でも全体の傾向が見える
+        self.overlay_angles = sweep_angle_order()
+        self.overlay_rendered_at = 0.0
+        self.overlay_job = self.canvas.after_idle(self.sweep_overlay_step)
+
+    @tracing.traced("simulate.overlay_step")
+    def sweep_overlay_step(self, chunk_size=64, render_interval=0.1):
+        """角度を少しずつシミュレーションして重ね合わせ画像に積算する"""
+        self.overlay_job = None
+        start_x, start_y, max_reflections, _, decay, pierce = self.overlay_key
+        chunk = self.overlay_angles[:chunk_size]
+        self.overlay_angles = self.overlay_angles[chunk_size:]
+        results = sweep_angles(start_x, start_y, max_reflections, self.obstacles, angles=chunk,
+                               field_width=self.field_width, field_height=self.field_height,
+                               decay=decay, pierce=pierce)
+        self.sweep_overlay.add_trajectories([result["trajectory"] for _, result in results])
+        self.overlay_results.extend(results)
+        if not self.overlay_angles:
+            self.result_cache.put_sweep(self.sweep_cache_key(start_x, start_y, max_reflections, decay, pierce),
+                                        self.overlay_results)
+        
+        # 画像への変換は重いので、一定間隔と最後にだけ行う
+        now = time.perf_counter()
+        if not self.overlay_angles or now - self.overlay_rendered_at >= render_interval:
+            self.overlay_rendered_at = now
+            self.update_overlay_image()
+        if self.overlay_angles:
+            self.overlay_job = self.canvas.after(1, self.sweep_overlay_step)
+
+    @tracing.traced("render.overlay")
+    def update_overlay_image(self):
+        from PIL import ImageTk
+        
+        self.overlay_image_tk = ImageTk.PhotoImage(self.sweep_overlay.to_pil())
+        if self.overlay_id is not None:
+            self.canvas.itemconfigure(self.overlay_id, image=self.overlay_image_tk)
+        else:
+            self.overlay_id = self.canvas.create_image(
+                self.field_width // 2,
+                self.field_height // 2,
+                image=self.overlay_image_tk
+            )
+            # 障害物や軌道より下、背景より上に置く
+            if self.background_id is not None:
+                self.canvas.tag_raise(self.overlay_id, self.background_id)
+            else:
+                self.canvas.tag_lower(self.overlay_id)
+
+    def sweep_cache_key(self, start_x, start_y, max_reflections, decay=None, pierce=False):
+        """現在の配置での全角度スイープ (標準の計算方式) を保存するキー"""
+        return sweep_key(start_x, start_y, max_reflections, self.obstacles, self.field_width,
+                         self.field_height, decay=decay, pierce=pierce)
+
+    def toggle_coverage(self):
+        """事前計算したカバレッジを読み込む (読み込み済みなら表示をやめる)"""
+        if self.coverage_map is not None:
+            self.coverage_map = None
+            self.coverage_index = None
+            self.coverage_image_tk = None
+            self.coverage_button.config(text="カバレッジを読み込み")
+            self.draw_field()
+            self.update_coordinates_display()
+            return
+        
+        directory = filedialog.askdirectory(title="カバレッジの出力ディレクトリを選択")
+        if not directory:
+            return
+        try:
+            from monsttool.coverage import CoverageMap
+            
+            self.coverage_map = CoverageMap(directory)
+        except Exception as e:
+            messagebox.showerror("エラー", f"カバレッジの読み込みに失敗しました: {str(e)}")
+            return
+        self.coverage_button.config(text="カバレッジを隠す")
+        self.simulate()
+        self.update_coordinates_display()
+
+    def refresh_coverage(self, start_x, start_y):
+        """開始位置に最も近い格子点のヒートマップに切り替える"""
+        if self.coverage_map is None:
+            return
+        from PIL import Image, ImageTk
+        
+        index = self.coverage_map.nearest_start(start_x, start_y)
+        if index == self.coverage_index:
+            return
+        self.coverage_index = index
+        self.coverage_image_tk = None
+        if index is not None:
+            image = Image.fromarray(self.coverage_map.heatmap(index), "RGBA")
+            self.coverage_image_tk = ImageTk.PhotoImage(image)
+
+    def update_reachability(self, start_x, start_y, max_reflections, decay=None, pierce=False):
+        """選んだ障害物・位置に届く角度を索引から引く (配置が変わった分だけ索引を作り直す)"""
+        from monsttool.reachability import ReachabilityIndex, angle_ranges
+        
+        self.reach_ranges = []
+        self.wall_shots = []
+        # 障害物をドラッグしている間は索引も鏡像法も止め、離したときにまとめて行う
+        if self.is_dragging_obstacle:
+            return
+        if self.reach_target is not None and self.reach_target[0] == "obstacle":
+            from monsttool.unfolding import solve_wall_shots
+            
+            # 鏡像法はシミュレーションしないので、開始位置のドラッグ中でも毎回求める
+            target = self.obstacles[self.reach_target[1]]
+            self.wall_shots = solve_wall_shots(start_x, start_y, target["x"], target["y"], max_reflections,
+                                               self.obstacles, target_index=self.reach_target[1],
+                                               target_reach=CHARACTER_RADIUS + target["size"],
+                                               field_width=self.field_width, field_height=self.field_height,
+                                               decay=decay, pierce=pierce)
+        # 開始位置をドラッグしている間は索引を作り直さず、離したときにまとめて行う
+        if self.reach_target is None or self.is_dragging_start:
+            return
+        if (self.reach_index is None or
+                not self.reach_index.matches(start_x, start_y, max_reflections, decay, pierce)):
+            key = self.sweep_cache_key(start_x, start_y, max_reflections, decay, pierce)
+            cached = self.result_cache.get_sweep(key)
+            self.reach_index = ReachabilityIndex(start_x, start_y, max_reflections, self.obstacles,
+                                                 field_width=self.field_width,
+                                                 field_height=self.field_height, decay=decay, pierce=pierce,
+                                                 results=cached)
+            if cached is None:
+                self.result_cache.put_sweep(key, list(enumerate(self.reach_index.results)))
+        elif self.reach_index.obstacles != self.obstacles:
+            self.reach_index.update(self.obstacles)
+        
+        if self.reach_target[0] == "obstacle":
+            entries = self.reach_index.angles_for_obstacle(self.reach_target[1])
+        else:
+            entries = self.reach_index.angles_for_point(self.reach_target[1], self.reach_target[2])
+        self.reach_ranges = angle_ranges(entries)
+
+    @tracing.traced("ui.run_pipeline")
+    def run_pipeline(self):
+        """撮影からプレイヤーごとの最適角度の表示までを一括で行う"""
+        try:
+            max_reflections = int(self.max_reflection_var.get())
+            decay = self.shot_decay()
+        except ValueError:
+            messagebox.showerror("エラー", "数値を正しく入力してください")
+            return
+        
+        try:
+            outcome = self.pipeline.run(self.obstacles, max_reflections, decay=decay,
+                                        pierce=self.shot_kind_var.get() == "貫通")
+        except CaptureError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("エラー", f"自動解析中にエラーが発生しました: {str(e)}")
+            return
+        
+        timings = outcome["timings"]
+        
+        # 両タブに同じフレームを配信 (検出結果はフレームに載っているので再計算されない)
+        stage_start = time.perf_counter()
+        self.frame_source.publish(outcome["frame"])
+        timings["publish"] = time.perf_counter() - stage_start
+        
+        stage_start = time.perf_counter()
+        self.show_player_shots(outcome["shots"])
+        timings["render"] = time.perf_counter() - stage_start
+        
+        timings["total"] = time.perf_counter() - outcome["started"]
+        self.pipeline_timings = timings
+        self.update_coordinates_display()
+
+    def plan_turns(self):
+        """検出したプレイヤー (いなければ開始位置) が順に撃つ場合の、壊す数が最大になる計画を立てる"""
+        from monsttool.planner import ShotPlanner
+        
+        try:
+            max_reflections = int(self.max_reflection_var.get())
+            decay = self.shot_decay()
+            turns = int(self.plan_turns_var.get())
+            if self.player_shots:
+                players = [(shot["x"], shot["y"]) for shot in self.player_shots]
+            else:
+                players = [(int(self.start_x_var.get()), int(self.start_y_var.get()))]
+        except ValueError:
+            messagebox.showerror("エラー", "数値を正しく入力してください")
+            return
+        if turns <= 0:
+            messagebox.showerror("エラー", "ターン数は1以上を入力してください")
+            return
+        
+        planner = ShotPlanner(self.obstacles, max_reflections,
+                              field_width=self.field_width, field_height=self.field_height, decay=decay,
+                              pierce=self.shot_kind_var.get() == "貫通")
+        self.turn_plan = planner.plan(players, turns)
+        self.draw_field()
+        self.update_coordinates_display()
+
+    def show_player_shots(self, shots):
+        """検出した各プレイヤーの最良ショットを表示し、最も良いものを開始位置にする"""
+        self.player_shots = [shot for shot in shots if shot["result"] is not None]
+        self.turn_plan = None
+        if self.player_shots:
+            best = max(self.player_shots, key=lambda shot: shot_score(shot["result"]))
+            self.start_x_var.set(str(best["x"]))
+            self.start_y_var.set(str(best["y"]))
+            self.angle_var.set(str(best["angle"]))
+        self.draw_field()
+
+    def add_obstacle(self):
+        try:
+            x = int(self.obstacle_x_var.get())
+            y = int(self.obstacle_y_var.get())
+            size = int(self.obstacle_size_var.get())
+            obstacle_type = self.obstacle_type.get()
+            
+            obstacle = {
+                "type": obstacle_type,
+                "x": x,
+                "y": y,
+                "size": size
+            }
+            
+            if obstacle_type in POLYGON_TYPES:
+                points = []
+                for pair in self.obstacle_points_var.get().split():
+                    dx, dy = pair.split(",")
+                    points.append((x + int(dx), y + int(dy)))
+                try:
+                    obstacle = make_polygon(points, obstacle_type)
+                except ValueError as e:
+                    messagebox.showerror("エラー", str(e))
+                    return
+            
+            if obstacle_type == "circle":
+                durability = int(self.obstacle_durability_var.get())
+                obstacle["durability"] = durability
+                obstacle["max_durability"] = durability
+            
+            try:
+                motion = self.obstacle_motion()
+            except ValueError:
+                messagebox.showerror("エラー", "動きは、直線なら vx,vy、往復なら dx,dy,周期 (正の値) で入力してください")
+                return
+            if motion is not None:
+                obstacle["motion"] = motion
+            
+            self.obstacles.append(obstacle)
+            self.selected_obstacle = len(self.obstacles) - 1
+            self.player_shots = []
+            self.turn_plan = None
+            self.draw_field()
+            
+            self.simulate()
+            self.update_coordinates_display()
+        except ValueError:
+            messagebox.showerror("エラー", "数値を正しく入力してください")
+
+    def remove_obstacle(self):
+        if self.selected_obstacle is not None and 0 <= self.selected_obstacle < len(self.obstacles):
+            self.obstacles.pop(self.selected_obstacle)
+            self.selected_obstacle = None
+            self.reach_target = None
+            self.player_shots = []
+            self.turn_plan = None
+            self.draw_field()
+            self.simulate()
+
+    def reset(self):
+        self.trajectory = []
+        self.obstacles = []
+        self.selected_obstacle = None
+        self.player_shots = []
+        self.turn_plan = None
+        self.reach_target = None
+        self.reach_ranges = []
+        self.draw_field()
+        self.update_coordinates_display()
+
+    def save_configuration(self):
+        file_path = filedialog.asksaveasfilename(
+            title="設定を保存",
+            defaultextension=".json",
+            filetypes=[("JSON ファイル", "*.json")]
+        )
+        
+        if file_path:
+            try:
+                import json
+                config_data = self.configuration()
+                
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(config_data, f, ensure_ascii=False, indent=4)
+                
+                messagebox.showinfo("成功", f"設定を保存しました: {file_path}")
+            except Exception as e:
+                messagebox.showerror("エラー", f"設定の保存に失敗しました: {str(e)}")
+
+    def configuration(self):
+        """現在の配置と開始位置を設定ファイルと同じ形式の辞書にする (数値が正しくなければ ValueError)"""
+        return {
+            "obstacles": self.obstacles,
+            "start_position": {
+                "x": int(self.start_x_var.get()),
+                "y": int(self.start_y_var.get())
+            },
+            "angle": int(self.angle_var.get()),
+            "max_reflections": int(self.max_reflection_var.get())
+        }
+
+    def apply_configuration(self, config_data):
+        """設定ファイルと同じ形式の辞書を読み込んで表示し直す (不正な障害物があれば何も変えずに ValueError)"""
+        if "obstacles" in config_data:
+            obstacles = [normalize_polygon(obstacle) if obstacle["type"] in POLYGON_TYPES else obstacle
+                         for obstacle in config_data["obstacles"]]
+            for obstacle in obstacles:
+                if "motion" in obstacle:
+                    validate_motion(obstacle["motion"])
+            self.obstacles = obstacles
+            self.player_shots = []
+            self.turn_plan = None
+            self.reach_target = None
+        
+        if "start_position" in config_data:
+            self.start_x_var.set(str(config_data["start_position"]["x"]))
+            self.start_y_var.set(str(config_data["start_position"]["y"]))
+        
+        if "angle" in config_data:
+            self.angle_var.set(str(config_data["angle"]))
+        
+        if "max_reflections" in config_data:
+            self.max_reflection_var.set(str(config_data["max_reflections"]))
+        
+        self.draw_field()
+        self.simulate()
+        self.update_coordinates_display()
+
+    def open_stage_library(self):
+        """ステージライブラリの検索画面を開く (開いていれば前に出す)"""
+        from monsttool.ui.library import StageLibraryDialog
+        
+        if self.library_dialog is not None and self.library_dialog.window.winfo_exists():
+            self.library_dialog.window.lift()
+            return
+        self.library_dialog = StageLibraryDialog(self.parent, self.stage_library, self.load_library_stage)
+
+    def load_library_stage(self, name, stage):
+        self.apply_configuration(stage)
+        self.stage_name = name
+
+    def save_to_library(self):
+        """現在の配置を名前とタグを付けてステージライブラリに保存する"""
+        from tkinter import simpledialog
+        
+        try:
+            config_data = self.configuration()
+        except ValueError:
+            messagebox.showerror("エラー", "数値を正しく入力してください")
+            return
+        name = simpledialog.askstring("ライブラリに保存", "ステージ名:", initialvalue=self.stage_name or "",
+                                      parent=self.parent)
+        if not name:
+            return
+        try:
+            tags = self.stage_library.tags_of(name.strip())
+            tag_text = simpledialog.askstring("ライブラリに保存", "タグ (カンマか空白で区切る):",
+                                              initialvalue=" ".join(tags), parent=self.parent)
+            if tag_text is None:
+                return
+            self.stage_library.save(name, config_data, parse_tags(tag_text))
+        except Exception as e:
+            messagebox.showerror("エラー", f"ライブラリへの保存に失敗しました: {str(e)}")
+            return
+        self.stage_name = name.strip()
+        if self.library_dialog is not None and self.library_dialog.window.winfo_exists():
+            self.library_dialog.refresh()
+
+    def load_configuration(self):
+        file_path = filedialog.askopenfilename(
+            title="設定を読み込み",
+            filetypes=[("JSON ファイル", "*.json")]
+        )
+        
+        if file_path:
+            try:
+                import json
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    config_data = json.load(f)
+                
+                self.apply_configuration(config_data)
+                self.stage_name = None
+                
+                messagebox.showinfo("成功", f"設定を読み込みました: {file_path}")
+            except Exception as e:
+                messagebox.showerror("エラー", f"設定の読み込みに失敗しました: {str(e)}")
+
+    def update_coordinates_display(self):
+        self.coordinates_text.delete(1.0, tk.END)
+        
+        if self.obstacles:
+            self.coordinates_text.insert(tk.END, "障害物:\n")
+            for i, obstacle in enumerate(self.obstacles):
+                obj_type = {"circle": "円", "polygon": "多角形", "segment": "線分"}.get(obstacle["type"], "正方形")
+                durability_info = ""
+                if obstacle["type"] == "circle" and "durability" in obstacle:
+                    durability_info = f", 耐久={obstacle['durability']}"
+                
+                motion_info = ""
+                if "motion" in obstacle:
+                    motion_info = ", 動き=直線" if obstacle["motion"]["type"] == "linear" else ", 動き=往復"
+                
+                self.coordinates_text.insert(tk.END, 
+                    f"{i+1}: {obj_type}, X={obstacle['x']}, Y={obstacle['y']}, サイズ={obstacle['size']}{durability_info}{motion_info}\n")
+        else:
+            self.coordinates_text.insert(tk.END, "障害物: なし\n")
+        
+        if self.player_shots:
+            self.coordinates_text.insert(tk.END, "最良ショット:\n")
+            for i, shot in enumerate(self.player_shots):
+                destroyed, hits = shot_score(shot["result"])
+                stability = ""
+                if shot.get("robustness") is not None:
+                    stability = f", 安定度={shot['robustness']['stability'] * 100:.0f}%"
+                self.coordinates_text.insert(tk.END,
+                    f"P{i+1}: ({shot['x']}, {shot['y']}) 角度={shot['angle']}, "
+                    f"破壊={destroyed}, ヒット={hits}, 評価数={shot['evaluated']}{stability}\n")
+        
+        if self.turn_plan is not None:
+            plan = self.turn_plan
+            self.coordinates_text.insert(tk.END,
+                f"{len(plan['shots'])}ターンの計画: 破壊={plan['destroyed']}, ヒット={plan['hits']}\n")
+            for turn, shot in enumerate(plan["shots"]):
+                destroyed, hits = shot_score(shot["result"])
+                self.coordinates_text.insert(tk.END,
+                    f"  T{turn+1} P{shot['player']+1}: ({shot['x']}, {shot['y']}) 角度={shot['angle']}, "
+                    f"破壊={destroyed}, ヒット={hits}\n")
+        
+        if self.pipeline_timings:
+            timings = self.pipeline_timings
+            budget_ms = self.pipeline.latency_budget * 1000
+            total_ms = timings["total"] * 1000
+            status = "予算内" if total_ms <= budget_ms else "予算超過"
+            self.coordinates_text.insert(tk.END, f"処理時間: {total_ms:.0f}ms / 予算 {budget_ms:.0f}ms ({status})\n")
+            labels = [("capture", "撮影"), ("detect", "検出"), ("sweep", "スイープ"),
+                      ("robustness", "安定度"), ("publish", "配信"), ("render", "描画")]
+            for key, label in labels:
+                self.coordinates_text.insert(tk.END, f"  {label}: {timings[key] * 1000:.0f}ms\n")
+        
+        if self.shot_robustness is not None:
+            robustness = self.shot_robustness
+            self.coordinates_text.insert(tk.END,
+                f"現在のショットの安定度: {robustness['stability'] * 100:.0f}% "
+                f"({robustness['samples']}通りのずれ, 停止位置のずれ 最大{robustness['end_max_shift']:.0f})\n")
+            for i, rate in enumerate(robustness["hit_rate"]):
+                self.coordinates_text.insert(tk.END,
+                    f"  障害物{i+1}: 命中 {rate * 100:.0f}%, 破壊 {robustness['destroy_rate'][i] * 100:.0f}%\n")
+        
+        if self.reach_target is not None:
+            if self.reach_target[0] == "obstacle":
+                label = f"障害物{self.reach_target[1] + 1}に当たる角度"
+            else:
+                label = f"({self.reach_target[1]}, {self.reach_target[2]}) を通る角度"
+            if self.is_dragging_obstacle:
+                self.coordinates_text.insert(tk.END, f"{label}: ドラッグを離すと更新します\n")
+            elif self.reach_ranges:
+                ranges = ", ".join(
+                    (f"{first}" if first == last else f"{first}-{last}") + f" ({bounce}回目)"
+                    for first, last, bounce in self.reach_ranges
+                )
+                self.coordinates_text.insert(tk.END, f"{label}: {ranges}\n")
+            else:
+                self.coordinates_text.insert(tk.END, f"{label}: なし\n")
+            if self.wall_shots:
+                shots = ", ".join(
+                    (f"{first}" if first == last else f"{first}-{last}") + f" (壁{shot['bounces']}回)"
+                    for shot in self.wall_shots for first, last in [shot["angles"]]
+                )
+                self.coordinates_text.insert(tk.END, f"壁の反射だけで届く角度: {shots}\n")
+        elif self.obstacles:
+            self.coordinates_text.insert(tk.END, "Shift+クリックで障害物・位置に届く角度を表示\n")
+        
+        if self.coverage_map is not None:
+            coverage = self.coverage_map
+            if self.coverage_index is None:
+                self.coordinates_text.insert(tk.END, "カバレッジ: 計算済みの開始位置がありません\n")
+            else:
+                x, y = coverage.starts[self.coverage_index]
+                self.coordinates_text.insert(tk.END, f"カバレッジ (開始位置 {x}, {y}):\n")
+                for i, rate in enumerate(coverage.hit_rates(self.coverage_index)):
+                    self.coordinates_text.insert(tk.END, f"  障害物{i+1}: {rate * 100:.0f}%の角度で命中\n")
+            try:
+                max_reflections = int(self.max_reflection_var.get())
+            except ValueError:
+                max_reflections = None
+            if not coverage.matches(self.obstacles, max_reflections):
+                self.coordinates_text.insert(tk.END, "  ※ 現在の配置とは異なる条件で計算されています\n")
+        
+        if self.frame_stats.frames_total:
+            self.coordinates_text.insert(tk.END, self.frame_stats.stats_text() + "\n")
+        failure = self.frame_source.writer.failure_text()
+        if failure:
+            self.coordinates_text.insert(tk.END, failure + "\n")
+
+    def on_canvas_click(self, event):
+        x, y = event.x, event.y
+        
+        try:
+            start_x = int(self.start_x_var.get())
+            start_y = int(self.start_y_var.get())
+            if (start_x - 15 <= x <= start_x + 15 and 
+                start_y - 15 <= y <= start_y + 15):
+                self.is_dragging_start = True
+                self.start_x_var.set(str(x))
+                self.start_y_var.set(str(y))
+                self.simulate()
+                return
+        except ValueError:
+            pass
+        
+        for i, obstacle in enumerate(self.obstacles):
+            x, y = obstacle["x"], obstacle["y"]
+            size = obstacle["size"]
+            if (x - size <= event.x <= x + size and 
+                y - size <= event.y <= y + size):
+                self.selected_obstacle = i
+                
+                self.obstacle_type.set(obstacle["type"])
+                self.obstacle_size_var.set(str(obstacle["size"]))
+                self.obstacle_x_var.set(str(obstacle["x"]))
+                self.obstacle_y_var.set(str(obstacle["y"]))
+                
+                if obstacle["type"] == "circle" and "durability" in obstacle:
+                    self.obstacle_durability_var.set(str(obstacle["durability"]))
+                else:
+                    self.obstacle_durability_var.set("3")
+                
+                self.simulate()
+                self.update_coordinates_display()
+                return
+        
+        # 何もない場所なら選択と角度の強調を解除する
+        self.selected_obstacle = None
+        self.is_dragging_start = False
+        self.reach_target = None
+        self.simulate()
+        self.update_coordinates_display()
+
+    def on_canvas_shift_click(self, event):
+        """Shift+クリックした障害物に当たる角度 (何もない場所ならその位置を通る角度) の強調を切り替える"""
+        target = ("point", event.x, event.y)
+        for i, obstacle in enumerate(self.obstacles):
+            x, y = obstacle["x"], obstacle["y"]
+            size = obstacle["size"]
+            if (x - size <= event.x <= x + size and
+                y - size <= event.y <= y + size):
+                target = ("obstacle", i)
+                break
+        # Shift+ドラッグで前に選んでいた障害物が動かないよう、選択は解除する
+        self.selected_obstacle = None
+        self.is_dragging_start = False
+        # 同じ障害物をもう一度 Shift+クリックしたら強調をやめる
+        self.reach_target = None if target == self.reach_target else target
+        self.simulate()
+        self.update_coordinates_display()
+
+    def on_canvas_drag(self, event):
+        if self.is_dragging_start:
+            self.start_x_var.set(str(event.x))
+            self.start_y_var.set(str(event.y))
+            self.update_coordinates_display()
+            return
+            
+        if self.selected_obstacle is not None:
+            self.is_dragging_obstacle = True
+            self.obstacles[self.selected_obstacle]["x"] = event.x
+            self.obstacles[self.selected_obstacle]["y"] = event.y
+            self.player_shots = []
+            self.turn_plan = None
+            
+            self.obstacle_x_var.set(str(event.x))
+            self.obstacle_y_var.set(str(event.y))
+            
+            self.simulate()
+            self.update_coordinates_display()
+
+    def on_canvas_release(self, event):
+        if self.is_dragging():
+            self.is_dragging_start = False
+            self.is_dragging_obstacle = False
+            # ドラッグ中に止めていた索引と安定度の更新を行う
+            self.simulate()
+            self.update_coordinates_display()
+
+    def increase_angle_by_ten(self, event):
+        """角度を10度増加"""
+        try:
+            current_angle = int(self.angle_var.get())
+            new_angle = min(1023, current_angle + 10)
+            self.angle_var.set(str(new_angle))
+            self.simulate()  # 即座にシミュレーションを更新
+        except ValueError:
+            pass
+
+    def decrease_angle_by_ten(self, event):
+        """角度を10度減少"""
+        try:
+            current_angle = int(self.angle_var.get())
+            new_angle = max(0, current_angle - 10)
+            self.angle_var.set(str(new_angle))
+            self.simulate()  # 即座にシミュレーションを更新
+        except ValueError:
+            pass
+        
+    def on_input_change(self, *args):
+        self.simulate()
+        self.update_coordinates_display()
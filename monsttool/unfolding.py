@@ -0,0 +1,207 @@
+"""壁だけで反射して目標に届く角度を鏡像法で求める
+
+壁での反射は、フィールドを壁で折り返した平面の上では直線になる。キャラクターの中心が動ける
+範囲 (壁から半径だけ内側の長方形) を鏡に映していき、目標の鏡像それぞれへ向かう直線の角度を
+計算する。直線をフィールドに折り返したときに途中で別の障害物に触れるものは除く。
+シミュレーションを回さずに「どの角度なら届くか」が分かる。
+"""
+import math
+
+from monsttool.geometry import POLYGON_TYPES, polygon_shape, segments_distance_sq
+from monsttool.motion import motion_pieces
+from monsttool.profiles import FIELD_SIZE
+from monsttool.simulation import CHARACTER_RADIUS, STEP_VELOCITY, stop_distance
+
+# 1ステップ (0.2ピクセル) ずつ進む実際の軌道とのずれを見込んで、かすめる程度の障害物も遮るとみなす
+OCCLUSION_MARGIN = 1.0
+
+def fold(value, length):
+    """折り返した平面の座標を 0-length の範囲に戻す"""
+    value = value % (2 * length)
+    return 2 * length - value if value > length else value
+
+def target_images(target_x, target_y, max_bounces, width, height):
+    """反射回数 max_bounces 以内で映る目標の鏡像 (x, y, x方向の反射回数, y方向の反射回数) を列挙する
+
+    座標は中心が動ける長方形 (幅 width, 高さ height) の左上を原点とする。
+    """
+    images = []
+    for i in range(-max_bounces, max_bounces + 1):
+        image_x = i * width + (width - target_x if i % 2 else target_x)
+        for j in range(-(max_bounces - abs(i)), max_bounces - abs(i) + 1):
+            image_y = j * height + (height - target_y if j % 2 else target_y)
+            images.append((image_x, image_y, abs(i), abs(j)))
+    return images
+
+def crossings(start, end, length):
+    """start から end までに越える折り返しの線 (length の倍数) の数"""
+    low, high = sorted((start, end))
+    return max(math.ceil(high / length) - math.floor(low / length) - 1, 0)
+
+def folded_segments(start_x, start_y, end_x, end_y, width, height):
+    """折り返した平面上の線分を、フィールド内の線分のリストにする"""
+    cuts = {0.0, 1.0}
+    for start, end, length in ((start_x, end_x, width), (start_y, end_y, height)):
+        if end == start:
+            continue
+        low, high = sorted((start, end))
+        for k in range(math.floor(low / length) + 1, math.ceil(high / length)):
+            cuts.add((k * length - start) / (end - start))
+    cuts = sorted(cuts)
+    segments = []
+    for t0, t1 in zip(cuts, cuts[1:]):
+        if t1 <= t0:
+            continue
+        # 区間の中点がどのマス (何回折り返したか) にあるかで向きを決める
+        middle = (t0 + t1) / 2
+        points = []
+        for t in (t0, t1):
+            point = []
+            for start, end, length in ((start_x, end_x, width), (start_y, end_y, height)):
+                cell = math.floor((start + (end - start) * middle) / length)
+                offset = start + (end - start) * t - cell * length
+                point.append(length - offset if cell % 2 else offset)
+            points.append(tuple(point))
+        segments.append((points[0], points[1]))
+    return segments
+
+def segment_touches(start, end, obstacle, radius=CHARACTER_RADIUS, margin=0.0):
+    """線分に沿って動くキャラクターが障害物の当たり判定 (を margin だけ広げた範囲) に入るか"""
+    (x0, y0), (x1, y1) = start, end
+    if obstacle["type"] in POLYGON_TYPES:
+        reach = radius + margin
+        return polygon_shape(obstacle).segment_distance_sq(x0, y0, x1, y1) <= reach * reach
+    reach = radius + obstacle["size"] + margin
+    cx, cy = obstacle["x"], obstacle["y"]
+    dx, dy = x1 - x0, y1 - y0
+    if obstacle["type"] == "circle":
+        length_sq = dx * dx + dy * dy
+        t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((cx - x0) * dx + (cy - y0) * dy) / length_sq))
+        nx, ny = x0 + dx * t - cx, y0 + dy * t - cy
+        return nx * nx + ny * ny <= reach * reach
+    # 正方形: 半径分広げた正方形と線分の交差 (スラブ法)
+    low, high = 0.0, 1.0
+    for position, delta, center in ((x0, dx, cx), (y0, dy, cy)):
+        if delta == 0:
+            if abs(position - center) > reach:
+                return False
+            continue
+        a = (center - reach - position) / delta
+        b = (center + reach - position) / delta
+        low, high = max(low, min(a, b)), min(high, max(a, b))
+        if low > high:
+            return False
+    return True
+
+def sweep_touches(start, end, obstacle, start_time, radius=CHARACTER_RADIUS, margin=0.0):
+    """動く障害物が、キャラクターが線分を進む間に動く範囲のどこかで触れうるか (多めに拾う)
+
+    start_time は線分の始点に着くまでのステップ数。障害物の中心が動く線分と経路の距離を、
+    当たり判定の外接円の半径と比べる。
+    """
+    (x0, y0), (x1, y1) = start, end
+    duration = math.hypot(x1 - x0, y1 - y0) / STEP_VELOCITY
+    reach = radius + obstacle["size"] * (2 ** 0.5 if obstacle["type"] == "square" else 1) + margin
+    for piece_start, piece_end, ox, oy, ux, uy in motion_pieces(obstacle["motion"], start_time, duration):
+        length = min(piece_end, duration) - piece_start
+        ax, ay = obstacle["x"] + ox, obstacle["y"] + oy
+        if segments_distance_sq(x0, y0, x1, y1, ax, ay, ax + ux * length, ay + uy * length) <= reach * reach:
+            return True
+    return False
+
+def moving_blocked(segments, moving):
+    """経路の線分を順に進む間に、動く障害物のどれかに触れうるか"""
+    elapsed = 0.0
+    for a, b in segments:
+        if any(sweep_touches(a, b, obstacle, elapsed, margin=OCCLUSION_MARGIN) for obstacle in moving):
+            return True
+        elapsed += math.hypot(b[0] - a[0], b[1] - a[1]) / STEP_VELOCITY
+    return False
+
+def travel_reaches(segments, decay):
+    """減速モードで、折り返した経路の最後まで止まらずに進めるか (区間の境目ごとに反射で速さが減る)"""
+    speed = decay["speed"]
+    for i, ((x0, y0), (x1, y1)) in enumerate(segments):
+        if i:
+            speed *= 1 - decay["bounce_loss"]
+        length = math.hypot(x1 - x0, y1 - y0)
+        if stop_distance(speed, decay["deceleration"]) < length:
+            return False
+        speed = math.sqrt(max(speed * speed - 2 * decay["deceleration"] * length, 0.0))
+    return True
+
+def solve_wall_shots(start_x, start_y, target_x, target_y, max_reflections, obstacles,
+                     target_index=None, target_reach=0.0,
+                     field_width=FIELD_SIZE[0], field_height=FIELD_SIZE[1], decay=None, pierce=False):
+    """壁だけで反射して目標に届くショットを角度の順に返す
+
+    target_index の障害物は目標そのものなので遮るものとして扱わない。target_reach は
+    目標の中心からどこまで近づけば届いたとみなすか (障害物なら半径 + 大きさ)。
+    動く障害物は、経路を進む間に動く範囲のどこかで触れうるなら遮るとみなす。目標が動く場合は解かない。
+    decay (減速モードの設定) を渡すと、目標に届く前に止まる経路を除く。pierce (貫通) なら円は遮らない。
+    戻り値は {"angle": 経路を確かめた角度, "angles": (最小, 最大) の目標の方を向く角度
+    (0をまたぐときは最小 > 最大), "bounces": 反射回数, "distance": 目標の鏡像までの距離,
+    "segments": フィールドに折り返した経路} のリスト。
+    """
+    radius = CHARACTER_RADIUS
+    width = field_width - 2 * radius
+    height = field_height - 2 * radius
+    sx, sy = start_x - radius, start_y - radius
+    tx = min(max(target_x - radius, 0), width)
+    ty = min(max(target_y - radius, 0), height)
+    blockers = [obstacle for i, obstacle in enumerate(obstacles)
+                if i != target_index and not (pierce and obstacle["type"] == "circle")]
+    target = obstacles[target_index] if target_index is not None else None
+    if target is not None and "motion" in target:
+        # 動く目標は鏡像の位置が決まらない
+        return []
+    moving = [obstacle for obstacle in blockers if "motion" in obstacle]
+    blockers = [obstacle for obstacle in blockers if "motion" not in obstacle]
+
+    shots = []
+    # 目標に触れる前に反射回数の上限に達しないもの
+    for image_x, image_y, bounces_x, bounces_y in target_images(tx, ty, max_reflections - 1, width, height):
+        dx, dy = image_x - sx, image_y - sy
+        distance = math.hypot(dx, dy)
+        if distance == 0:
+            continue
+        exact = math.atan2(dy, dx) / (2 * math.pi) * 1024
+        # 目標の当たり判定を通る向きの幅 (整数の角度が1つも入らなければ届かない)
+        spread = math.asin(min(1.0, target_reach / distance)) / (2 * math.pi) * 1024
+        first, last = math.ceil(exact - spread), math.floor(exact + spread)
+        if first > last:
+            continue
+        # 実際に入力できる整数の角度のうち中心に最も近いもので、当たり判定に入るまでの経路を調べる
+        angle = min(max(round(exact), first), last)
+        angle_rad = angle / 1024 * 2 * math.pi
+        ux, uy = math.cos(angle_rad), math.sin(angle_rad)
+        along = dx * ux + dy * uy
+        across_sq = max(distance * distance - along * along, 0.0)
+        if across_sq > target_reach * target_reach:
+            continue
+        travel = max(along - math.sqrt(target_reach * target_reach - across_sq), 0.0)
+        end_x, end_y = sx + ux * travel, sy + uy * travel
+        # 壁に近い目標では、鏡像の側に折り返す前に当たり判定に入ってしまう
+        if (crossings(sx, end_x, width), crossings(sy, end_y, height)) != (bounces_x, bounces_y):
+            continue
+        segments = [((x0 + radius, y0 + radius), (x1 + radius, y1 + radius))
+                    for (x0, y0), (x1, y1) in folded_segments(sx, sy, end_x, end_y, width, height)]
+        if any(segment_touches(a, b, obstacle, margin=OCCLUSION_MARGIN)
+               for a, b in segments for obstacle in blockers):
+            continue
+        if moving and moving_blocked(segments, moving):
+            continue
+        if decay is not None and not travel_reaches(segments, decay):
+            continue
+        # それより前の折り返しで目標自体に触れるなら、反射回数の少ない別の鏡像の方で届いている
+        if target is not None and any(segment_touches(a, b, target) for a, b in segments[:-1]):
+            continue
+        shots.append({
+            "angle": angle % 1024,
+            "angles": (first % 1024, last % 1024),
+            "bounces": bounces_x + bounces_y,
+            "distance": distance,
+            "segments": segments,
+        })
+    shots.sort(key=lambda shot: shot["angle"])
+    return shots